@@ -0,0 +1,88 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Measures the per-call overhead of the callables from create_api_call.
+
+Run with ``python benchmarks/api_callable_benchmark.py``. Each case calls a
+stub that returns immediately, so the reported time is the overhead added by
+GAX on top of a bare call.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import itertools
+import timeit
+
+from google.gax import (
+    _CallSettings, api_callable, BackoffSettings, CallOptions, RetryOptions)
+
+_CALLS = 100000
+
+
+def _stub(request, timeout, **kwargs):  # pylint: disable=unused-argument
+    return request
+
+
+def _report(name, func, baseline=None):
+    secs = min(timeit.repeat(func, number=_CALLS, repeat=3)) / _CALLS
+    line = '{:<40} {:>8.2f} us/call'.format(name, secs * 1e6)
+    if baseline is not None:
+        line += '  ({:+.2f} us over a bare call)'.format(
+            (secs - baseline) * 1e6)
+    print(line)
+    return secs
+
+
+def main():
+    """Runs the benchmark."""
+    settings = _CallSettings(
+        timeout=30,
+        retry=RetryOptions(
+            ['UNAVAILABLE'],
+            BackoffSettings(100, 1.3, 60000, 20000, 1.0, 20000, 600000)),
+        kwargs={'metadata': [('x-goog-api-client', 'gax/0 grpc/0')]})
+    api_call = api_callable.create_api_call(_stub, settings)
+    options = CallOptions(timeout=10, metadata=[('x-foo', 'bar')])
+    per_call = (CallOptions(timeout=10, metadata=[('x-request-id', str(i))])
+                for i in itertools.count())
+    unhashable = CallOptions(timeout=10, metadata=[('x-foo', 'bar')],
+                             uncacheable=set())
+
+    baseline = _report('bare stub call', lambda: _stub(1, 30))
+    _report('api call, default settings', lambda: api_call(1), baseline)
+    _report('api call, recurring CallOptions',
+            lambda: api_call(1, options), baseline)
+    _report('api call, per-call metadata',
+            lambda: api_call(1, next(per_call)), baseline)
+    _report('api call, uncacheable CallOptions',
+            lambda: api_call(1, unhashable), baseline)
+
+
+if __name__ == '__main__':
+    main()
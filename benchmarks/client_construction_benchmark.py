@@ -0,0 +1,73 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Measures the time taken to construct API clients.
+
+Run with ``python benchmarks/client_construction_benchmark.py``. The clients
+share an insecure channel, so the reported time excludes the creation of
+channels and credentials.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import timeit
+
+import grpc
+
+from google.gapic.longrunning import operations_client
+from google.gax import api_callable, config
+
+_CLIENTS = 2000
+
+
+def _report(name, func):
+    secs = min(timeit.repeat(func, number=_CLIENTS, repeat=3)) / _CLIENTS
+    print('{:<40} {:>8.2f} us/client'.format(name, secs * 1e6))
+
+
+def main():
+    """Runs the benchmark."""
+    channel = grpc.insecure_channel('localhost:443')
+    override = {'interfaces': {'google.longrunning.Operations': {
+        'methods': {'GetOperation': {'timeout_millis': 10000}}}}}
+
+    _report('OperationsClient()',
+            lambda: operations_client.OperationsClient(channel=channel))
+    _report('OperationsClient(client_config=...)',
+            lambda: operations_client.OperationsClient(
+                channel=channel, client_config=override))
+    client_config = operations_client.OperationsClient._default_client_config
+    _report('construct_settings',
+            lambda: api_callable.construct_settings(
+                'google.longrunning.Operations', client_config, {},
+                config.STATUS_CODE_NAMES))
+
+
+if __name__ == '__main__':
+    main()
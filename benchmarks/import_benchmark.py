@@ -0,0 +1,69 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Measures the time taken to import GAX.
+
+Run with ``python benchmarks/import_benchmark.py``. Each import runs in a new
+interpreter, once with nothing imported beforehand and once after the
+required dependencies of GAX, to isolate the time spent in GAX itself.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import subprocess
+import sys
+
+_RUNS = 10
+
+_TIME_IMPORT = """
+import time
+{setup}
+start = time.time()
+import google.gax
+import google.gax.api_callable
+print(time.time() - start)
+"""
+
+
+def _report(name, setup=''):
+    code = _TIME_IMPORT.format(setup=setup)
+    secs = min(float(subprocess.check_output([sys.executable, '-c', code]))
+               for _ in range(_RUNS))
+    print('{:<40} {:>8.1f} ms'.format(name, secs * 1e3))
+
+
+def main():
+    """Runs the benchmark."""
+    _report('import google.gax')
+    _report('import google.gax, after grpc',
+            setup='import grpc\nimport google.rpc.code_pb2')
+
+
+if __name__ == '__main__':
+    main()
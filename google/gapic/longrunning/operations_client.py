@@ -80,6 +80,11 @@ class OperationsClient(object):
     # this service
     _ALL_SCOPES = ()
 
+    # The packaged client config, loaded by the first client constructed.
+    # The same object is used by all clients, so the settings resolved from
+    # it are shared.
+    _default_client_config = None
+
     def __init__(self,
                  service_path=SERVICE_ADDRESS,
                  port=DEFAULT_SERVICE_PORT,
@@ -151,12 +156,13 @@ class OperationsClient(object):
             metrics_headers[lib_name] = lib_version
 
         # Load the configuration defaults.
-        default_client_config = json.loads(
-            pkg_resources.resource_string(
-                __name__, 'operations_client_config.json').decode())
+        if OperationsClient._default_client_config is None:
+            OperationsClient._default_client_config = json.loads(
+                pkg_resources.resource_string(
+                    __name__, 'operations_client_config.json').decode())
         defaults = api_callable.construct_settings(
             'google.longrunning.Operations',
-            default_client_config,
+            OperationsClient._default_client_config,
             client_config,
             config.STATUS_CODE_NAMES,
             metrics_headers=metrics_headers,
@@ -263,6 +269,57 @@ class OperationsClient(object):
             name=name, filter=filter_, page_size=page_size)
         return self._list_operations(request, options)
 
+    def list_operations_many(self, names, filter_, page_size=0, options=None,
+                             concurrency=10, ordered=True):
+        """
+        Lists the operations matching the filter in each of many operation
+        collections, with up to ``concurrency`` of them listed at once.
+
+        Example:
+          >>> from google.gapic.longrunning import operations_client
+          >>> api = operations_client.OperationsClient()
+          >>> names = ['projects/a/operations', 'projects/b/operations']
+          >>> filter_ = ''
+          >>>
+          >>> # Iterate over the results of each collection in turn
+          >>> for element in api.list_operations_many(names, filter_):
+          >>>   # process element
+          >>>   pass
+          >>>
+          >>> # Or iterate over (request, result) pairs as they arrive
+          >>> for request, element in api.list_operations_many(
+          >>>         names, filter_, ordered=False):
+          >>>   # process element of request.name
+          >>>   pass
+
+        Args:
+          names (Iterable[string]): The names of the operation collections.
+          filter_ (string): The standard list filter.
+          page_size (int): The maximum number of resources contained in the
+            underlying API response.
+          options (:class:`google.gax.CallOptions`): Overrides the default
+            settings for these calls, e.g, timeout, retries etc.
+          concurrency (int): The maximum number of collections listed at once.
+          ordered (bool): If True, the results of each collection follow
+            those of the preceding collections. Otherwise, ``(request,
+            result)`` pairs are returned as pages arrive.
+
+        Returns:
+          An iterable of :class:`google.longrunning.operations_pb2.Operation`
+          instances, or of ``(request, operation)`` pairs if ``ordered`` is
+          False; see :func:`google.gax.multi_list.merge_listings`.
+
+        Raises:
+          :exc:`google.gax.errors.GaxError` if the RPC is aborted.
+          :exc:`ValueError` if the parameters are invalid.
+        """
+        # Create the request objects.
+        requests = (operations_pb2.ListOperationsRequest(
+            name=name, filter=filter_, page_size=page_size) for name in names)
+        return self._list_operations.list_many(
+            requests, concurrency=concurrency, options=options,
+            ordered=ordered)
+
     def cancel_operation(self, name, options=None):
         """
         Starts asynchronous cancellation on a long-running operation.  The server
@@ -33,19 +33,17 @@ from __future__ import absolute_import
 
 import collections
 import logging
-import multiprocessing as mp
+import math
+import threading
+import time
 
-import dill
 from grpc import RpcError, StatusCode
-import pkg_resources
 
 from google.gax.errors import GaxError
 from google.gax.retry import retryable
 from google.rpc import code_pb2
 
-# pylint: disable=no-member
-__version__ = pkg_resources.get_distribution('google-gax').version
-# pylint: enable=no-member
+__version__ = '0.16.0'
 
 
 _LOG = logging.getLogger(__name__)
@@ -64,12 +62,41 @@ CallOptions belongs will attempt to inherit that field from its default
 settings."""
 
 
+PRIORITY_LOW = 0
+"""The priority of background calls, e.g. batch jobs and backfills."""
+
+
+PRIORITY_NORMAL = 1
+"""The default priority of calls."""
+
+
+PRIORITY_HIGH = 2
+"""The priority of latency-sensitive calls, e.g. interactive ones."""
+
+
 class _CallSettings(object):
-    """Encapsulates the call settings for an API call."""
+    """Encapsulates the call settings for an API call.
+
+    Instances are not modified once constructed; use ``merge`` or
+    ``_replace`` to derive new settings.
+    """
     # pylint: disable=too-few-public-methods
+    __slots__ = ('timeout', 'retry', 'page_descriptor', 'page_token',
+                 'bundler', 'bundle_descriptor', 'kwargs', 'circuit_breaker',
+                 'interceptors', 'response_cache', 'single_flight', 'batcher',
+                 'batch_descriptor', 'rate_limiter', 'concurrency_limiter',
+                 'admission', 'priority', 'stream_descriptor',
+                 'prefetch_pages', 'cursor', 'max_results', 'page_sizing')
+
     def __init__(self, timeout=30, retry=None, page_descriptor=None,
                  page_token=None, bundler=None, bundle_descriptor=None,
-                 kwargs=None):
+                 kwargs=None, circuit_breaker=None, interceptors=(),
+                 response_cache=None, single_flight=False, batcher=None,
+                 batch_descriptor=None, rate_limiter=None,
+                 concurrency_limiter=None, admission=None,
+                 priority=PRIORITY_NORMAL, stream_descriptor=None,
+                 prefetch_pages=0, cursor=None, max_results=None,
+                 page_sizing=None):
         """Constructor.
 
         Args:
@@ -89,6 +116,46 @@ class _CallSettings(object):
               structure of of the bundle. If None, bundling is disabled.
             kwargs (dict): other keyword arguments to be passed to the API
               calls.
+            circuit_breaker (gax.circuit_breaker.CircuitBreaker): fails
+              calls fast while the backend is failing. If None, no circuit
+              breaker is used.
+            interceptors (Sequence[Callable]): the interceptors wrapping
+              each attempt of the API calls, outermost first; see
+              ``gax.interceptors``.
+            response_cache (gax.response_cache.ResponseCache): caches the
+              responses of the API calls. If None, responses are not cached.
+            single_flight (bool): if True, concurrent API calls with identical
+              requests and options share a single RPC.
+            batcher (gax.bundling.Executor): orchestrates the batching of
+              single-item calls. If None, batching is not performed.
+            batch_descriptor (BatchDescriptor): indicates how calls are
+              batched. If None, batching is disabled.
+            rate_limiter (gax.rate_limiter.RateLimiter): limits the rate at
+              which attempts are sent. If None, the rate is not limited.
+            concurrency_limiter
+              (gax.concurrency_limiter.ConcurrencyLimiter): limits the number
+              of attempts in flight. If None, their number is not limited.
+            admission (gax.admission.AdmissionScheduler): admits the attempts
+              of all the methods of a client by priority. If None, attempts
+              are sent immediately.
+            priority (int): the priority of the API calls in ``admission``,
+              e.g. ``PRIORITY_HIGH``.
+            stream_descriptor (StreamDescriptor): indicates how a
+              server-streaming call is resumed after a transient error. If
+              None, it is only retried until it receives a response.
+            prefetch_pages (int): If there is no ``page_descriptor``, this
+              attribute has no meaning. Otherwise, the number of pages fetched
+              ahead of the consumer on a background thread.
+            cursor (PageCursor): If there is no ``page_descriptor``, this
+              attribute has no meaning. Otherwise, the position at which page
+              streaming resumes. If None, it starts with the first resource.
+            max_results (int): If there is no ``page_descriptor``, this
+              attribute has no meaning. Otherwise, the maximum number of
+              resources returned by page streaming. If None, all of them are.
+            page_sizing (AdaptivePageSizeOptions): If the ``page_descriptor``
+              has no page size field, this attribute has no meaning.
+              Otherwise, configures the growth of the page size requested by
+              page streaming. If None, the page size of the request is used.
         """
         self.timeout = timeout
         self.retry = retry
@@ -97,6 +164,21 @@ class _CallSettings(object):
         self.bundler = bundler
         self.bundle_descriptor = bundle_descriptor
         self.kwargs = kwargs or {}
+        self.circuit_breaker = circuit_breaker
+        self.interceptors = tuple(interceptors)
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        self.batcher = batcher
+        self.batch_descriptor = batch_descriptor
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.admission = admission
+        self.priority = priority
+        self.stream_descriptor = stream_descriptor
+        self.prefetch_pages = prefetch_pages
+        self.cursor = cursor
+        self.max_results = max_results
+        self.page_sizing = page_sizing
 
     @property
     def flatten_pages(self):
@@ -109,6 +191,44 @@ class _CallSettings(object):
         """
         return self.page_token is None
 
+    def _copy(self):
+        """Returns a copy of this object.
+
+        The copy does not go through the constructor, as the attributes of
+        this object are already in their final form.
+        """
+        new = object.__new__(_CallSettings)
+        new.timeout = self.timeout
+        new.retry = self.retry
+        new.page_descriptor = self.page_descriptor
+        new.page_token = self.page_token
+        new.bundler = self.bundler
+        new.bundle_descriptor = self.bundle_descriptor
+        new.kwargs = self.kwargs
+        new.circuit_breaker = self.circuit_breaker
+        new.interceptors = self.interceptors
+        new.response_cache = self.response_cache
+        new.single_flight = self.single_flight
+        new.batcher = self.batcher
+        new.batch_descriptor = self.batch_descriptor
+        new.rate_limiter = self.rate_limiter
+        new.concurrency_limiter = self.concurrency_limiter
+        new.admission = self.admission
+        new.priority = self.priority
+        new.stream_descriptor = self.stream_descriptor
+        new.prefetch_pages = self.prefetch_pages
+        new.cursor = self.cursor
+        new.max_results = self.max_results
+        new.page_sizing = self.page_sizing
+        return new
+
+    def _replace(self, **changes):
+        """Returns a copy of this object, with some attributes replaced."""
+        new = self._copy()
+        for name, value in changes.items():
+            setattr(new, name, value)
+        return new
+
     def merge(self, options):
         """Returns new _CallSettings merged from this and a CallOptions object.
 
@@ -124,45 +244,49 @@ class _CallSettings(object):
         Returns:
             CallSettings: The merged settings and options.
         """
+        merged = self._copy()
         if not options:
-            return _CallSettings(
-                timeout=self.timeout, retry=self.retry,
-                page_descriptor=self.page_descriptor,
-                page_token=self.page_token,
-                bundler=self.bundler, bundle_descriptor=self.bundle_descriptor,
-                kwargs=self.kwargs)
-        else:
-            if options.timeout == OPTION_INHERIT:
-                timeout = self.timeout
-            else:
-                timeout = options.timeout
-
-            if options.retry == OPTION_INHERIT:
-                retry = self.retry
-            else:
-                retry = options.retry
-
-            if options.page_token == OPTION_INHERIT:
-                page_token = self.page_token
-            else:
-                page_token = options.page_token
-
-            if options.is_bundling:
-                bundler = self.bundler
-            else:
-                bundler = None
-
-            if options.kwargs == OPTION_INHERIT:
-                kwargs = self.kwargs
-            else:
-                kwargs = self.kwargs.copy()
+            return merged
+
+        if options.timeout is not OPTION_INHERIT:
+            merged.timeout = options.timeout
+
+        if options.retry is not OPTION_INHERIT:
+            merged.retry = options.retry
+
+        if options.page_token is not OPTION_INHERIT:
+            merged.page_token = options.page_token
+
+        if options.priority is not OPTION_INHERIT:
+            merged.priority = options.priority
+
+        if options.prefetch_pages is not OPTION_INHERIT:
+            merged.prefetch_pages = options.prefetch_pages
+
+        if options.cursor is not OPTION_INHERIT:
+            merged.cursor = options.cursor
+
+        if options.max_results is not OPTION_INHERIT:
+            merged.max_results = options.max_results
+
+        if not options.is_bundling:
+            merged.bundler = None
+            merged.batcher = None
+
+        if (options.kwargs is not OPTION_INHERIT or
+                options.wait_for_ready is not OPTION_INHERIT):
+            kwargs = self.kwargs.copy()
+            if options.kwargs is not OPTION_INHERIT:
                 kwargs.update(options.kwargs)
+            if options.wait_for_ready is not OPTION_INHERIT:
+                # Left out when False, for stubs predating wait_for_ready.
+                if options.wait_for_ready:
+                    kwargs['wait_for_ready'] = True
+                else:
+                    kwargs.pop('wait_for_ready', None)
+            merged.kwargs = kwargs
 
-            return _CallSettings(
-                timeout=timeout, retry=retry,
-                page_descriptor=self.page_descriptor, page_token=page_token,
-                bundler=bundler, bundle_descriptor=self.bundle_descriptor,
-                kwargs=kwargs)
+        return merged
 
 
 class CallOptions(object):
@@ -176,7 +300,10 @@ class CallOptions(object):
     """
     # pylint: disable=too-few-public-methods
     def __init__(self, timeout=OPTION_INHERIT, retry=OPTION_INHERIT,
-                 page_token=OPTION_INHERIT, is_bundling=False, **kwargs):
+                 page_token=OPTION_INHERIT, is_bundling=False,
+                 wait_for_ready=OPTION_INHERIT, priority=OPTION_INHERIT,
+                 prefetch_pages=OPTION_INHERIT, cursor=OPTION_INHERIT,
+                 max_results=OPTION_INHERIT, **kwargs):
         """
         Example:
            >>> # change an api call's timeout
@@ -191,6 +318,21 @@ class CallOptions(object):
            >>>
            >>> # enable bundling on a call that supports it
            >>> o4 = CallOptions(is_bundling=True)
+           >>>
+           >>> # wait for the channel to connect instead of failing fast
+           >>> o5 = CallOptions(wait_for_ready=True)
+           >>>
+           >>> # admit an interactive call ahead of background ones
+           >>> o6 = CallOptions(priority=PRIORITY_HIGH)
+           >>>
+           >>> # fetch up to two pages ahead while processing a page
+           >>> o7 = CallOptions(prefetch_pages=2)
+           >>>
+           >>> # resume a listing where a previous run left off
+           >>> o8 = CallOptions(cursor=PageCursor(*saved_cursor))
+           >>>
+           >>> # stop listing after the first 50 resources
+           >>> o9 = CallOptions(max_results=50)
 
         Args:
             timeout (int): The client-side timeout for non-retrying API calls.
@@ -201,8 +343,27 @@ class CallOptions(object):
               this page_token. Use ``INITIAL_PAGE`` for the first request.
               If unset and the call is configured for page streaming, page
               streaming is performed per-resource.
-            is_bundling (bool): If set and the call is configured for bundling,
-              bundling is performed. Bundling is always disabled by default.
+            is_bundling (bool): If set and the call is configured for bundling
+              or batching, it is performed. Bundling and batching are always
+              disabled by default.
+            wait_for_ready (bool): If True, the attempts of the call wait,
+              within their timeout, for the channel to be ready instead of
+              failing with UNAVAILABLE while it connects. Such failures then
+              no longer consume retries and backoff delays. Requires grpcio
+              1.12 or later.
+            priority (int): The priority of the call, from ``PRIORITY_LOW``
+              to ``PRIORITY_HIGH``, when the client admits calls by priority.
+            prefetch_pages (int): If set and the call is configured for page
+              streaming, up to this many pages are fetched ahead of the
+              consumer on a background thread.
+            cursor (PageCursor): If set and the call is configured for page
+              streaming, page streaming resumes at this position, as taken
+              from the ``cursor`` of an earlier iterator over the same
+              listing.
+            max_results (int): If set and the call is configured for page
+              streaming, at most this many resources are returned, and the
+              page size of the last request is trimmed to fit when the page
+              descriptor has a page size field.
             kwargs: Additional arguments passed through to the API call.
 
         Raises:
@@ -215,6 +376,11 @@ class CallOptions(object):
         self.retry = retry
         self.page_token = page_token
         self.is_bundling = is_bundling
+        self.wait_for_ready = wait_for_ready
+        self.priority = priority
+        self.prefetch_pages = prefetch_pages
+        self.cursor = cursor
+        self.max_results = max_results
         self.kwargs = kwargs or OPTION_INHERIT
 
 
@@ -223,8 +389,89 @@ class PageDescriptor(
             'PageDescriptor',
             ['request_page_token_field',
              'response_page_token_field',
-             'resource_field'])):
-    """Describes the structure of a page-streaming call."""
+             'resource_field',
+             'request_page_size_field'])):
+    """Describes the structure of a page-streaming call.
+
+    Attributes:
+      request_page_token_field: the name of the page token field of the
+        request.
+      response_page_token_field: the name of the next page token field of the
+        response.
+      resource_field: the name of the repeated field of the response holding
+        the resources.
+      request_page_size_field: the name of the page size field of the
+        request, or None if the page size cannot be set.
+    """
+    def __new__(cls, request_page_token_field, response_page_token_field,
+                resource_field, request_page_size_field=None):
+        return super(cls, PageDescriptor).__new__(
+            cls, request_page_token_field, response_page_token_field,
+            resource_field, request_page_size_field)
+
+
+class PageCursor(
+        collections.namedtuple(
+            'PageCursor', ['page_token', 'offset'])):
+    """A position in the resources of a page streaming call.
+
+    Being a tuple of a string and an int, a cursor can be serialized, e.g.
+    with ``json``, and rebuilt with ``PageCursor(*values)`` to resume the
+    call in another process.
+
+    Attributes:
+      page_token (str): the page token of the request fetching the page the
+        position is in, or the empty string for the first page.
+      offset (int): the number of resources of that page preceding the
+        position.
+    """
+    def __new__(cls, page_token='', offset=0):
+        return super(cls, PageCursor).__new__(cls, page_token, offset)
+
+
+class AdaptivePageSizeOptions(
+        collections.namedtuple(
+            'AdaptivePageSizeOptions',
+            ['max_page_size',
+             'initial_page_size',
+             'growth_factor',
+             'overhead_ratio'])):
+    """Configures the growth of the page size of a page streaming call.
+
+    The latency of a page is modelled as a fixed per-RPC overhead plus a cost
+    per resource, fitted from the last two pages. While the overhead accounts
+    for at least ``overhead_ratio`` of the latency, the page size grows by
+    ``growth_factor``, up to ``max_page_size``. The first page always grows
+    the page size, to provide the second point of the fit.
+
+    Attributes:
+      max_page_size: the largest page size requested.
+      initial_page_size: the page size of the first request. If None, the
+        page size of the request is used for it.
+      growth_factor: the factor by which the page size grows.
+      overhead_ratio: the share of the latency of a page due to the per-RPC
+        overhead above which the page size grows.
+    """
+    def __new__(cls, max_page_size, initial_page_size=None, growth_factor=2.0,
+                overhead_ratio=0.5):
+        return super(cls, AdaptivePageSizeOptions).__new__(
+            cls, max_page_size, initial_page_size, growth_factor,
+            overhead_ratio)
+
+
+class StreamDescriptor(
+        collections.namedtuple(
+            'StreamDescriptor',
+            ['request_resume_token_field',
+             'response_resume_token_field'])):
+    """Describes how a server-streaming call is resumed.
+
+    Attributes:
+      request_resume_token_field: the field of the request set to the latest
+        resume token received, to resume the stream after it.
+      response_resume_token_field: the field of the responses holding a resume
+        token. Responses may leave it empty, e.g. midway through a row.
+    """
     pass
 
 
@@ -232,7 +479,10 @@ class RetryOptions(
         collections.namedtuple(
             'RetryOptions',
             ['retry_codes',
-             'backoff_settings'])):
+             'backoff_settings',
+             'hedging',
+             'adaptive_timeout',
+             'backoff_overrides'])):
     """Per-call configurable settings for retrying upon transient failure.
 
     Attributes:
@@ -240,8 +490,77 @@ class RetryOptions(
         upon which a retry should be attempted.
       backoff_settings (:class:`BackoffSettings`): configures the retry
         exponential backoff algorithm.
+      hedging (:class:`HedgingOptions`): an optional policy for sending
+        hedged attempts in parallel with a slow attempt. Only applied when
+        ``retry_codes`` is non-empty, i.e. when the method is idempotent.
+      adaptive_timeout (:class:`AdaptiveTimeoutOptions`): an optional policy
+        deriving the timeout of each attempt from the observed latency of the
+        method, instead of ``initial_rpc_timeout_millis``.
+      backoff_overrides (dict[string, :class:`BackoffSettings`]): optional
+        backoff settings for specific codes in ``retry_codes``. After a
+        failure with one of these codes, the delay before the next attempt
+        follows its own settings instead of ``backoff_settings``. The
+        timeouts of the attempts always follow ``backoff_settings``.
     """
-    pass
+    def __new__(cls, retry_codes, backoff_settings, hedging=None,
+                adaptive_timeout=None, backoff_overrides=None):
+        return super(cls, RetryOptions).__new__(
+            cls, retry_codes, backoff_settings, hedging, adaptive_timeout,
+            backoff_overrides)
+
+
+class HedgingOptions(
+        collections.namedtuple(
+            'HedgingOptions',
+            ['delay_millis',
+             'max_hedged_attempts',
+             'budget_ratio'])):
+    """Configures hedged requests for an idempotent method.
+
+    When an attempt has not completed after the hedging delay, another
+    attempt with the same request is sent in parallel. The first attempt to
+    succeed provides the response and the others are cancelled.
+
+    Attributes:
+      delay_millis: the time, in milliseconds, to wait for an attempt before
+        sending a hedged one. If None, the observed 95th percentile latency of
+        the method is used, and hedging starts once enough calls have been
+        observed.
+      max_hedged_attempts: the maximum number of hedged attempts sent in
+        addition to the original attempt.
+      budget_ratio: the number of hedged attempts that may be sent for each
+        call to the method, on average. For instance, 0.1 allows at most one
+        call in ten to be hedged.
+    """
+    def __new__(cls, delay_millis=None, max_hedged_attempts=1,
+                budget_ratio=0.1):
+        return super(cls, HedgingOptions).__new__(
+            cls, delay_millis, max_hedged_attempts, budget_ratio)
+
+
+class AdaptiveTimeoutOptions(
+        collections.namedtuple(
+            'AdaptiveTimeoutOptions',
+            ['percentile',
+             'margin',
+             'min_timeout_millis'])):
+    """Configures attempt timeouts derived from the observed latency.
+
+    Once enough attempts of a method have been observed, the timeout of the
+    first attempt of a call is the given percentile of the latency of the
+    method times ``margin``, instead of ``initial_rpc_timeout_millis``. The
+    timeouts of later attempts grow from it by ``rpc_timeout_multiplier`` as
+    usual, and all of them are bounded by ``max_rpc_timeout_millis`` and the
+    total timeout of the call.
+
+    Attributes:
+      percentile: the percentile of the observed latency, between 0 and 100.
+      margin: the factor applied to the observed latency.
+      min_timeout_millis: the minimum timeout, in milliseconds.
+    """
+    def __new__(cls, percentile=99.0, margin=2.0, min_timeout_millis=100):
+        return super(cls, AdaptiveTimeoutOptions).__new__(
+            cls, percentile, margin, min_timeout_millis)
 
 
 class BackoffSettings(
@@ -279,6 +598,151 @@ class BackoffSettings(
     pass
 
 
+class CircuitBreakerOptions(
+        collections.namedtuple(
+            'CircuitBreakerOptions',
+            ['failure_ratio_threshold',
+             'minimum_calls',
+             'window_millis',
+             'open_millis',
+             'half_open_probes'])):
+    """Holds values used to configure a circuit breaker.
+
+    Attributes:
+      failure_ratio_threshold: the circuit opens when the ratio of failed
+        attempts in the window reaches this value.
+      minimum_calls: the minimum number of attempts in the window before the
+        failure ratio is considered.
+      window_millis: the length, in milliseconds, of the sliding window over
+        which the failure ratio is computed.
+      open_millis: the time, in milliseconds, during which an open circuit
+        fails calls immediately, before letting probe calls through.
+      half_open_probes: the number of probe calls let through by a half-open
+        circuit. The circuit closes once they all succeed, and opens again if
+        any of them fails.
+    """
+    def __new__(cls,
+                failure_ratio_threshold=0.5,
+                minimum_calls=20,
+                window_millis=10000,
+                open_millis=5000,
+                half_open_probes=3):
+        return super(cls, CircuitBreakerOptions).__new__(
+            cls,
+            failure_ratio_threshold,
+            minimum_calls,
+            window_millis,
+            open_millis,
+            half_open_probes)
+
+
+class ResponseCacheOptions(
+        collections.namedtuple(
+            'ResponseCacheOptions',
+            ['ttl_millis',
+             'max_entries'])):
+    """Holds values used to configure the response cache of a method.
+
+    Attributes:
+      ttl_millis: the time, in milliseconds, during which a cached response
+        is returned for identical requests.
+      max_entries: the maximum number of responses cached; the least recently
+        used ones are evicted beyond it.
+    """
+    def __new__(cls, ttl_millis=1000, max_entries=1000):
+        return super(cls, ResponseCacheOptions).__new__(
+            cls, ttl_millis, max_entries)
+
+
+class RateLimitOptions(
+        collections.namedtuple(
+            'RateLimitOptions',
+            ['qps',
+             'burst',
+             'fail_fast'])):
+    """Holds values used to configure the client-side rate limit of a method.
+
+    Attributes:
+      qps: the sustained number of attempts per second sent by a client.
+      burst: the number of attempts that may be sent at once after a quiet
+        period. If None, one second's worth of attempts, and at least one.
+      fail_fast: if True, attempts over the rate limit fail immediately with
+        :class:`google.gax.errors.RateLimitExceededError`. Otherwise they wait
+        for the rate limit, and only fail if they would wait longer than their
+        timeout.
+    """
+    def __new__(cls, qps, burst=None, fail_fast=False):
+        return super(cls, RateLimitOptions).__new__(
+            cls, qps, burst, fail_fast)
+
+
+class ConcurrencyLimitOptions(
+        collections.namedtuple(
+            'ConcurrencyLimitOptions',
+            ['initial_limit',
+             'min_limit',
+             'max_limit',
+             'max_wait_millis',
+             'latency_tolerance',
+             'backoff_ratio'])):
+    """Holds values used to configure the concurrency limit of a method.
+
+    The limit grows by about one for each limit's worth of attempts whose
+    latency stays within ``latency_tolerance`` times the baseline latency,
+    and is multiplied by ``backoff_ratio`` when an attempt is slower, or
+    fails with RESOURCE_EXHAUSTED or DEADLINE_EXCEEDED.
+
+    Attributes:
+      initial_limit: the number of attempts allowed in flight at first.
+      min_limit: the lowest the limit is cut back to.
+      max_limit: the highest the limit grows to.
+      max_wait_millis: the longest time, in milliseconds, an attempt over the
+        limit waits for another attempt to complete, before failing with
+        :class:`google.gax.errors.ConcurrencyLimitExceededError`.
+      latency_tolerance: the ratio of the baseline latency above which the
+        latency of an attempt indicates the backend is overloaded.
+      backoff_ratio: the factor applied to the limit when the backend is
+        overloaded.
+    """
+    def __new__(cls,
+                initial_limit=20,
+                min_limit=1,
+                max_limit=1000,
+                max_wait_millis=1000,
+                latency_tolerance=2.0,
+                backoff_ratio=0.9):
+        return super(cls, ConcurrencyLimitOptions).__new__(
+            cls,
+            initial_limit,
+            min_limit,
+            max_limit,
+            max_wait_millis,
+            latency_tolerance,
+            backoff_ratio)
+
+
+class AdmissionOptions(
+        collections.namedtuple(
+            'AdmissionOptions',
+            ['max_in_flight',
+             'max_queue_size',
+             'priority_weights'])):
+    """Holds values used to configure the admission of the calls of a client.
+
+    Attributes:
+      max_in_flight: the number of attempts of all the methods of a client
+        allowed in flight at once.
+      max_queue_size: the number of attempts allowed to wait for admission.
+        When the queue is full, the attempt with the lowest priority is shed.
+      priority_weights: the share of admissions of each priority, from
+        ``PRIORITY_LOW`` up, among the attempts waiting for admission.
+    """
+    def __new__(cls, max_in_flight=100, max_queue_size=1000,
+                priority_weights=(1, 4, 16)):
+        return super(cls, AdmissionOptions).__new__(
+            cls, max_in_flight, max_queue_size, tuple(priority_weights))
+
+
 class BundleDescriptor(
         collections.namedtuple(
             'BundleDescriptor',
@@ -312,6 +776,57 @@ class BundleDescriptor(
             subresponse_field)
 
 
+class BatchDescriptor(
+        collections.namedtuple(
+            'BatchDescriptor',
+            ['batch_request_type',
+             'key_field',
+             'batched_field',
+             'subresponse_field',
+             'response_key_field',
+             'request_discriminator_fields'])):
+    """Describes how a single-item method maps onto its batch counterpart.
+
+    Concurrent calls of the single-item method are sent as one request of the
+    batch method, and each caller receives the item of the batch response
+    matching the key of its request.
+
+    request_discriminator_fields are top-level fields of the single-item
+    request, copied into the batch request; only requests with the same values
+    for them are batched together.
+
+    Attributes:
+      batch_request_type: the class of the request message of the batch
+        method.
+      key_field: the field in the single-item request holding the key of the
+        requested item.
+      batched_field: the repeated field in the batch request that collects the
+        keys of the batched requests.
+      subresponse_field: the repeated field in the batch response holding the
+        items.
+      response_key_field: the field in each item of the batch response holding
+        its key. If None, ``key_field`` is used.
+      request_discriminator_fields: a list of fields in the single-item
+        request that are used to determine which requests should be batched
+        together.
+    """
+    def __new__(cls,
+                batch_request_type,
+                key_field,
+                batched_field,
+                subresponse_field,
+                response_key_field=None,
+                request_discriminator_fields=()):
+        return super(cls, BatchDescriptor).__new__(
+            cls,
+            batch_request_type,
+            key_field,
+            batched_field,
+            subresponse_field,
+            response_key_field or key_field,
+            request_discriminator_fields)
+
+
 class BundleOptions(
         collections.namedtuple(
             'BundleOptions',
@@ -346,7 +861,8 @@ class BundleOptions(
           elements in the repeated field, with a buffer applied to correspond to
           the resulting under-approximation.
         delay_threshold: the bundled request will be sent this amount of
-          time after the first element in the bundle was added to it.
+          time, in milliseconds, after the first element in the bundle was
+          added to it.
 
     """
     # pylint: disable=too-few-public-methods
@@ -386,7 +902,8 @@ class BundleOptions(
                 repeated field, with a buffer applied to correspond to the
                 resulting under-approximation.
             delay_threshold (int): the bundled request will be sent this amount
-                of time after the first element in the bundle was added to it.
+                of time, in milliseconds, after the first element in the bundle
+                was added to it.
 
         Returns:
           BundleOptions: the constructed object.
@@ -409,6 +926,191 @@ class BundleOptions(
             delay_threshold)
 
 
+_Page = collections.namedtuple(
+    '_Page', ['response', 'resources', 'next_token', 'cursor', 'next_cursor'])
+"""A fetched page, with the cursors of its start and of the page after it."""
+
+
+class _PageFetcher(object):
+    """Fetches the successive pages of a page streaming call.
+
+    Calling it fetches the next page. Callers sending the requests
+    themselves, e.g. asynchronously, use ``prepare_request`` and
+    ``add_response`` instead.
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, api_call, page_descriptor, cursor, request, kwargs,
+                 max_results=None, page_sizing=None):
+        self._func = api_call
+        self._page_descriptor = page_descriptor
+        self._cursor = cursor
+        self._request = request
+        self._kwargs = kwargs
+        self._remaining = max_results
+        self._page_sizing = None
+        self._page_size = None
+        if page_descriptor.request_page_size_field:
+            self._page_sizing = page_sizing
+            if page_sizing:
+                self._page_size = page_sizing.initial_page_size
+        self._last_sample = None
+
+    def _request_page_size(self, offset):
+        """Returns the page size to request, or None to leave it as is."""
+        # An unset page size, 0 in a protobuf request, means the default.
+        size = self._page_size or getattr(
+            self._request, self._page_descriptor.request_page_size_field,
+            None) or None
+        if self._remaining is not None:
+            wanted = offset + self._remaining
+            size = wanted if size is None else min(size, wanted)
+        if size is not None and offset:
+            # The page resumed must still hold the resources left out.
+            size = max(size, offset + 1)
+        return size
+
+    def _adapt_page_size(self, count, latency):
+        """Grows the page size while the per-RPC overhead dominates."""
+        if not self._page_sizing or not count:
+            return
+        previous, self._last_sample = self._last_sample, (count, latency)
+        if previous is not None:
+            if previous[0] == count:
+                return
+            per_resource = (latency - previous[1]) / (count - previous[0])
+            overhead = latency - per_resource * count
+            if overhead < self._page_sizing.overhead_ratio * latency:
+                return
+        self._page_size = min(
+            self._page_sizing.max_page_size,
+            int(math.ceil(
+                (self._page_size or count) * self._page_sizing.growth_factor)))
+
+    def prepare_request(self):
+        """Sets the page token and size of the request for the next page.
+
+        Returns:
+          object: the request.
+        """
+        descriptor = self._page_descriptor
+        page_token, offset = self._cursor
+        if page_token:
+            setattr(self._request, descriptor.request_page_token_field,
+                    page_token)
+        if descriptor.request_page_size_field:
+            size = self._request_page_size(offset)
+            if size is not None:
+                setattr(self._request, descriptor.request_page_size_field,
+                        size)
+        return self._request
+
+    def add_response(self, response, latency):
+        """Builds the page of the response to the request for the next page.
+
+        Args:
+          response (object): the response.
+          latency (float): the time taken by the call, in seconds.
+
+        Returns:
+          Tuple[_Page, bool]: the page, and whether it is the last one.
+        """
+        descriptor = self._page_descriptor
+        page_token, offset = cursor = self._cursor
+        next_token = getattr(response, descriptor.response_page_token_field)
+        resources = getattr(response, descriptor.resource_field)
+        self._adapt_page_size(len(resources), latency)
+
+        if offset:
+            resources = resources[offset:]
+        self._cursor = PageCursor(next_token, 0) if next_token else None
+        if self._remaining is not None:
+            if len(resources) > self._remaining:
+                resources = resources[:self._remaining]
+                self._cursor = PageCursor(page_token, offset + len(resources))
+            self._remaining -= len(resources)
+        last = self._cursor is None or self._remaining == 0
+        return _Page(response, resources, next_token, cursor,
+                     self._cursor), last
+
+    def __call__(self):
+        """Fetches the next page.
+
+        Returns:
+          Tuple[_Page, bool]: the page, and whether it is the last one.
+        """
+        request = self.prepare_request()
+        started = time.time()
+        response = self._func(request, **self._kwargs)
+        return self.add_response(response, time.time() - started)
+
+
+class _PagePrefetcher(object):
+    """Fetches the pages of a page streaming call on a background thread.
+
+    Fetched pages are buffered in a bounded queue, with the error ending the
+    call, if any, in its place after them.
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self, fetch_page, depth):
+        """
+        Args:
+          fetch_page (Callable[[], Tuple[object, bool]]): fetches the next
+            page, returning it and whether it is the last one.
+          depth (int): the number of pages fetched ahead of the consumer.
+        """
+        self._fetch_page = fetch_page
+        self._depth = depth
+        self._condition = threading.Condition()
+        self._fetched = collections.deque()
+        self._closed = False
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while len(self._fetched) >= self._depth and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            try:
+                fetched = self._fetch_page()
+            except Exception as exception:  # pylint: disable=broad-except
+                fetched = exception
+            with self._condition:
+                self._fetched.append(fetched)
+                self._condition.notify_all()
+            if isinstance(fetched, Exception) or fetched[1]:
+                return
+
+    def get(self):
+        """Returns the next page, waiting for it if needed.
+
+        Returns:
+          Tuple[object, bool]: the page, and whether it is the last one.
+
+        Raises:
+          Exception: the error of the call, in the place of the page it
+            failed to fetch.
+        """
+        with self._condition:
+            while not self._fetched:
+                self._condition.wait()
+            fetched = self._fetched.popleft()
+            self._condition.notify_all()
+        if isinstance(fetched, Exception):
+            raise fetched
+        return fetched
+
+    def close(self):
+        """Stops fetching pages."""
+        with self._condition:
+            self._closed = True
+            self._fetched.clear()
+            self._condition.notify_all()
+
+
 class PageIterator(object):
     """An iterator over the pages of a page streaming API call.
 
@@ -420,10 +1122,13 @@ class PageIterator(object):
         None if a call has not yet been made.
       page_token: The page token to be passed in the request for the next call
         to be made.
+      page_cursor (PageCursor): The position of the first resource of the page
+        most recently returned, or None if no page has been returned yet.
     """
     # pylint: disable=too-few-public-methods
     def __init__(self, api_call, page_descriptor, page_token, request,
-                 **kwargs):
+                 prefetch_pages=0, cursor=None, max_results=None,
+                 page_sizing=None, **kwargs):
         """
         Args:
           api_call (Callable[[req], resp]): an API call that is page
@@ -437,15 +1142,34 @@ class PageIterator(object):
             token field of the request is overwritten by the ``page_token``
             passed to the constructor, unless ``page_token`` is
             ``INITIAL_PAGE``.
+          prefetch_pages (int): The number of pages fetched ahead of the
+            consumer, on a background thread, once the first page is
+            requested. If 0, each page is fetched when it is requested.
+          cursor (PageCursor): The position at which to resume, overriding
+            ``page_token``. The resources preceding it in its page are left
+            out of the first page returned.
+          max_results (int): The maximum number of resources returned. If
+            None, all of them are.
+          page_sizing (AdaptivePageSizeOptions): Configures the growth of the
+            page size, if ``page_descriptor`` has a page size field. If None,
+            the page size of the request is used.
           kwargs: Arbitrary keyword arguments to be passed to the API call.
         """
         self.response = None
-        self.page_token = page_token or INITIAL_PAGE
-        self._func = api_call
+        self.page_cursor = None
+        if cursor is None:
+            if page_token == INITIAL_PAGE:
+                page_token = ''
+            cursor = PageCursor(page_token or '', 0)
+        self.page_token = cursor.page_token or INITIAL_PAGE
+        self._cursor = cursor
         self._page_descriptor = page_descriptor
-        self._request = request
-        self._kwargs = kwargs
-        self._done = False
+        self._fetch = _PageFetcher(
+            api_call, page_descriptor, cursor, request, kwargs, max_results,
+            page_sizing)
+        self._done = max_results == 0
+        self._prefetch_pages = prefetch_pages
+        self._prefetcher = None
 
     def __iter__(self):
         return self
@@ -458,16 +1182,41 @@ class PageIterator(object):
         """Retrieves the next page."""
         if self._done:
             raise StopIteration
-        if self.page_token != INITIAL_PAGE:
-            setattr(self._request,
-                    self._page_descriptor.request_page_token_field,
-                    self.page_token)
-        response = self._func(self._request, **self._kwargs)
-        self.page_token = getattr(
-            response, self._page_descriptor.response_page_token_field)
-        if not self.page_token:
+        if self._prefetch_pages > 0:
+            if self._prefetcher is None:
+                self._prefetcher = _PagePrefetcher(
+                    self._fetch, self._prefetch_pages)
+            try:
+                page, last = self._prefetcher.get()
+            except Exception:
+                self._done = True
+                raise
+        else:
+            page, last = self._fetch()
+        self.response = page.response
+        self.page_token = page.next_token
+        self.page_cursor = page.cursor
+        self._cursor = page.next_cursor
+        if last:
             self._done = True
-        return getattr(response, self._page_descriptor.resource_field)
+        return page.resources
+
+    @property
+    def cursor(self):
+        """PageCursor: the position at which to resume with the next page,
+        or None once all the pages have been returned."""
+        return self._cursor
+
+    def close(self):
+        """Stops fetching pages ahead of the consumer."""
+        self._done = True
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+
+    def __del__(self):
+        prefetcher = getattr(self, '_prefetcher', None)
+        if prefetcher is not None:
+            prefetcher.close()
 
 
 class ResourceIterator(object):
@@ -491,6 +1240,15 @@ class ResourceIterator(object):
         """For Python 2.7 compatibility; see __next__."""
         return self.__next__()
 
+    @property
+    def cursor(self):
+        """PageCursor: the position of the next resource to be returned, or
+        None once all the resources have been returned."""
+        if not self._current:
+            return self._page_iterator.cursor
+        page_cursor = self._page_iterator.page_cursor
+        return page_cursor._replace(offset=page_cursor.offset + self._index)
+
     def __next__(self):
         """Retrieves the next resource."""
         # pylint: disable=next-method-called
@@ -568,7 +1326,7 @@ class _OperationFuture(object):
         self._result_type = result_type
         self._metadata_type = metadata_type
         self._call_options = call_options
-        self._queue = mp.Queue()
+        self._queue = None
         self._process = None
 
     def cancel(self):
@@ -628,9 +1386,16 @@ class _OperationFuture(object):
         if self._operation.done:
             _try_callback(self, fn)
         else:
+            # These are only needed here, and slow to import.
+            import multiprocessing
+            import dill
+
+            if self._queue is None:
+                self._queue = multiprocessing.Queue()
             self._queue.put(dill.dumps(fn))
             if self._process is None:
-                self._process = mp.Process(target=self._execute_tasks)
+                self._process = multiprocessing.Process(
+                    target=self._execute_tasks)
                 self._process.start()
 
     def operation_name(self):
@@ -707,6 +1472,8 @@ class _OperationFuture(object):
     def _execute_tasks(self):
         self._poll()
 
+        import dill
+
         while not self._queue.empty():
             task = dill.loads(self._queue.get())
             _try_callback(self, task)
@@ -0,0 +1,277 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides priority-aware admission of the calls of a saturated client.
+
+:class:`AdmissionScheduler` bounds the number of attempts in flight across
+all the methods of a client. Once the bound is reached, attempts wait in a
+queue, and are admitted by weighted fair queueing: each (priority, method)
+pair is a flow, and flows get a share of the admissions proportional to the
+weight of their priority, in the order of the virtual finish time of their
+attempts. Interactive calls thus keep being admitted during a backfill,
+without starving it.
+
+The scheduler measures the interval between admissions while it is
+saturated. An attempt whose estimated wait, from its position in the queue
+and that interval, exceeds its timeout is shed up front, failing with
+:class:`google.gax.errors.AdmissionRejectedError`, since it would not
+complete in time anyway; waiting attempts of lower priority ahead of it are
+shed first, lowest priority first, if that lets it make its deadline.
+Attempts still waiting at the end of their timeout are shed then. When the
+queue is full, the waiting attempt with the lowest priority is shed to make
+room for an attempt of higher priority.
+
+:func:`admitted` wraps an API call so that its attempts go through an
+admission scheduler.
+"""
+
+from __future__ import absolute_import, division
+
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from google.gax import errors
+
+
+class _Waiter(object):
+    """An attempt waiting for admission."""
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('priority', 'finish', 'sequence', 'event', 'state')
+
+    def __init__(self, priority, finish, sequence):
+        self.priority = priority
+        self.finish = finish
+        self.sequence = sequence
+        self.event = threading.Event()
+        self.state = None  # None while waiting, then _ADMITTED or _SHED
+
+    def __lt__(self, other):
+        return (self.finish, self.sequence) < (other.finish, other.sequence)
+
+
+_ADMITTED = 'admitted'
+_SHED = 'shed'
+
+
+_INTERVAL_SMOOTHING = 0.2
+"""The weight of the latest interval between admissions in their average."""
+
+
+class AdmissionScheduler(object):
+    """Admits the attempts of the methods of a client by priority."""
+
+    def __init__(self, options):
+        """Constructor.
+
+        Args:
+          options (gax.AdmissionOptions): configures the bounds and the
+            weights of the priorities.
+        """
+        self._options = options
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queue = []  # heap of _Waiter, including shed ones
+        self._waiting = 0
+        self._virtual_time = 0.0
+        self._flow_finish = {}
+        self._sequence = itertools.count()
+        self._admitted_at = None
+        self._admission_interval = None
+
+    @property
+    def in_flight(self):
+        """The number of attempts in flight."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        """The number of attempts waiting for admission."""
+        return self._waiting
+
+    @property
+    def admission_interval(self):
+        """The mean seconds between admissions while saturated, if known."""
+        return self._admission_interval
+
+    def _enqueue(self, priority, flow, timeout=None):
+        """Adds a waiter for ``flow``, shedding one if the queue is full.
+
+        If the wait of the waiter is estimated to exceed ``timeout``, waiters
+        of lower priority ahead of it are shed, or the waiter is rejected.
+        """
+        if self._waiting >= self._options.max_queue_size:
+            lowest = None
+            for waiter in self._queue:
+                if waiter.state is None and (
+                        lowest is None or waiter.priority < lowest.priority or
+                        (waiter.priority == lowest.priority and
+                         waiter.sequence > lowest.sequence)):
+                    lowest = waiter
+            if lowest is None or lowest.priority >= priority:
+                raise errors.AdmissionRejectedError(
+                    'Admission queue is full, the call was not sent')
+            self._shed(lowest)
+
+        weight = self._options.priority_weights[priority]
+        start = max(self._virtual_time, self._flow_finish.get(flow, 0.0))
+        finish = start + 1.0 / weight
+        if timeout is not None and self._admission_interval:
+            self._shed_for_deadline(priority, finish, timeout)
+        self._flow_finish[flow] = finish
+        waiter = _Waiter(priority, finish, next(self._sequence))
+        heapq.heappush(self._queue, waiter)
+        self._waiting += 1
+        return waiter
+
+    def _shed_for_deadline(self, priority, finish, timeout):
+        """Makes room for a waiter estimated to wait beyond ``timeout``.
+
+        The waiter needs an admission for itself and for each live waiter
+        ahead of it, each taking the average admission interval.
+
+        Raises:
+          AdmissionRejectedError: if shedding the waiters of lower priority
+            ahead of it would not let it make its deadline.
+        """
+        ahead = [waiter for waiter in self._queue
+                 if waiter.state is None and waiter.finish <= finish]
+        excess = int(math.ceil(
+            len(ahead) + 1 - timeout / self._admission_interval))
+        if excess <= 0:
+            return
+        lower = sorted([waiter for waiter in ahead
+                        if waiter.priority < priority],
+                       key=lambda waiter: (waiter.priority, -waiter.sequence))
+        if len(lower) < excess:
+            raise errors.AdmissionRejectedError(
+                'The call would not be admitted before its deadline, it was '
+                'not sent')
+        for waiter in lower[:excess]:
+            self._shed(waiter)
+
+    def _shed(self, waiter):
+        waiter.state = _SHED
+        self._waiting -= 1
+        waiter.event.set()
+
+    def acquire(self, priority, flow, timeout=None):
+        """Waits until an attempt is admitted, and counts it as in flight.
+
+        Args:
+          priority (int): the priority of the attempt, an index into the
+            priority weights of the scheduler.
+          flow (object): identifies the method of the attempt.
+          timeout (float): the timeout of the attempt, in seconds, bounding
+            the wait. If None, the attempt waits until it is admitted or shed.
+
+        Raises:
+          AdmissionRejectedError: if the attempt is shed, up front if its
+            estimated wait exceeds ``timeout``.
+          ValueError: if ``priority`` has no weight.
+        """
+        if not 0 <= priority < len(self._options.priority_weights):
+            raise ValueError('Unknown priority: {}'.format(priority))
+        with self._lock:
+            if (self._in_flight < self._options.max_in_flight and
+                    not self._waiting):
+                self._in_flight += 1
+                return
+            waiter = self._enqueue(priority, (priority, flow), timeout)
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.state is None:
+                self._shed(waiter)
+        if waiter.state == _SHED:
+            raise errors.AdmissionRejectedError(
+                'The call was shed before being admitted')
+
+    def release(self):
+        """Records the completion of an attempt admitted by ``acquire``."""
+        with self._lock:
+            self._in_flight -= 1
+            admitted_at = None
+            while self._queue:
+                waiter = heapq.heappop(self._queue)
+                if waiter.state is None:
+                    waiter.state = _ADMITTED
+                    self._waiting -= 1
+                    self._in_flight += 1
+                    self._virtual_time = waiter.finish
+                    waiter.event.set()
+                    admitted_at = time.time()
+                    break
+            if admitted_at is not None and self._admitted_at is not None:
+                # Both admissions happened while saturated, so the interval
+                # between them measures the rate of admission.
+                interval = admitted_at - self._admitted_at
+                if self._admission_interval is None:
+                    self._admission_interval = interval
+                else:
+                    self._admission_interval += _INTERVAL_SMOOTHING * (
+                        interval - self._admission_interval)
+            self._admitted_at = admitted_at
+            if not self._waiting:
+                # The queue only holds shed waiters, if any: start the next
+                # backlog afresh.
+                del self._queue[:]
+                self._virtual_time = 0.0
+                self._flow_finish.clear()
+
+
+def admitted(a_func, scheduler, priority, flow):
+    """Creates a function equivalent to a_func, admitted by ``scheduler``.
+
+    The last positional argument of ``a_func`` must be the timeout of the
+    attempt, which bounds the time spent waiting for admission.
+
+    Shed attempts are never sent: they are not retried, and a circuit breaker
+    guarding them releases them rather than recording an outcome.
+
+    Args:
+      a_func (callable): A callable.
+      scheduler (AdmissionScheduler): The admission scheduler of the client.
+      priority (int): The priority of the calls.
+      flow (object): Identifies the method of the calls.
+
+    Returns:
+      Callable: A function that waits for admission before each call.
+    """
+    def inner(*args, **kwargs):
+        """Equivalent to ``a_func``, but waits for admission."""
+        scheduler.acquire(priority, flow, args[-1] if args else None)
+        try:
+            return a_func(*args, **kwargs)
+        finally:
+            scheduler.release()
+
+    return inner
@@ -31,11 +31,18 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
+import collections
+import operator
+import threading
+
 from future import utils
 
 from google import gax
-from google.gax import bundling
-from google.gax.utils import metrics
+from google.gax import (
+    admission, bundling, circuit_breaker, concurrency_limiter, fanout, hedging,
+    interceptors, multi_list, rate_limiter, response_cache, single_flight,
+    streaming)
+from google.gax.utils import latency, metrics
 
 _MILLIS_PER_SECOND = 1000
 
@@ -71,6 +78,74 @@ def _bundleable(desc):
     return inner
 
 
+def _call_timeout(settings):
+    """Returns the time, in seconds, a call with ``settings`` may take."""
+    if settings.retry and settings.retry.backoff_settings:
+        return (settings.retry.backoff_settings.total_timeout_millis /
+                _MILLIS_PER_SECOND)
+    return settings.timeout
+
+
+def _batchable(desc, batch_api_call):
+    """Creates a function that sends single-item calls as batch calls.
+
+    The returned function schedules the request on the batcher of the settings
+    as a batch request holding only its key, waits for the batch to be sent,
+    and returns the item of the batch response matching the key. The wait is
+    bounded by the timeout of the call, or by the total timeout of its retry
+    options.
+
+    Args:
+      desc (gax.BatchDescriptor): describes the batching that the API call
+        supports.
+      batch_api_call (Callable[[object], object]): makes the batch call.
+
+    Returns:
+      Callable: takes the API call's request and returns the item.
+    """
+    bundle_desc = gax.BundleDescriptor(
+        desc.batched_field, desc.request_discriminator_fields)
+
+    def call_batch(batch_request):
+        """Sends each key once, however many calls requested it."""
+        keys = getattr(batch_request, desc.batched_field)
+        unique_keys = list(collections.OrderedDict.fromkeys(keys))
+        if len(unique_keys) < len(keys):
+            del keys[:]
+            keys.extend(unique_keys)
+        return batch_api_call(batch_request)
+
+    def inner(a_func, settings, request, **kwargs):
+        """Schedules the request as part of a batch."""
+        if not settings.batcher:
+            return a_func(request, **kwargs)
+
+        key = getattr(request, desc.key_field)
+        batch_request = desc.batch_request_type(**dict(
+            (field, getattr(request, field))
+            for field in desc.request_discriminator_fields))
+        getattr(batch_request, desc.batched_field).append(key)
+        the_id = bundling.compute_bundle_id(
+            request, desc.request_discriminator_fields)
+        event = settings.batcher.schedule(
+            call_batch, the_id, bundle_desc, batch_request)
+        if not event.wait(_call_timeout(settings)):
+            event.cancel()
+            raise gax.errors.create_error(
+                'Timed out waiting for the batch of {!r}'.format(key),
+                cause=gax._DeadlineExceededError())
+        if isinstance(event.result, Exception):
+            raise event.result
+
+        for item in getattr(event.result, desc.subresponse_field):
+            if getattr(item, desc.response_key_field) == key:
+                return item
+        raise gax.errors.GaxError(
+            'The batch response has no item for {!r}'.format(key))
+
+    return inner
+
+
 def _page_streamable(page_descriptor):
     """Creates a function that yields an iterable to performs page-streaming.
 
@@ -85,7 +160,10 @@ def _page_streamable(page_descriptor):
     def inner(a_func, settings, request, **kwargs):
         """Actual page-streaming based on the settings."""
         page_iterator = gax.PageIterator(
-            a_func, page_descriptor, settings.page_token, request, **kwargs)
+            a_func, page_descriptor, settings.page_token, request,
+            prefetch_pages=settings.prefetch_pages, cursor=settings.cursor,
+            max_results=settings.max_results,
+            page_sizing=settings.page_sizing, **kwargs)
         if settings.flatten_pages:
             return gax.ResourceIterator(page_iterator)
         else:
@@ -99,11 +177,11 @@ def _construct_bundling(bundle_config, bundle_descriptor):
 
     Args:
       bundle_config (dict): A dictionary specifying a bundle parameters, the
-        value for 'bundling' field in a method config (See
+        value for 'bundling' or 'batching' field in a method config (See
         ``construct_settings()`` for information on this config.)
-      bundle_descriptor (BundleDescriptor): A BundleDescriptor object
-        describing the structure of bundling for this method. If not set,
-        this method will not bundle.
+      bundle_descriptor (Union[BundleDescriptor, BatchDescriptor]): A
+        descriptor of the structure of bundling or batching for this method.
+        If not set, this method will not bundle.
 
     Returns:
       Tuple[bundling.Executor, BundleDescriptor]: A tuple that configures
@@ -125,6 +203,178 @@ def _construct_bundling(bundle_config, bundle_descriptor):
     return bundler
 
 
+def _check_batching_delay(batcher):
+    """Rejects a batcher that may hold a lone call indefinitely.
+
+    Raises:
+      ValueError: if ``batcher`` has no delay threshold.
+    """
+    # pylint: disable=protected-access
+    if not batcher._options.delay_threshold > 0:
+        raise ValueError('Batching requires a delay_threshold_millis greater '
+                         'than 0, so that calls are not held until enough '
+                         'others arrive')
+
+
+def _construct_batching(batch_config, batch_descriptor):
+    """Helper for ``construct_settings()``.
+
+    Like ``_construct_bundling()``, for the 'batching' field of a method
+    config.
+
+    Raises:
+      ValueError: if the config has no positive ``delay_threshold_millis``.
+    """
+    batcher = _construct_bundling(batch_config, batch_descriptor)
+    if batcher is not None:
+        _check_batching_delay(batcher)
+    return batcher
+
+
+def _construct_hedging(hedging_config, retry_options):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      hedging_config (dict): A dictionary specifying the hedging parameters,
+        the value for 'hedging' field in a method config (See
+        ``construct_settings()`` for information on this config.)
+      retry_options (RetryOptions): The retry options of the method.
+
+    Returns:
+      Optional[RetryOptions]: The retry options, updated with the hedging
+        policy if the method is idempotent.
+    """
+    if not (hedging_config and retry_options and retry_options.retry_codes):
+        return retry_options
+
+    return retry_options._replace(hedging=gax.HedgingOptions(
+        delay_millis=hedging_config.get('delay_millis'),
+        max_hedged_attempts=hedging_config.get('max_hedged_attempts', 1),
+        budget_ratio=hedging_config.get('budget_ratio', 0.1)))
+
+
+def _construct_adaptive_timeout(adaptive_config, retry_options):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      adaptive_config (dict): A dictionary specifying the adaptive timeout
+        parameters, the value for 'adaptive_timeout' field in a method config
+        (See ``construct_settings()`` for information on this config.)
+      retry_options (RetryOptions): The retry options of the method.
+
+    Returns:
+      Optional[RetryOptions]: The retry options, updated with the adaptive
+        timeout policy if the method retries.
+    """
+    if not (adaptive_config and retry_options and retry_options.retry_codes):
+        return retry_options
+
+    return retry_options._replace(adaptive_timeout=gax.AdaptiveTimeoutOptions(
+        percentile=adaptive_config.get('percentile', 99.0),
+        margin=adaptive_config.get('margin', 2.0),
+        min_timeout_millis=adaptive_config.get('min_timeout_millis', 100)))
+
+
+def _construct_response_cache(cache_config):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      cache_config (dict): A dictionary specifying the response cache
+        parameters, the value for 'response_cache' field in a method config
+        (See ``construct_settings()`` for information on this config.)
+
+    Returns:
+      Optional[response_cache.ResponseCache]: The response cache of the
+        method, or None if its responses are not cached.
+    """
+    if not cache_config:
+        return None
+
+    return response_cache.ResponseCache(gax.ResponseCacheOptions(
+        ttl_millis=cache_config.get('ttl_millis', 1000),
+        max_entries=cache_config.get('max_entries', 1000)))
+
+
+def _construct_rate_limit_options(rate_limit_config):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      rate_limit_config (dict): A dictionary specifying the rate limit
+        parameters, the value for 'rate_limit' field in a method config (See
+        ``construct_settings()`` for information on this config.)
+
+    Returns:
+      Optional[RateLimitOptions]: The options of the rate limit of the
+        method, or None if its rate is not limited.
+    """
+    if not rate_limit_config:
+        return None
+
+    return gax.RateLimitOptions(
+        qps=rate_limit_config['qps'],
+        burst=rate_limit_config.get('burst'),
+        fail_fast=rate_limit_config.get('fail_fast', False))
+
+
+def _construct_concurrency_limit_options(concurrency_config):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      concurrency_config (dict): A dictionary specifying the concurrency
+        limit parameters, the value for 'concurrency_limit' field in a method
+        config (See ``construct_settings()`` for information on this config.)
+
+    Returns:
+      Optional[ConcurrencyLimitOptions]: The options of the concurrency limit
+        of the method, or None if its concurrency is not limited.
+    """
+    if not concurrency_config:
+        return None
+
+    return gax.ConcurrencyLimitOptions(**concurrency_config)
+
+
+def _construct_adaptive_page_size_options(page_size_config):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      page_size_config (dict): A dictionary specifying the page size
+        parameters, the value for 'adaptive_page_size' field in a method
+        config (See ``construct_settings()`` for information on this config.)
+
+    Returns:
+      Optional[AdaptivePageSizeOptions]: The options of the growth of the
+        page size of the method, or None if it is not adapted.
+    """
+    if not page_size_config:
+        return None
+
+    return gax.AdaptivePageSizeOptions(**page_size_config)
+
+
+def _construct_admission(service_config, overrides):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      service_config (dict): The entry of the service in the ``interfaces``
+        of the standard API client config file. (See ``construct_settings()``
+        for information on this config.)
+      overrides (dict): The entry of the service in the config override.
+
+    Returns:
+      Optional[admission.AdmissionScheduler]: The admission scheduler shared
+        by the methods of the client, or None if calls are not admitted by
+        priority.
+    """
+    admission_config = overrides.get(
+        'admission', service_config.get('admission'))
+    if not admission_config:
+        return None
+
+    return admission.AdmissionScheduler(
+        gax.AdmissionOptions(**admission_config))
+
+
 def _construct_retry(method_config, retry_codes, retry_params, retry_names):
     """Helper for ``construct_settings()``.
 
@@ -156,17 +406,60 @@ def _construct_retry(method_config, retry_codes, retry_params, retry_names):
             codes = []
 
     backoff_settings = None
+    backoff_overrides = None
     if retry_params and 'retry_params_name' in method_config:
         params_name = method_config['retry_params_name']
         if params_name and params_name in retry_params:
-            backoff_settings = gax.BackoffSettings(**retry_params[params_name])
+            params = dict(retry_params[params_name])
+            code_params = params.pop('backoff_overrides', None)
+            backoff_settings = gax.BackoffSettings(**params)
+            if code_params:
+                backoff_overrides = dict(
+                    (retry_names[name], backoff_settings._replace(**override))
+                    for name, override in code_params.items())
 
     return gax.RetryOptions(
         backoff_settings=backoff_settings,
         retry_codes=codes,
+        backoff_overrides=backoff_overrides,
     )
 
 
+def _construct_circuit_breaker_options(method_config, overriding_method,
+                                       breaker_params, overriding_params):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      method_config (dict): A dictionary representing a single ``methods``
+        entry of the standard API client config file. (See
+        ``construct_settings()`` for information on this yaml.)
+      overriding_method (dict): The ``methods`` entry overriding
+        ``method_config``, or None.
+      breaker_params (dict): A dictionary parsed from the
+        ``circuit_breaker_params`` entry of the standard API client config
+        file.
+      overriding_params (dict): The ``circuit_breaker_params`` entry of the
+        config override, or None.
+
+    Returns:
+      Optional[CircuitBreakerOptions]: The options of the circuit breaker of
+        the method, or None if it does not use one.
+    """
+    params_name = method_config.get('circuit_breaker_params_name')
+    if overriding_method and 'circuit_breaker_params_name' in overriding_method:
+        params_name = overriding_method['circuit_breaker_params_name']
+    if not params_name:
+        return None
+
+    params = (overriding_params or {}).get(params_name)
+    if params is None:
+        params = (breaker_params or {}).get(params_name)
+    if params is None:
+        return None
+
+    return gax.CircuitBreakerOptions(**params)
+
+
 def _merge_retry_options(retry_options, overrides):
     """Helper for ``construct_settings()``.
 
@@ -191,12 +484,17 @@ def _merge_retry_options(retry_options, overrides):
     if overrides.retry_codes is not None:
         codes = overrides.retry_codes
     backoff_settings = retry_options.backoff_settings
+    backoff_overrides = retry_options.backoff_overrides
     if overrides.backoff_settings is not None:
         backoff_settings = overrides.backoff_settings
+        backoff_overrides = overrides.backoff_overrides
 
     return gax.RetryOptions(
         backoff_settings=backoff_settings,
         retry_codes=codes,
+        hedging=retry_options.hedging,
+        adaptive_timeout=retry_options.adaptive_timeout,
+        backoff_overrides=backoff_overrides,
     )
 
 
@@ -213,10 +511,154 @@ def _upper_camel_to_lower_under(string):
     return out
 
 
+def _overridden(field, method_config, overriding_method, default=None):
+    """Helper for ``construct_settings()``.
+
+    Args:
+      field (str): The name of a field of a ``methods`` entry.
+      method_config (dict): A dictionary representing a single ``methods``
+        entry of the standard API client config file.
+      overriding_method (dict): The ``methods`` entry overriding
+        ``method_config``, or None.
+      default (object): The value if neither entry sets ``field``.
+
+    Returns:
+      object: The value of ``field`` in ``overriding_method`` if it sets it,
+        or else in ``method_config``.
+    """
+    if overriding_method and field in overriding_method:
+        return overriding_method[field]
+    return method_config.get(field, default)
+
+
+_COMPILED_CONFIG_CACHE_SIZE = 32
+
+_MethodConfig = collections.namedtuple(
+    '_MethodConfig',
+    ['snake_name', 'timeout', 'retry', 'bundling', 'batching',
+     'circuit_breaker', 'response_cache', 'single_flight', 'wait_for_ready',
+     'rate_limit', 'concurrency_limit', 'priority', 'adaptive_page_size'])
+"""The settings of a method resolved from a client config and its override.
+
+They hold no per-client state, so they are shared by the clients built from
+the same config.
+"""
+
+_compiled_configs = collections.OrderedDict()
+_compiled_configs_lock = threading.Lock()
+
+
+def _compile_service_config(service_name, client_config, config_override,
+                            retry_names):
+    """Helper for ``construct_settings()``.
+
+    Resolves the settings of each method of a service. The result is cached
+    per service, ``client_config`` and ``retry_names`` object and override
+    value, so the clients of a service built from the same packaged config
+    resolve it only once; ``client_config`` must not be modified once used.
+
+    Args:
+      service_name (str): The fully-qualified name of the service.
+      client_config (dict): A dictionary parsed from the standard API client
+        config file.
+      config_override (dict): A dictionary in the same structure of
+        client_config to override the settings.
+      retry_names (Mapping[str, object]): A dictionary mapping the strings
+        referring to response status codes to the Python objects representing
+        those codes.
+
+    Returns:
+      Tuple[_MethodConfig]: The settings of each method.
+
+    Raises:
+      KeyError: If the configuration for the service in question cannot be
+        located in the provided ``client_config``.
+    """
+    overrides = config_override.get('interfaces', {}).get(service_name, {})
+    try:
+        key = (service_name, id(client_config), id(retry_names),
+               _freeze(overrides))
+        hash(key)
+    except TypeError:
+        key = None
+
+    entry = _compiled_configs.get(key) if key else None
+    if (entry is not None and entry[0] is client_config and
+            entry[1] is retry_names):
+        return entry[2]
+
+    try:
+        service_config = client_config['interfaces'][service_name]
+    except KeyError:
+        raise KeyError('Client configuration not found for service: {}'
+                       .format(service_name))
+
+    method_configs = []
+    for method in service_config.get('methods'):
+        method_config = service_config['methods'][method]
+        overriding_method = overrides.get('methods', {}).get(method, {})
+
+        if overriding_method and overriding_method.get('timeout_millis'):
+            timeout = overriding_method['timeout_millis']
+        else:
+            timeout = method_config['timeout_millis']
+        timeout /= _MILLIS_PER_SECOND
+
+        retry_options = _merge_retry_options(
+            _construct_retry(method_config, service_config['retry_codes'],
+                             service_config['retry_params'], retry_names),
+            _construct_retry(overriding_method, overrides.get('retry_codes'),
+                             overrides.get('retry_params'), retry_names))
+        retry_options = _construct_hedging(
+            _overridden('hedging', method_config, overriding_method),
+            retry_options)
+        retry_options = _construct_adaptive_timeout(
+            _overridden('adaptive_timeout', method_config, overriding_method),
+            retry_options)
+
+        method_configs.append(_MethodConfig(
+            snake_name=_upper_camel_to_lower_under(method),
+            timeout=timeout,
+            retry=retry_options,
+            bundling=_overridden(
+                'bundling', method_config, overriding_method),
+            batching=_overridden(
+                'batching', method_config, overriding_method),
+            circuit_breaker=_construct_circuit_breaker_options(
+                method_config, overriding_method,
+                service_config.get('circuit_breaker_params'),
+                overrides.get('circuit_breaker_params')),
+            response_cache=_overridden(
+                'response_cache', method_config, overriding_method),
+            single_flight=bool(_overridden(
+                'single_flight', method_config, overriding_method, False)),
+            wait_for_ready=bool(_overridden(
+                'wait_for_ready', method_config, overriding_method, False)),
+            rate_limit=_construct_rate_limit_options(_overridden(
+                'rate_limit', method_config, overriding_method)),
+            concurrency_limit=_construct_concurrency_limit_options(_overridden(
+                'concurrency_limit', method_config, overriding_method)),
+            priority=_overridden('priority', method_config, overriding_method,
+                                 gax.PRIORITY_NORMAL),
+            adaptive_page_size=_construct_adaptive_page_size_options(
+                _overridden('adaptive_page_size', method_config,
+                            overriding_method))))
+    method_configs = tuple(method_configs)
+
+    if key:
+        with _compiled_configs_lock:
+            _compiled_configs[key] = (
+                client_config, retry_names, method_configs)
+            while len(_compiled_configs) > _COMPILED_CONFIG_CACHE_SIZE:
+                _compiled_configs.popitem(last=False)
+    return method_configs
+
+
 def construct_settings(
         service_name, client_config, config_override,
         retry_names, bundle_descriptors=None, page_descriptors=None,
-        metrics_headers=(), kwargs=None):
+        metrics_headers=(), kwargs=None, method_interceptors=None,
+        batch_descriptors=None, stream_descriptors=None):
     """Constructs a dictionary mapping method names to _CallSettings.
 
     The ``client_config`` parameter is parsed from a client configuration JSON
@@ -228,7 +670,8 @@ def construct_settings(
          "interfaces": {
            "google.fake.v1.ServiceName": {
              "retry_codes": {
-               "idempotent": ["UNAVAILABLE", "DEADLINE_EXCEEDED"],
+               "idempotent": ["UNAVAILABLE", "DEADLINE_EXCEEDED",
+                              "RESOURCE_EXHAUSTED"],
                "non_idempotent": []
              },
              "retry_params": {
@@ -239,7 +682,28 @@ def construct_settings(
                  "initial_rpc_timeout_millis": 2000,
                  "rpc_timeout_multiplier": 1.5,
                  "max_rpc_timeout_millis": 30000,
-                 "total_timeout_millis": 45000
+                 "total_timeout_millis": 45000,
+                 "backoff_overrides": {
+                   "RESOURCE_EXHAUSTED": {
+                     "initial_retry_delay_millis": 1000,
+                     "retry_delay_multiplier": 2.0,
+                     "max_retry_delay_millis": 20000
+                   }
+                 }
+               }
+             },
+             "admission": {
+               "max_in_flight": 100,
+               "max_queue_size": 1000,
+               "priority_weights": [1, 4, 16]
+             },
+             "circuit_breaker_params": {
+               "default": {
+                 "failure_ratio_threshold": 0.5,
+                 "minimum_calls": 20,
+                 "window_millis": 10000,
+                 "open_millis": 5000,
+                 "half_open_probes": 3
                }
              },
              "methods": {
@@ -248,6 +712,52 @@ def construct_settings(
                  "retry_params_name": "default",
                  "timeout_millis": 30000
                },
+               "GetFoo": {
+                 "retry_codes_name": "idempotent",
+                 "retry_params_name": "default",
+                 "circuit_breaker_params_name": "default",
+                 "timeout_millis": 30000,
+                 "priority": 2,
+                 "hedging": {
+                   "delay_millis": 50,
+                   "max_hedged_attempts": 1,
+                   "budget_ratio": 0.1
+                 },
+                 "adaptive_timeout": {
+                   "percentile": 99,
+                   "margin": 2.0,
+                   "min_timeout_millis": 100
+                 },
+                 "response_cache": {
+                   "ttl_millis": 1000,
+                   "max_entries": 1000
+                 },
+                 "single_flight": true,
+                 "wait_for_ready": true,
+                 "rate_limit": {
+                   "qps": 50,
+                   "burst": 100,
+                   "fail_fast": false
+                 },
+                 "concurrency_limit": {
+                   "initial_limit": 20,
+                   "max_limit": 1000,
+                   "max_wait_millis": 1000
+                 },
+                 "batching": {
+                   "element_count_threshold": 100,
+                   "delay_threshold_millis": 5
+                 }
+               },
+               "ListFoos": {
+                 "retry_codes_name": "idempotent",
+                 "retry_params_name": "default",
+                 "timeout_millis": 30000,
+                 "adaptive_page_size": {
+                   "initial_page_size": 50,
+                   "max_page_size": 1000
+                 }
+               },
                "Publish": {
                  "retry_codes_name": "non_idempotent",
                  "retry_params_name": "default",
@@ -269,7 +779,8 @@ def construct_settings(
         key into the client config file (in the example above, this value
         would be ``google.fake.v1.ServiceName``).
       client_config (dict): A dictionary parsed from the standard API client
-        config file.
+        config file. The settings resolved from it are cached, so it must not
+        be modified once used.
       bundle_descriptors (Mapping[str, BundleDescriptor]): A dictionary of
         method names to BundleDescriptor objects for methods that are
         bundling-enabled.
@@ -287,6 +798,15 @@ def construct_settings(
         for analytics. Sent as a dictionary; eventually becomes a
         space-separated string (e.g. 'foo/1.0.0 bar/3.14.1').
       kwargs (dict): The keyword arguments to be passed to the API calls.
+      method_interceptors (Mapping[str, Sequence[Callable]]): A dictionary of
+        method names to the interceptors wrapping the calls of those methods,
+        in addition to those registered with ``gax.interceptors.register``.
+      batch_descriptors (Mapping[str, BatchDescriptor]): A dictionary of
+        method names to BatchDescriptor objects for single-item methods whose
+        calls may be batched.
+      stream_descriptors (Mapping[str, StreamDescriptor]): A dictionary of
+        method names to StreamDescriptor objects for server-streaming methods
+        that can be resumed.
 
     Returns:
       dict: A dictionary mapping method names to _CallSettings.
@@ -300,6 +820,9 @@ def construct_settings(
     defaults = {}
     bundle_descriptors = bundle_descriptors or {}
     page_descriptors = page_descriptors or {}
+    method_interceptors = method_interceptors or {}
+    batch_descriptors = batch_descriptors or {}
+    stream_descriptors = stream_descriptors or {}
     kwargs = kwargs or {}
 
     # Sanity check: It is possible that we got this far but some headers
@@ -318,45 +841,51 @@ def construct_settings(
     # to a string in the format that the GRPC layer expects.
     kwargs.setdefault('metadata', [])
     kwargs['metadata'].append(
-        ('x-goog-api-client', metrics.stringify(metrics.fill(metrics_headers)))
+        ('x-goog-api-client', metrics.header_value(metrics_headers))
     )
 
-    try:
-        service_config = client_config['interfaces'][service_name]
-    except KeyError:
-        raise KeyError('Client configuration not found for service: {}'
-                       .format(service_name))
-
-    overrides = config_override.get('interfaces', {}).get(service_name, {})
-
-    for method in service_config.get('methods'):
-        method_config = service_config['methods'][method]
-        overriding_method = overrides.get('methods', {}).get(method, {})
-        snake_name = _upper_camel_to_lower_under(method)
-
-        if overriding_method and overriding_method.get('timeout_millis'):
-            timeout = overriding_method['timeout_millis']
-        else:
-            timeout = method_config['timeout_millis']
-        timeout /= _MILLIS_PER_SECOND
-
+    method_configs = _compile_service_config(
+        service_name, client_config, config_override, retry_names)
+    scheduler = _construct_admission(
+        client_config['interfaces'][service_name],
+        config_override.get('interfaces', {}).get(service_name, {}))
+    for method_config in method_configs:
+        snake_name = method_config.snake_name
         bundle_descriptor = bundle_descriptors.get(snake_name)
-        bundling_config = method_config.get('bundling', None)
-        if overriding_method and 'bundling' in overriding_method:
-            bundling_config = overriding_method['bundling']
-        bundler = _construct_bundling(bundling_config, bundle_descriptor)
-
-        retry_options = _merge_retry_options(
-            _construct_retry(method_config, service_config['retry_codes'],
-                             service_config['retry_params'], retry_names),
-            _construct_retry(overriding_method, overrides.get('retry_codes'),
-                             overrides.get('retry_params'), retry_names))
+        batch_descriptor = batch_descriptors.get(snake_name)
+        breaker = None
+        if method_config.circuit_breaker:
+            breaker = circuit_breaker.CircuitBreaker(
+                method_config.circuit_breaker)
+        limiter = None
+        if method_config.rate_limit:
+            limiter = rate_limiter.RateLimiter(method_config.rate_limit)
+        concurrency = None
+        if method_config.concurrency_limit:
+            concurrency = concurrency_limiter.ConcurrencyLimiter(
+                method_config.concurrency_limit)
+        method_kwargs = kwargs
+        if method_config.wait_for_ready:
+            method_kwargs = dict(kwargs, wait_for_ready=True)
 
         defaults[snake_name] = gax._CallSettings(
-            timeout=timeout, retry=retry_options,
+            timeout=method_config.timeout, retry=method_config.retry,
             page_descriptor=page_descriptors.get(snake_name),
-            bundler=bundler, bundle_descriptor=bundle_descriptor,
-            kwargs=kwargs)
+            bundler=_construct_bundling(
+                method_config.bundling, bundle_descriptor),
+            bundle_descriptor=bundle_descriptor,
+            kwargs=method_kwargs, circuit_breaker=breaker,
+            interceptors=method_interceptors.get(snake_name, ()),
+            response_cache=_construct_response_cache(
+                method_config.response_cache),
+            single_flight=method_config.single_flight,
+            batcher=_construct_batching(
+                method_config.batching, batch_descriptor),
+            batch_descriptor=batch_descriptor,
+            rate_limiter=limiter, concurrency_limiter=concurrency,
+            admission=scheduler, priority=method_config.priority,
+            stream_descriptor=stream_descriptors.get(snake_name),
+            page_sizing=method_config.adaptive_page_size)
     return defaults
 
 
@@ -370,12 +899,14 @@ def _catch_errors(a_func, to_catch):
     Returns:
         Callable: A function that will wrap certain exceptions with GaxError
     """
+    to_catch = tuple(to_catch)
+
     def inner(*args, **kwargs):
         """Wraps specified exceptions"""
         try:
             return a_func(*args, **kwargs)
         # pylint: disable=catching-non-exception
-        except tuple(to_catch) as exception:
+        except to_catch as exception:
             utils.raise_with_traceback(
                 gax.errors.create_error('RPC failed', cause=exception))
 
@@ -392,19 +923,106 @@ def _merge_options_metadata(options, settings):
 
     kwarg_meta_dict = {}
     merged_kwargs = options.kwargs.copy()
+    merged_kwargs['metadata'] = list(merged_kwargs['metadata'])
     for kwarg_meta in merged_kwargs['metadata']:
         kwarg_meta_dict[kwarg_meta[0].lower()] = kwarg_meta
     for kwarg_meta in settings.kwargs['metadata']:
         if kwarg_meta[0].lower() not in kwarg_meta_dict:
             merged_kwargs['metadata'].append(kwarg_meta)
-    return gax.CallOptions(
-        timeout=options.timeout, retry=options.retry,
-        page_token=options.page_token,
-        is_bundling=options.is_bundling,
-        **merged_kwargs)
+    # A copy of ``options``, already validated, so its constructor is skipped.
+    merged = object.__new__(type(options))
+    merged.__dict__.update(options.__dict__)
+    merged.kwargs = merged_kwargs
+    return merged
+
+
+_API_CALL_CACHE_SIZE = 64
+"""The number of compiled API calls cached for recurring CallOptions."""
 
 
-def create_api_call(func, settings):
+def _freeze(value):
+    """Converts the lists and dicts within ``value`` to hashable tuples.
+
+    Raises:
+      TypeError: if the keys of a dict within ``value`` cannot be ordered.
+    """
+    if isinstance(value, dict):
+        return (dict, tuple(sorted(
+            [(key, _freeze(item)) for key, item in value.items()],
+            key=_ENTRY_KEY)))
+    if isinstance(value, list):
+        return (list, tuple([_freeze(item) for item in value]))
+    if isinstance(value, gax.RetryOptions):
+        return tuple([_freeze(field) for field in value])
+    return value
+
+
+_ENTRY_KEY = operator.itemgetter(0)
+
+
+class _ApiCallCache(object):
+    """A bounded cache of the API calls compiled for recurring CallOptions.
+
+    Options are recognized by identity, so that a cache hit costs a single
+    dict lookup; ``CallOptions`` must therefore not be modified once they
+    have been used. They are only compiled and cached once they recur: the
+    first sighting of an instance is merely remembered, so options built
+    afresh for each call, e.g. with per-call metadata, are merged and
+    compiled per call as they would be without a cache. Cache hits do not
+    take a lock. When the cache is full, the oldest entry is evicted.
+    """
+
+    def __init__(self, compile_call, maxsize=_API_CALL_CACHE_SIZE):
+        """Constructor.
+
+        Args:
+          compile_call (Callable[[CallOptions], Tuple[_CallSettings,
+            Callable]]): compiles the merged settings and API call for a
+            CallOptions.
+          maxsize (int): the maximum number of cached API calls, and of
+            options remembered as seen once; the latter are forgotten all at
+            once when there are too many.
+        """
+        self._compile_call = compile_call
+        self._maxsize = maxsize
+        # Both map the id of the options to the options themselves, which
+        # keeps them alive so that their id is not reused.
+        self._entries = collections.OrderedDict()
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def get(self, options):
+        """Returns the merged settings and compiled API call for ``options``.
+
+        Returns:
+          Optional[Tuple[_CallSettings, Callable]]: the cached entry, or None
+            if ``options`` has not recurred yet, in which case the caller
+            merges and compiles them itself.
+        """
+        key = id(options)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] is options:
+            return cached[1]
+
+        # Single dict operations are atomic, so the options seen once are
+        # tracked without the lock; at worst, options racing with themselves
+        # are compiled twice.
+        seen = self._seen
+        if seen.pop(key, None) is not options:
+            if len(seen) >= self._maxsize:
+                seen.clear()
+            seen[key] = options
+            return None
+
+        entry = self._compile_call(options)
+        with self._lock:
+            self._entries[key] = (options, entry)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+
+def create_api_call(func, settings, batch_func=None):
     """Converts an rpc call into an API call governed by the settings.
 
     In typical usage, ``func`` will be a callable used to make an rpc request.
@@ -415,14 +1033,68 @@ def create_api_call(func, settings):
     in this module to ``func``.  ``settings`` is used to determine which
     function decorators to apply.
 
+    The decorated call for ``settings`` is compiled once, when this function
+    is called. The calls compiled for the ``CallOptions`` instances passed to
+    the result are cached once an instance recurs, so reused options are not
+    merged and compiled again; options must not be modified once used.
+
     The result is another callable which for most values of ``settings`` has
     has the same signature as the original. Only when ``settings`` configures
     bundling does the signature change.
 
+    The result also has a ``map(requests, concurrency=10, options=None,
+    ordered=True)`` method, which makes a call for each of ``requests`` with up
+    to ``concurrency`` of them in flight at once, using the future-style
+    invocation of ``func`` rather than threads. It yields the responses in the
+    order of ``requests``, or ``(request, response)`` pairs as the calls
+    complete if ``ordered`` is False. It is not available for page-streamed,
+    bundled or batched calls.
+
+    For page-streamed calls, the result instead has a ``list_many(requests,
+    concurrency=10, options=None, ordered=True, buffered_pages=2)`` method,
+    which walks the pages of each of ``requests`` with up to ``concurrency``
+    of them at once, on threads, and merges their resources; see
+    ``gax.multi_list``. Each page is fetched as a call of its own.
+
+    Each attempt of the calls, except those made by ``map``, is passed
+    through the interceptors of ``settings`` and those registered with
+    ``gax.interceptors.register`` beforehand; see ``gax.interceptors``.
+
+    If ``settings`` has a rate limiter, each attempt of the calls, including
+    those made by ``map``, takes a token from it; see ``gax.rate_limiter``.
+    Bundled calls take a token per bundle.
+
+    If ``settings`` has a concurrency limiter, each attempt of the calls,
+    except those made by ``map``, waits for it; see
+    ``gax.concurrency_limiter``. It is available as the
+    ``concurrency_limiter`` attribute of the result, e.g. to monitor its limit
+    and queue depth.
+
+    If ``settings`` has an admission scheduler, each attempt of the calls,
+    except those made by ``map``, is admitted by it, according to the
+    priority of the call; see ``gax.admission``.
+
+    If ``settings`` has a response cache, calls whose response is cached, for
+    the same request and keyword arguments, e.g. metadata, are answered from
+    it without any RPC. The cache is available as the
+    ``response_cache`` attribute of the result, e.g. to invalidate it.
+
+    If ``settings`` enables single flight, concurrent calls with identical
+    requests and options share a single RPC; see ``gax.single_flight``.
+
+    If ``settings`` configures batching and ``batch_func`` is given, calls
+    without ``CallOptions`` are collected and sent as batch calls through
+    ``batch_func``, with the settings of the method; each returns the item of
+    the batch response matching its request. Batching requires a delay
+    threshold, and each call waits for its batch at most for its timeout.
+
     Args:
       func (Callable[Sequence[object], object]): is used to make a bare rpc
         call.
       settings (_CallSettings): provides the settings for this call
+      batch_func (Callable[Sequence[object], object]): is used to make a bare
+        rpc call of the batch counterpart of ``func``. If None, calls are not
+        batched.
 
     Returns:
       Callable[Sequence[object], object]: a bound method on a request stub used
@@ -437,28 +1109,199 @@ def create_api_call(func, settings):
         """Simply call api_call and ignore settings."""
         return api_call(*args)
 
-    def inner(request, options=None):
-        """Invoke with the actual settings."""
-        this_options = _merge_options_metadata(options, settings)
-        this_settings = settings.merge(this_options)
-
-        if this_settings.retry and this_settings.retry.retry_codes:
-            api_call = gax.retry.retryable(
-                func, this_settings.retry, **this_settings.kwargs)
+    def compile_api_call(this_settings):
+        """Applies the decorators configured by ``this_settings`` to func."""
+        retrying = this_settings.retry and this_settings.retry.retry_codes
+        to_call = func
+        if retrying and this_settings.retry.hedging:
+            to_call = hedging.hedgeable(
+                to_call, this_settings.retry.hedging, hedger)
+        if this_settings.concurrency_limiter:
+            to_call = concurrency_limiter.limited(
+                to_call, this_settings.concurrency_limiter)
+        if this_settings.admission:
+            to_call = admission.admitted(
+                to_call, this_settings.admission, this_settings.priority,
+                func)
+        if this_settings.circuit_breaker:
+            to_call = circuit_breaker.guarded(
+                to_call, this_settings.circuit_breaker)
+        if this_settings.rate_limiter:
+            to_call = rate_limiter.limited(to_call, this_settings.rate_limiter)
+
+        def wrap(attempt):
+            """Makes the call by retrying ``attempt`` or adding a timeout."""
+            if retrying:
+                return gax.retry.retryable(
+                    attempt, this_settings.retry, latency=attempt_latency,
+                    **this_settings.kwargs)
+            return gax.retry.add_timeout_arg(
+                attempt, this_settings.timeout, **this_settings.kwargs)
+
+        if chain:
+            api_call = interceptors.intercept(
+                to_call, chain, this_settings, wrap)
         else:
-            api_call = gax.retry.add_timeout_arg(
-                func, this_settings.timeout, **this_settings.kwargs)
+            api_call = wrap(to_call)
         api_call = _catch_errors(api_call, gax.config.API_ERRORS)
+        if this_settings.single_flight:
+            api_call = single_flight.coalesced(api_call)
+        if this_settings.response_cache is not None:
+            api_call = response_cache.cached(
+                api_call, this_settings.response_cache, this_settings.kwargs)
+        return api_call
+
+    def compile_options(options):
+        """Merges ``options`` into the settings and compiles the API call."""
+        this_options = _merge_options_metadata(options, settings)
+        this_settings = settings.merge(this_options)._replace(
+            page_token=settings.page_token,
+            prefetch_pages=settings.prefetch_pages,
+            cursor=settings.cursor,
+            max_results=settings.max_results)
+        return this_settings, compile_api_call(this_settings)
+
+    def settings_for(options):
+        """Returns the settings and compiled API call for ``options``."""
+        if not options:
+            return settings, default_api_call
+
+        entry = api_call_cache.get(options)
+        if entry is None:
+            this_settings = settings.merge(
+                _merge_options_metadata(options, settings))
+            return this_settings, compile_api_call(this_settings)
+
+        this_settings, api_call = entry
+        changes = {}
+        if options.page_token != gax.OPTION_INHERIT:
+            changes['page_token'] = options.page_token
+        if options.prefetch_pages != gax.OPTION_INHERIT:
+            changes['prefetch_pages'] = options.prefetch_pages
+        if options.cursor != gax.OPTION_INHERIT:
+            changes['cursor'] = options.cursor
+        if options.max_results != gax.OPTION_INHERIT:
+            changes['max_results'] = options.max_results
+        if changes:
+            this_settings = this_settings._replace(**changes)
+        return this_settings, api_call
+
+    def inner(request, options=None):
+        """Invoke with the actual settings."""
+        this_settings, api_call = settings_for(options)
         return api_caller(api_call, this_settings, request)
 
+    def map_requests(requests, concurrency=10, options=None, ordered=True):
+        """Invoke for each of ``requests``, many at once."""
+        if api_caller is not base_caller:
+            raise ValueError('map is not supported for page-streamed, '
+                             'bundled or batched calls')
+        this_settings, _ = settings_for(options)
+        return fanout.map_calls(
+            func, this_settings, requests, concurrency, ordered)
+
+    def list_requests(requests, concurrency=10, options=None, ordered=True,
+                      buffered_pages=2):
+        """List the resources of each of ``requests``, many at once."""
+        if not settings.page_descriptor:
+            raise ValueError('list_many is only supported for page-streamed '
+                             'calls')
+        this_settings, api_call = settings_for(options)
+        this_settings = this_settings._replace(
+            page_token=gax.INITIAL_PAGE, cursor=None)
+        return multi_list.merge_listings(
+            lambda request: api_caller(api_call, this_settings, request),
+            requests, concurrency, ordered, buffered_pages)
+
     if settings.page_descriptor:
         if settings.bundler and settings.bundle_descriptor:
             raise ValueError('The API call has incompatible settings: '
                              'bundling and page streaming')
         api_caller = _page_streamable(settings.page_descriptor)
     elif settings.bundler and settings.bundle_descriptor:
+        if settings.batcher and settings.batch_descriptor and batch_func:
+            raise ValueError('The API call has incompatible settings: '
+                             'bundling and batching')
         api_caller = _bundleable(settings.bundle_descriptor)
+    elif settings.batcher and settings.batch_descriptor and batch_func:
+        _check_batching_delay(settings.batcher)
+        batch_settings = settings._replace(
+            batcher=None, batch_descriptor=None, response_cache=None,
+            single_flight=False)
+        api_caller = _batchable(
+            settings.batch_descriptor,
+            create_api_call(batch_func, batch_settings))
     else:
         api_caller = base_caller
 
+    hedger = hedging.Hedger()
+    attempt_latency = latency.LatencyTracker()
+    chain = interceptors.chain(settings)
+    default_api_call = compile_api_call(settings)
+    api_call_cache = _ApiCallCache(compile_options)
+
+    inner.map = map_requests
+    inner.list_many = list_requests
+    inner.response_cache = settings.response_cache
+    inner.concurrency_limiter = settings.concurrency_limiter
+    return inner
+
+
+def create_stream_call(func, settings):
+    """Converts a server-streaming rpc call into an API call governed by the
+    settings.
+
+    The result returns a :class:`gax.streaming.ResumableStream` over the
+    responses of the call. The call is retried according to ``settings``:
+    until it receives a response, it is issued again; afterwards, only if
+    ``settings`` has a stream descriptor, resuming after the latest resume
+    token received, so that no response is yielded twice.
+
+    The rate limiter and circuit breaker of ``settings`` apply to each
+    attempt; the other policies of unary calls do not.
+
+    Args:
+      func (Callable[Sequence[object], Iterator[object]]): is used to make a
+        bare server-streaming rpc call.
+      settings (_CallSettings): provides the settings for this call
+
+    Returns:
+      Callable[Sequence[object], ResumableStream]: a bound method on a request
+        stub used to make an rpc call
+    """
+    def inner(request, options=None):
+        """Invoke with the actual settings."""
+        this_settings = settings.merge(
+            _merge_options_metadata(options, settings))
+        return streaming.ResumableStream(
+            func, this_settings, request, **this_settings.kwargs)
+
+    return inner
+
+
+def create_bidi_stream_call(func, settings):
+    """Converts a bidirectional-streaming rpc call into an API call governed
+    by the settings.
+
+    The result returns an iterator over the responses of the call, which
+    wraps its errors with GaxError and cancels the call when closed. The
+    requests cannot be replayed, so the call is never retried; see
+    ``gax.streaming.bidi_stream``.
+
+    Args:
+      func (Callable[Sequence[object], Iterator[object]]): is used to make a
+        bare bidirectional-streaming rpc call.
+      settings (_CallSettings): provides the settings for this call
+
+    Returns:
+      Callable[Sequence[object], Iterator[object]]: a bound method on a
+        request stub used to make an rpc call, taking an iterator of requests
+    """
+    def inner(requests, options=None):
+        """Invoke with the actual settings."""
+        this_settings = settings.merge(
+            _merge_options_metadata(options, settings))
+        return streaming.bidi_stream(
+            func, this_settings, requests, **this_settings.kwargs)
+
     return inner
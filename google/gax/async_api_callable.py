@@ -0,0 +1,486 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides asyncio-based API calls that implement retrying.
+
+The callables created by :func:`create_async_api_call` are coroutine
+functions. The RPC is issued through the future-style invocation of gRPC
+stubs, or through stubs whose calls are awaitable, such as those of
+``grpc.aio``, and the backoff sleeps and per-attempt timeouts of retrying
+calls run on the event loop. A single thread can therefore drive many
+concurrent calls.
+
+Page-streamed methods return asynchronous iterators, to be used with
+``async for``, whose pages are fetched on the event loop.
+
+This module requires Python 3.5 or later, and is not imported by
+:mod:`google.gax`.
+"""
+
+from __future__ import absolute_import, division
+
+import asyncio
+import inspect
+import time
+
+from future import utils
+
+from google import gax
+from google.gax import api_callable, config, retry
+
+
+def _wrap_future(grpc_future, loop):
+    """Wraps a gRPC future in an asyncio future of ``loop``.
+
+    Cancelling the returned future cancels the gRPC future.
+    """
+    aio_future = loop.create_future()
+
+    def copy_state(done_future):
+        """Copies the outcome of the gRPC future, on the event loop."""
+        if aio_future.done():
+            return
+        if done_future.cancelled():
+            aio_future.cancel()
+            return
+        exception = done_future.exception()
+        if exception is not None:
+            aio_future.set_exception(exception)
+        else:
+            aio_future.set_result(done_future.result())
+
+    def cancel_grpc_future(done_future):
+        """Propagates cancellation to the gRPC future."""
+        if done_future.cancelled():
+            grpc_future.cancel()
+
+    aio_future.add_done_callback(cancel_grpc_future)
+    grpc_future.add_done_callback(
+        lambda done_future: loop.call_soon_threadsafe(copy_state, done_future))
+    return aio_future
+
+
+def _takes_keyword_timeout(a_func):
+    """Returns whether ``a_func`` only accepts its timeout as a keyword.
+
+    The multicallables of ``grpc.aio`` declare ``timeout`` keyword-only.
+    """
+    try:
+        parameter = inspect.signature(a_func).parameters.get('timeout')
+    except (TypeError, ValueError):
+        return False
+    return parameter is not None and parameter.kind == parameter.KEYWORD_ONLY
+
+
+async def _invoke(a_func, args, timeout, kwargs, keyword_timeout=False):
+    """Invokes ``a_func`` without blocking the event loop.
+
+    Args:
+      a_func (callable): a stub method that either has a future-style
+        ``future`` attribute or returns an awaitable.
+      args (tuple): the positional arguments of the call.
+      timeout (Optional[float]): the timeout of the call, in seconds. It is
+        passed to ``a_func`` as its final positional arg, and also enforced
+        on the event loop.
+      kwargs (dict): additional keyword arguments passed to ``a_func``.
+      keyword_timeout (bool): if True, ``timeout`` is passed to ``a_func`` as
+        a keyword arg instead; see :func:`_takes_keyword_timeout`.
+
+    Returns:
+      Any: the response of the call.
+    """
+    to_future = getattr(a_func, 'future', None)
+    if to_future is not None:
+        call = _wrap_future(to_future(*(args + (timeout,)), **kwargs),
+                            asyncio.get_event_loop())
+    else:
+        if keyword_timeout:
+            call = a_func(*args, timeout=timeout, **kwargs)
+        else:
+            call = a_func(*(args + (timeout,)), **kwargs)
+        if not inspect.isawaitable(call):
+            return call
+
+    if timeout is None:
+        return await call
+    try:
+        return await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        raise gax._DeadlineExceededError()
+
+
+def add_timeout_arg(a_func, timeout, **kwargs):
+    """Asynchronous equivalent of :func:`google.gax.retry.add_timeout_arg`.
+
+    Args:
+      a_func (callable): a callable to be updated.
+      timeout (int): to be added to the original callable as it final
+        positional arg.
+      kwargs: Addtional arguments passed through to the callable.
+
+    Returns:
+      Callable: a coroutine function calling ``a_func`` with the timeout arg.
+    """
+    keyword_timeout = _takes_keyword_timeout(a_func)
+
+    async def inner(*args):
+        """Updates args with the timeout."""
+        return await _invoke(a_func, args, timeout, kwargs, keyword_timeout)
+
+    return inner
+
+
+def retryable(a_func, retry_options, **kwargs):
+    """Asynchronous equivalent of :func:`google.gax.retry.retryable`.
+
+    Backoff sleeps are done with :func:`asyncio.sleep`, so they do not block
+    the event loop.
+
+    Args:
+      a_func (callable): A callable.
+      retry_options (RetryOptions): Configures the exceptions upon which the
+        callable should retry, and the parameters to the exponential backoff
+        retry algorithm.
+      kwargs: Addtional arguments passed through to the callable.
+
+    Returns:
+      Callable: A coroutine function that will retry on exception.
+    """
+    keyword_timeout = _takes_keyword_timeout(a_func)
+
+    async def inner(*args):
+        """Equivalent to ``a_func``, but retries upon transient failure."""
+        backoff = retry._Backoff(retry_options)
+        while backoff.in_time():
+            try:
+                return await _invoke(a_func, args, backoff.timeout, kwargs,
+                                     keyword_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exception:  # pylint: disable=broad-except
+                to_sleep = backoff.on_error(exception)
+                await asyncio.sleep(to_sleep)
+                backoff.on_wake()
+
+        raise backoff.error
+
+    return inner
+
+
+def _catch_errors(a_func, to_catch):
+    """Asynchronous equivalent of :func:`google.gax.api_callable._catch_errors`.
+    """
+    async def inner(*args, **kwargs):
+        """Wraps specified exceptions"""
+        try:
+            return await a_func(*args, **kwargs)
+        # pylint: disable=catching-non-exception
+        except tuple(to_catch) as exception:
+            utils.raise_with_traceback(
+                gax.errors.create_error('RPC failed', cause=exception))
+
+    return inner
+
+
+class _AsyncPagePrefetcher(object):
+    """Fetches the pages of a page streaming call in a task.
+
+    Asynchronous equivalent of ``google.gax._PagePrefetcher``.
+    """
+    def __init__(self, fetch_page, depth):
+        """
+        Args:
+          fetch_page (Callable[[], Awaitable[Tuple[object, bool]]]): fetches
+            the next page, returning it and whether it is the last one.
+          depth (int): the number of pages fetched ahead of the consumer.
+        """
+        self._fetch_page = fetch_page
+        self._slots = asyncio.Semaphore(depth)
+        self._fetched = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                fetched = await self._fetch_page()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exception:  # pylint: disable=broad-except
+                fetched = exception
+            self._fetched.put_nowait(fetched)
+            if isinstance(fetched, Exception) or fetched[1]:
+                return
+
+    async def get(self):
+        """Returns the next page, waiting for it if needed.
+
+        Returns:
+          Tuple[object, bool]: the page, and whether it is the last one.
+
+        Raises:
+          Exception: the error of the call, in the place of the page it
+            failed to fetch.
+        """
+        fetched = await self._fetched.get()
+        self._slots.release()
+        if isinstance(fetched, Exception):
+            raise fetched
+        return fetched
+
+    def close(self):
+        """Stops fetching pages."""
+        self._task.cancel()
+
+
+class AsyncPageIterator(object):
+    """An asynchronous iterator over the pages of a page streaming API call.
+
+    Asynchronous equivalent of :class:`google.gax.PageIterator`, with the same
+    attributes.
+    """
+    def __init__(self, api_call, page_descriptor, page_token, request,
+                 prefetch_pages=0, cursor=None, max_results=None,
+                 page_sizing=None, **kwargs):
+        """
+        Args:
+          api_call (Callable[[req], Awaitable[resp]]): an asynchronous API
+            call that is page streaming.
+          page_descriptor (PageDescriptor): indicates the structure
+            of page streaming to be performed.
+          page_token (str): The page token to be passed to API call request,
+            or ``INITIAL_PAGE``.
+          request (object): The request to be passed to the API call.
+          prefetch_pages (int): The number of pages fetched ahead of the
+            consumer, in a task, once the first page is requested.
+          cursor (PageCursor): The position at which to resume, overriding
+            ``page_token``.
+          max_results (int): The maximum number of resources returned.
+          page_sizing (AdaptivePageSizeOptions): Configures the growth of the
+            page size.
+          kwargs: Arbitrary keyword arguments to be passed to the API call.
+        """
+        # pylint: disable=protected-access
+        self.response = None
+        self.page_cursor = None
+        if cursor is None:
+            if page_token == gax.INITIAL_PAGE:
+                page_token = ''
+            cursor = gax.PageCursor(page_token or '', 0)
+        self.page_token = cursor.page_token or gax.INITIAL_PAGE
+        self._cursor = cursor
+        self._func = api_call
+        self._fetcher = gax._PageFetcher(
+            None, page_descriptor, cursor, request, kwargs, max_results,
+            page_sizing)
+        self._kwargs = kwargs
+        self._done = max_results == 0
+        self._prefetch_pages = prefetch_pages
+        self._prefetcher = None
+
+    def __aiter__(self):
+        return self
+
+    async def _fetch(self):
+        """Fetches the next page, returning it and whether it is the last."""
+        request = self._fetcher.prepare_request()
+        started = time.time()
+        response = await self._func(request, **self._kwargs)
+        return self._fetcher.add_response(response, time.time() - started)
+
+    async def __anext__(self):
+        """Retrieves the next page."""
+        if self._done:
+            raise StopAsyncIteration
+        if self._prefetch_pages > 0:
+            if self._prefetcher is None:
+                self._prefetcher = _AsyncPagePrefetcher(
+                    self._fetch, self._prefetch_pages)
+            try:
+                page, last = await self._prefetcher.get()
+            except Exception:
+                self._done = True
+                raise
+        else:
+            page, last = await self._fetch()
+        self.response = page.response
+        self.page_token = page.next_token
+        self.page_cursor = page.cursor
+        self._cursor = page.next_cursor
+        if last:
+            self._done = True
+        return page.resources
+
+    @property
+    def cursor(self):
+        """PageCursor: the position at which to resume with the next page,
+        or None once all the pages have been returned."""
+        return self._cursor
+
+    def close(self):
+        """Stops fetching pages ahead of the consumer."""
+        self._done = True
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+
+    def __del__(self):
+        prefetcher = getattr(self, '_prefetcher', None)
+        if prefetcher is not None:
+            prefetcher.close()
+
+
+class AsyncResourceIterator(object):
+    """An asynchronous iterator over resources of the page iterator.
+
+    Asynchronous equivalent of :class:`google.gax.ResourceIterator`.
+    """
+    def __init__(self, page_iterator):
+        """Constructor.
+
+        Args:
+          page_iterator (AsyncPageIterator): the base iterator of getting
+            pages.
+        """
+        self._page_iterator = page_iterator
+        self._current = None
+        self._index = -1
+
+    def __aiter__(self):
+        return self
+
+    @property
+    def cursor(self):
+        """PageCursor: the position of the next resource to be returned, or
+        None once all the resources have been returned."""
+        if not self._current:
+            return self._page_iterator.cursor
+        page_cursor = self._page_iterator.page_cursor
+        return page_cursor._replace(offset=page_cursor.offset + self._index)
+
+    async def __anext__(self):
+        """Retrieves the next resource."""
+        while not self._current:
+            self._current = await self._page_iterator.__anext__()
+            self._index = 0
+        resource = self._current[self._index]
+        self._index += 1
+        if self._index >= len(self._current):
+            self._current = None
+        return resource
+
+
+def _page_streamable(page_descriptor):
+    """Asynchronous equivalent of
+    :func:`google.gax.api_callable._page_streamable`.
+
+    Args:
+        page_descriptor (:class:`PageDescriptor`): indicates the structure
+          of page streaming to be performed.
+
+    Returns:
+        Callable: A function that returns an asynchronous iterator.
+    """
+
+    def inner(a_func, settings, request, **kwargs):
+        """Actual page-streaming based on the settings."""
+        page_iterator = AsyncPageIterator(
+            a_func, page_descriptor, settings.page_token, request,
+            prefetch_pages=settings.prefetch_pages, cursor=settings.cursor,
+            max_results=settings.max_results,
+            page_sizing=settings.page_sizing, **kwargs)
+        if settings.flatten_pages:
+            return AsyncResourceIterator(page_iterator)
+        else:
+            return page_iterator
+
+    return inner
+
+
+def create_async_api_call(func, settings):
+    """Converts an rpc call into an asynchronous API call.
+
+    This is the asynchronous equivalent of
+    :func:`google.gax.api_callable.create_api_call`. The result is a coroutine
+    function accepting the request and an optional ``CallOptions``, which are
+    merged with ``settings`` as for synchronous calls.
+
+    If ``settings`` configures page streaming, the result is instead a
+    function returning an :class:`AsyncPageIterator`, or an
+    :class:`AsyncResourceIterator` unless the options set a page token. Each
+    page is fetched, and retried, as a call of its own.
+
+    Args:
+      func (Callable[Sequence[object], object]): is used to make a bare rpc
+        call. It must either support future-style invocation through its
+        ``future`` attribute, or return an awaitable.
+      settings (_CallSettings): provides the settings for this call
+
+    Returns:
+      Callable[Sequence[object], Awaitable[object]]: a coroutine function
+        making the rpc call.
+
+    Raises:
+       ValueError: if ``settings`` configures bundling, which asynchronous
+         calls do not support.
+    """
+    if settings.bundler and settings.bundle_descriptor:
+        raise ValueError('Asynchronous API calls do not support bundling')
+
+    def merge_settings(options):
+        """Merges ``options`` into the settings."""
+        this_options = api_callable._merge_options_metadata(options, settings)
+        return settings.merge(this_options)
+
+    def compile_api_call(this_settings):
+        """Wraps ``func`` to honour ``this_settings``."""
+        if this_settings.retry and this_settings.retry.retry_codes:
+            api_call = retryable(
+                func, this_settings.retry, **this_settings.kwargs)
+        else:
+            api_call = add_timeout_arg(
+                func, this_settings.timeout, **this_settings.kwargs)
+        return _catch_errors(api_call, config.API_ERRORS)
+
+    if settings.page_descriptor:
+        page_streamable = _page_streamable(settings.page_descriptor)
+
+        def inner_pages(request, options=None):
+            """Iterate with the actual settings."""
+            this_settings = merge_settings(options)
+            return page_streamable(
+                compile_api_call(this_settings), this_settings, request)
+
+        return inner_pages
+
+    async def inner(request, options=None):
+        """Invoke with the actual settings."""
+        this_settings = merge_settings(options)
+        return await compile_api_call(this_settings)(request)
+
+    return inner
@@ -53,6 +53,8 @@ import threading
 
 _LOG = logging.getLogger(__name__)
 
+_MILLIS_PER_SECOND = 1000.0
+
 
 def _str_dotted_getattr(obj, name):
     """Expands extends getattr to allow dots in x to indicate nested objects.
@@ -334,7 +336,7 @@ class Executor(object):
         with self._task_lock:
             if bundle.timer is None:
                 the_timer = TIMER_FACTORY(
-                    delay_threshold,
+                    delay_threshold / _MILLIS_PER_SECOND,
                     self._run_now,
                     args=[bundle.bundle_id])
                 the_timer.start()
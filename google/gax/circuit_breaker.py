@@ -0,0 +1,255 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides a circuit breaker that fails calls fast while a backend is down.
+
+:class:`CircuitBreaker` tracks the ratio of failed attempts of a method in a
+sliding window. Once the ratio reaches a threshold the circuit opens, and
+calls fail immediately with :class:`google.gax.errors.CircuitBreakerOpenError`
+instead of paying for the full retry schedule. After a while the circuit is
+half-open, and a few probe calls are let through to decide whether to close
+it again. Only the outcomes of the probes decide: calls let through before
+the circuit opened that complete late are ignored, so :meth:`allow` returns
+a token identifying probes, to be passed back when recording their outcome.
+A probe whose outcome is never recorded, e.g. because the call was
+cancelled, should be released; otherwise its slot is reclaimed once another
+``open_millis`` has passed without the outcome of all the probes.
+
+:func:`guarded` wraps an API call so that its attempts go through a circuit
+breaker.
+"""
+
+from __future__ import absolute_import, division
+
+import threading
+import time
+
+from google.gax import config, errors, retry
+
+_MILLIS_PER_SECOND = 1000
+
+_NUM_BUCKETS = 10
+"""The number of buckets the sliding window is divided into."""
+
+FAILURE_CODE_NAMES = (
+    'DEADLINE_EXCEEDED', 'INTERNAL', 'UNAVAILABLE', 'UNKNOWN')
+"""The names of the status codes counted as failures of the backend."""
+
+CLOSED = 'closed'
+"""Calls are let through, and their outcome is tracked."""
+
+OPEN = 'open'
+"""Calls fail immediately."""
+
+HALF_OPEN = 'half_open'
+"""A limited number of probe calls are let through."""
+
+
+class CircuitBreaker(object):
+    """Tracks the failures of a method and decides whether to let calls in."""
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, options):
+        """Constructor.
+
+        Args:
+          options (gax.CircuitBreakerOptions): configures the thresholds of
+            the circuit breaker.
+        """
+        self._options = options
+        self._failure_codes = frozenset(
+            config.STATUS_CODE_NAMES[name] for name in FAILURE_CODE_NAMES)
+        self._bucket_secs = (options.window_millis / _MILLIS_PER_SECOND /
+                             _NUM_BUCKETS)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = None
+        self._probed_at = None
+        self._probe_token = None
+        self._probes = 0
+        self._probe_successes = 0
+        self._reset_window()
+
+    @property
+    def state(self):
+        """The current state: ``CLOSED``, ``OPEN`` or ``HALF_OPEN``."""
+        with self._lock:
+            self._update_state(time.time())
+            return self._state
+
+    def _reset_window(self):
+        self._buckets = [[0, 0] for _ in range(_NUM_BUCKETS)]
+        self._bucket_starts = [None] * _NUM_BUCKETS
+
+    def _bucket_for(self, now):
+        """Returns the [calls, failures] bucket counting outcomes at ``now``."""
+        slot = int(now / self._bucket_secs)
+        index = slot % _NUM_BUCKETS
+        if self._bucket_starts[index] != slot:
+            self._bucket_starts[index] = slot
+            self._buckets[index] = [0, 0]
+        return self._buckets[index]
+
+    def _window_totals(self, now):
+        oldest = int(now / self._bucket_secs) - _NUM_BUCKETS
+        calls = failures = 0
+        for start, (bucket_calls, bucket_failures) in zip(
+                self._bucket_starts, self._buckets):
+            if start is not None and start > oldest:
+                calls += bucket_calls
+                failures += bucket_failures
+        return calls, failures
+
+    def _update_state(self, now):
+        if self._state == OPEN and (
+                now - self._opened_at >=
+                self._options.open_millis / _MILLIS_PER_SECOND):
+            self._state = HALF_OPEN
+            self._probe_token = object()
+            self._probes = 0
+            self._probe_successes = 0
+        elif (self._state == HALF_OPEN and
+              self._probes > self._probe_successes and
+              now - self._probed_at >=
+              self._options.open_millis / _MILLIS_PER_SECOND):
+            # The probes still outstanding are presumed lost.
+            self._probes = self._probe_successes
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+
+    def allow(self):
+        """Decides whether a call may be sent.
+
+        Returns:
+          Optional[object]: a token identifying the call as a probe of the
+            half-open circuit, or None if the circuit is closed. It is to be
+            passed to ``record`` or ``release``.
+
+        Raises:
+          CircuitBreakerOpenError: if the circuit is open, or if it is
+            half-open and all the probe calls have been let through.
+        """
+        with self._lock:
+            now = time.time()
+            self._update_state(now)
+            if self._state == CLOSED:
+                return None
+            if (self._state == HALF_OPEN and
+                    self._probes < self._options.half_open_probes):
+                self._probes += 1
+                self._probed_at = now
+                return self._probe_token
+        raise errors.CircuitBreakerOpenError(
+            'Circuit breaker is open, the call was not sent')
+
+    def record(self, exception=None, probe=None):
+        """Records the outcome of a call let through by ``allow``.
+
+        Args:
+          exception (Exception): the exception raised by the call, or None if
+            it succeeded. Only exceptions whose status code indicates a
+            failing backend are counted as failures.
+          probe (object): the token returned by ``allow`` for the call. While
+            the circuit is half-open, only the outcomes of its probes count.
+        """
+        failed = (exception is not None and
+                  config.exc_to_code(exception) in self._failure_codes)
+        with self._lock:
+            now = time.time()
+            if self._state == HALF_OPEN:
+                if probe is not self._probe_token:
+                    return
+                if failed:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self._options.half_open_probes:
+                        self._state = CLOSED
+                        self._reset_window()
+                return
+            if self._state == OPEN:
+                return
+
+            bucket = self._bucket_for(now)
+            bucket[0] += 1
+            if not failed:
+                return
+            bucket[1] += 1
+            calls, failures = self._window_totals(now)
+            if (calls >= self._options.minimum_calls and
+                    failures >= calls * self._options.failure_ratio_threshold):
+                self._open(now)
+
+    def release(self, probe=None):
+        """Gives back a call let through by ``allow`` without an outcome.
+
+        Used when the call is cancelled before its outcome is known, so that
+        a half-open circuit may let another probe through in its place.
+
+        Args:
+          probe (object): the token returned by ``allow`` for the call.
+        """
+        with self._lock:
+            if (self._state == HALF_OPEN and probe is self._probe_token and
+                    self._probes > self._probe_successes):
+                self._probes -= 1
+
+
+def guarded(a_func, breaker):
+    """Creates a function equivalent to a_func, guarded by a circuit breaker.
+
+    Attempts that ``a_func`` declines to send, e.g. because a concurrency
+    limiter rejects them, are released rather than recorded, since they say
+    nothing about the backend.
+
+    Args:
+      a_func (callable): A callable.
+      breaker (CircuitBreaker): The circuit breaker of the method.
+
+    Returns:
+      Callable: A function that fails fast while ``breaker`` is open.
+    """
+    def inner(*args, **kwargs):
+        """Equivalent to ``a_func``, but fails fast while the circuit is open.
+        """
+        probe = breaker.allow()
+        try:
+            result = a_func(*args, **kwargs)
+        except retry._UNSENT_ERRORS:  # pylint: disable=protected-access
+            breaker.release(probe)
+            raise
+        except Exception as exception:
+            breaker.record(exception, probe)
+            raise
+        breaker.record(probe=probe)
+        return result
+
+    return inner
@@ -0,0 +1,189 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides an adaptive limit on the attempts of a method in flight.
+
+:class:`ConcurrencyLimiter` lets a limited number of attempts of a method be
+in flight at once. Attempts over the limit wait, for a bounded time, for
+another one to complete. The limit is adjusted to the backend with additive
+increase and multiplicative decrease: it grows while the latency of the
+attempts stays near its baseline, and is cut back when the latency grows or
+when attempts fail with RESOURCE_EXHAUSTED or DEADLINE_EXCEEDED.
+
+The baseline is the lowest latency of the successful attempts, drifting
+slowly towards their observed latencies so that it follows lasting changes of
+the backend.
+
+:func:`limited` wraps an API call so that its attempts go through a
+concurrency limiter.
+"""
+
+from __future__ import absolute_import, division
+
+import threading
+import time
+
+from google.gax import config, errors
+
+_MILLIS_PER_SECOND = 1000
+
+OVERLOAD_CODE_NAMES = ('RESOURCE_EXHAUSTED', 'DEADLINE_EXCEEDED')
+"""The names of the status codes indicating the backend is overloaded."""
+
+_BASELINE_DRIFT = 0.001
+"""The weight of each slower attempt in the baseline latency."""
+
+
+class ConcurrencyLimiter(object):
+    """Adapts the number of attempts of a method allowed in flight."""
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, options):
+        """Constructor.
+
+        Args:
+          options (gax.ConcurrencyLimitOptions): configures the bounds and
+            adjustments of the limit.
+        """
+        self._options = options
+        self._overload_codes = frozenset(
+            config.STATUS_CODE_NAMES[name] for name in OVERLOAD_CODE_NAMES)
+        self._max_wait = options.max_wait_millis / _MILLIS_PER_SECOND
+        self._condition = threading.Condition()
+        self._limit = float(options.initial_limit)
+        self._in_flight = 0
+        self._waiting = 0
+        self._baseline = None
+
+    @property
+    def limit(self):
+        """The number of attempts currently allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        """The number of attempts in flight."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        """The number of attempts waiting for another one to complete."""
+        return self._waiting
+
+    def acquire(self, timeout=None):
+        """Waits until an attempt may be sent, and counts it as in flight.
+
+        Args:
+          timeout (float): the timeout of the attempt, in seconds, which
+            further bounds the wait. If None, only the maximum wait of the
+            limiter applies.
+
+        Raises:
+          ConcurrencyLimitExceededError: if the limit is still reached after
+            the wait.
+        """
+        wait = self._max_wait
+        if timeout is not None:
+            wait = min(wait, timeout)
+        with self._condition:
+            if self._in_flight >= self.limit:
+                deadline = time.time() + wait
+                self._waiting += 1
+                try:
+                    while self._in_flight >= self.limit:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise errors.ConcurrencyLimitExceededError(
+                                'Concurrency limit exceeded, the call was not'
+                                ' sent')
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_flight += 1
+
+    def release(self, latency, exception=None):
+        """Records the outcome of an attempt let through by ``acquire``.
+
+        Args:
+          latency (float): the time, in seconds, the attempt took.
+          exception (Exception): the exception raised by the attempt, or None
+            if it succeeded.
+        """
+        overloaded = (exception is not None and
+                      config.exc_to_code(exception) in self._overload_codes)
+        with self._condition:
+            utilized = self._in_flight >= self._limit / 2
+            self._in_flight -= 1
+            if exception is None:
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    self._baseline += ((latency - self._baseline) *
+                                       _BASELINE_DRIFT)
+
+            options = self._options
+            slow = (self._baseline is not None and
+                    latency > self._baseline * options.latency_tolerance)
+            if overloaded or slow:
+                self._limit = max(options.min_limit,
+                                  self._limit * options.backoff_ratio)
+            elif exception is None and utilized:
+                # Grows by one once the limit's worth of attempts succeeded.
+                self._limit = min(options.max_limit,
+                                  self._limit + 1 / self._limit)
+            self._condition.notify()
+
+
+def limited(a_func, limiter):
+    """Creates a function equivalent to a_func, whose concurrency is limited.
+
+    The last positional argument of ``a_func`` must be the timeout of the
+    attempt, which bounds the time spent waiting for the limit.
+
+    Args:
+      a_func (callable): A callable.
+      limiter (ConcurrencyLimiter): The concurrency limiter of the method.
+
+    Returns:
+      Callable: A function that waits for ``limiter`` before each call, and
+        reports the latency and outcome of the call to it.
+    """
+    def inner(*args, **kwargs):
+        """Equivalent to ``a_func``, but waits for the concurrency limit."""
+        limiter.acquire(args[-1] if args else None)
+        started = time.time()
+        try:
+            result = a_func(*args, **kwargs)
+        except Exception as exception:
+            limiter.release(time.time() - started, exception)
+            raise
+        limiter.release(time.time() - started)
+        return result
+
+    return inner
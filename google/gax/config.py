@@ -41,6 +41,14 @@ May return None if the exception is not associated with a status code.
 """
 
 
+exc_to_retry_delay = grpc.exc_to_retry_delay  # pylint: disable=invalid-name
+"""A function that takes an exception and returns the retry delay, in seconds,
+requested by the server.
+
+May return None if the exception does not carry a retry delay.
+"""
+
+
 STATUS_CODE_NAMES = grpc.STATUS_CODE_NAMES
 """Maps strings used in client config to the status codes they represent.
 
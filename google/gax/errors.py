@@ -93,3 +93,40 @@ def create_error(msg, cause=None):
 class RetryError(GaxError):
     """Indicates an error during automatic GAX retrying."""
     pass
+
+
+class CircuitBreakerOpenError(GaxError):
+    """Indicates that a call failed fast because its circuit breaker is open.
+
+    The backend of the call has recently been failing, so the call was not
+    sent.
+    """
+    pass
+
+
+class RateLimitExceededError(GaxError):
+    """Indicates that a call failed because of its client-side rate limit.
+
+    The call was not sent, either because its rate limit fails fast or
+    because it would have waited longer than its timeout.
+    """
+    pass
+
+
+class ConcurrencyLimitExceededError(GaxError):
+    """Indicates that a call failed because of its concurrency limit.
+
+    Too many calls of the method were in flight, and none completed within
+    the maximum wait, so the call was not sent.
+    """
+    pass
+
+
+class AdmissionRejectedError(GaxError):
+    """Indicates that a call was shed by the admission of its client.
+
+    The client was saturated, and the call was not admitted before its
+    timeout, or was dropped from a full queue in favor of calls of higher
+    priority, so it was not sent.
+    """
+    pass
@@ -0,0 +1,249 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides fan-out of many unary calls from a single thread.
+
+:func:`map_calls` sends a stream of requests through the future-style
+invocation of a gRPC stub method, keeping a bounded number of RPCs in flight
+and retrying each request according to the settings of the method. It is
+exposed as the ``map`` method of the callables returned by
+:func:`google.gax.api_callable.create_api_call`.
+"""
+
+from __future__ import absolute_import
+
+import heapq
+import itertools
+import time
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue  # pylint: disable=import-error
+
+from google.gax import config, errors, rate_limiter, retry
+
+# Responses received ahead of the oldest pending request of an ordered map are
+# buffered, so the number of requests outstanding is bounded to this multiple of
+# the concurrency.
+_ORDERED_WINDOW_FACTOR = 2
+
+
+class _Item(object):
+    """A request being mapped, and the state of its attempts."""
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('index', 'request', 'backoff', 'timeout', 'future', 'probe')
+
+    def __init__(self, index, request, settings):
+        self.index = index
+        self.request = request
+        self.future = None
+        self.probe = None
+        if settings.retry and settings.retry.retry_codes:
+            self.backoff = retry._Backoff(settings.retry)
+            self.timeout = self.backoff.timeout
+        else:
+            self.backoff = None
+            self.timeout = settings.timeout
+
+
+def _wrap_error(exception):
+    """Wraps an exception raised by an RPC as the synchronous path would."""
+    if isinstance(exception, tuple(config.API_ERRORS)):
+        return errors.create_error('RPC failed', cause=exception)
+    return exception
+
+
+def map_calls(func, settings, requests, concurrency=10, ordered=True):
+    """Makes a call for each request, with many calls in flight at once.
+
+    All the RPCs are sent and their responses collected from the thread
+    consuming the returned iterator; no threads are created. If ``func`` does
+    not support future-style invocation, the calls are made one at a time.
+
+    Args:
+      func (Callable[Sequence[object], object]): a gRPC unary-unary stub
+        method, which must support future-style invocation through its
+        ``future`` attribute.
+      settings (_CallSettings): the settings of the calls. Their timeout or
+        retry options are applied to each request independently.
+      requests (Iterable[object]): the requests. It is consumed lazily.
+      concurrency (int): the maximum number of RPCs in flight.
+      ordered (bool): if True, responses are yielded in the order of
+        ``requests``. Otherwise, ``(request, response)`` pairs are yielded as
+        the calls complete.
+
+    Yields:
+      object: the response of each call, or a ``(request, response)`` pair if
+        ``ordered`` is False.
+
+    Raises:
+      GaxError: when the failure of a call is reached. The calls still in
+        flight are cancelled.
+      ValueError: if ``concurrency`` is not positive.
+    """
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    if concurrency < 1:
+        raise ValueError('concurrency must be positive')
+
+    to_future = getattr(func, 'future', None)
+    if to_future is None:
+        for request in requests:
+            response = _call_sync(func, settings, request)
+            yield response if ordered else (request, response)
+        return
+
+    breaker = settings.circuit_breaker
+    limiter = settings.rate_limiter
+    kwargs = settings.kwargs
+    pending_requests = enumerate(requests)
+    completed = queue.Queue()
+    scheduled = []  # heap of (wake time, sequence number, item)
+    sequence = itertools.count()
+    in_flight = {}
+    results = {}
+    next_index = 0
+    exhausted = False
+
+    def send(item):
+        """Sends an attempt for ``item``, or records why it cannot be sent."""
+        if limiter is not None:
+            try:
+                limiter.acquire(item.timeout)
+            except errors.RateLimitExceededError as exception:
+                results[item.index] = (item, exception)
+                return
+        if breaker is not None:
+            try:
+                item.probe = breaker.allow()
+            except errors.CircuitBreakerOpenError as exception:
+                results[item.index] = (item, exception)
+                return
+        item.future = to_future(item.request, item.timeout, **kwargs)
+        in_flight[item.index] = item
+        item.future.add_done_callback(
+            lambda _, done_item=item: completed.put(done_item))
+
+    def on_done(item):
+        """Records the outcome of the attempt of ``item``, maybe retrying."""
+        del in_flight[item.index]
+        exception = item.future.exception()
+        if breaker is not None:
+            breaker.record(exception, item.probe)
+        if exception is None:
+            results[item.index] = (item, item.future.result())
+            return
+        if item.backoff is None:
+            results[item.index] = (item, _wrap_error(exception))
+            return
+        try:
+            to_sleep = item.backoff.on_error(exception)
+        except errors.GaxError as retry_error:
+            results[item.index] = (item, retry_error)
+            return
+        heapq.heappush(
+            scheduled, (time.time() + to_sleep, next(sequence), item))
+
+    def resend(item):
+        """Sends the next attempt of ``item``, if there is time left."""
+        item.backoff.on_wake()
+        if not item.backoff.in_time():
+            results[item.index] = (item, item.backoff.error)
+            return
+        item.timeout = item.backoff.timeout
+        send(item)
+
+    try:
+        while True:
+            # Send the retries that are due, then new requests.
+            while scheduled and scheduled[0][0] <= time.time():
+                resend(heapq.heappop(scheduled)[2])
+            while not exhausted and len(in_flight) < concurrency:
+                outstanding = len(in_flight) + len(scheduled) + len(results)
+                if (ordered and outstanding >=
+                        concurrency * _ORDERED_WINDOW_FACTOR):
+                    break
+                try:
+                    index, request = next(pending_requests)
+                except StopIteration:
+                    exhausted = True
+                    break
+                send(_Item(index, request, settings))
+
+            # Yield what can be yielded.
+            if ordered:
+                while next_index in results:
+                    _, response = results.pop(next_index)
+                    next_index += 1
+                    if isinstance(response, Exception):
+                        raise response
+                    yield response
+            else:
+                for index in list(results):
+                    item, response = results.pop(index)
+                    if isinstance(response, Exception):
+                        raise response
+                    yield item.request, response
+
+            if exhausted and not in_flight and not scheduled:
+                if not results:
+                    return
+                continue
+
+            wait = None
+            if scheduled:
+                wait = max(0, scheduled[0][0] - time.time())
+            elif not in_flight:
+                continue
+            try:
+                on_done(completed.get(timeout=wait))
+            except queue.Empty:
+                pass
+    finally:
+        for item in in_flight.values():
+            if item.future.cancel():
+                if breaker is not None:
+                    breaker.release(item.probe)
+            elif breaker is not None:
+                breaker.record(item.future.exception(), item.probe)
+
+
+def _call_sync(func, settings, request):
+    """Makes a single call with ``settings``, without future invocation."""
+    if settings.rate_limiter is not None:
+        func = rate_limiter.limited(func, settings.rate_limiter)
+    if settings.retry and settings.retry.retry_codes:
+        api_call = retry.retryable(func, settings.retry, **settings.kwargs)
+    else:
+        api_call = retry.add_timeout_arg(
+            func, settings.timeout, **settings.kwargs)
+    try:
+        return api_call(request)
+    except tuple(config.API_ERRORS) as exception:
+        raise errors.create_error('RPC failed', cause=exception)
@@ -33,7 +33,8 @@ from __future__ import absolute_import
 
 from grpc import RpcError, StatusCode
 
-from google.gax import _grpc_google_auth
+from google.protobuf.message import DecodeError
+from google.rpc import error_details_pb2, status_pb2
 
 
 API_ERRORS = (RpcError, )
@@ -74,6 +75,43 @@ def exc_to_code(exc):
             return None
 
 
+_STATUS_DETAILS_KEY = 'grpc-status-details-bin'
+"""The trailing metadata key holding the serialized ``google.rpc.Status``."""
+
+
+def exc_to_retry_delay(exc):
+    """Retrieves the retry delay requested by the server from an exception.
+
+    The delay is read from a ``google.rpc.RetryInfo`` detail of the
+    ``google.rpc.Status`` sent in the trailing metadata of the call.
+
+    Returns:
+      Optional[float]: the retry delay in seconds, or None if the exception
+        does not carry one, or carries a malformed one.
+    """
+    if not isinstance(exc, RpcError):
+        return None
+    try:
+        trailing_metadata = exc.trailing_metadata()
+    except AttributeError:
+        return None
+
+    for key, value in trailing_metadata or ():
+        if key != _STATUS_DETAILS_KEY:
+            continue
+        try:
+            status = status_pb2.Status.FromString(value)
+            for detail in status.details:
+                if detail.Is(error_details_pb2.RetryInfo.DESCRIPTOR):
+                    retry_info = error_details_pb2.RetryInfo()
+                    detail.Unpack(retry_info)
+                    delay = retry_info.retry_delay
+                    return delay.seconds + delay.nanos / 1e9
+        except DecodeError:
+            return None
+    return None
+
+
 def create_stub(generated_create_stub, channel=None, service_path=None,
                 service_port=None, credentials=None, scopes=None,
                 ssl_credentials=None):
@@ -100,6 +138,10 @@ def create_stub(generated_create_stub, channel=None, service_path=None,
         grpc.Client: A gRPC client stub.
     """
     if channel is None:
+        # google.auth and its HTTP transport are slow to import, and only
+        # needed to create channels.
+        from google.gax import _grpc_google_auth
+
         target = '{}:{}'.format(service_path, service_port)
 
         if credentials is None:
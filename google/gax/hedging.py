@@ -0,0 +1,166 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides function wrappers that implement hedged requests.
+
+A hedged call sends its request once and, if no response has arrived after a
+short delay, sends it again in parallel. The first successful response is
+returned and the outstanding attempts are cancelled. Hedging trades a small
+amount of extra load for lower tail latency, so it must only be used for
+idempotent methods.
+
+:class:`Hedger` holds the per-method state used to decide when to hedge: the
+observed latency of the method and the budget limiting how many hedged
+attempts may be sent.
+"""
+
+from __future__ import absolute_import, division
+
+import logging
+import threading
+import time
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue  # pylint: disable=import-error
+
+from google.gax.utils import latency
+
+_LOG = logging.getLogger(__name__)
+
+_MILLIS_PER_SECOND = 1000
+
+_HEDGING_PERCENTILE = 95
+
+_MAX_BUDGET_TOKENS = 10
+"""The maximum number of hedged attempts that may be saved up in a budget."""
+
+
+class Hedger(object):
+    """Tracks the latency and hedging budget of a single API method."""
+
+    def __init__(self):
+        self.latency = latency.LatencyTracker()
+        self._tokens = _MAX_BUDGET_TOKENS
+        self._lock = threading.Lock()
+
+    def deposit(self, ratio):
+        """Credits the budget for one call hedged at ``ratio``."""
+        with self._lock:
+            self._tokens = min(self._tokens + ratio, _MAX_BUDGET_TOKENS)
+
+    def withdraw(self):
+        """Takes one hedged attempt from the budget.
+
+        Returns:
+          bool: ``True`` if the budget allowed another hedged attempt.
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def hedge_delay(self, options):
+        """Computes the time to wait before sending a hedged attempt.
+
+        Args:
+          options (gax.HedgingOptions): the hedging policy of the call.
+
+        Returns:
+          Optional[float]: the delay in seconds, or None if no hedged attempt
+            should be sent.
+        """
+        if options.delay_millis is not None:
+            return options.delay_millis / _MILLIS_PER_SECOND
+        return self.latency.percentile(_HEDGING_PERCENTILE)
+
+
+def hedgeable(a_func, options, hedger):
+    """Creates a function equivalent to a_func, but that hedges slow attempts.
+
+    ``a_func`` must support future-style invocation through its ``future``
+    attribute, as gRPC's unary-unary multi-callables do. If it does not,
+    ``a_func`` is returned unchanged.
+
+    Args:
+      a_func (callable): A callable.
+      options (gax.HedgingOptions): Configures when hedged attempts are sent.
+      hedger (Hedger): The state of the method being called.
+
+    Returns:
+      Callable: A function that will send hedged attempts.
+    """
+    to_future = getattr(a_func, 'future', None)
+    if to_future is None:
+        _LOG.debug('Hedging is disabled, %s has no future invocation', a_func)
+        return a_func
+
+    def inner(*args, **kwargs):
+        """Equivalent to ``a_func``, but hedges slow attempts."""
+        started = time.time()
+        hedger.deposit(options.budget_ratio)
+        delay = hedger.hedge_delay(options)
+        completed = queue.Queue()
+        attempts = []
+
+        def send():
+            """Sends an attempt, queueing it once it completes."""
+            attempt = to_future(*args, **kwargs)
+            attempts.append(attempt)
+            attempt.add_done_callback(completed.put)
+
+        send()
+        pending = 1
+        try:
+            while True:
+                if len(attempts) > options.max_hedged_attempts:
+                    delay = None
+                try:
+                    attempt = completed.get(timeout=delay)
+                except queue.Empty:
+                    if hedger.withdraw():
+                        send()
+                        pending += 1
+                    else:
+                        delay = None
+                    continue
+
+                pending -= 1
+                if attempt.exception() is None:
+                    hedger.latency.record(time.time() - started)
+                    return attempt.result()
+                if not pending:
+                    return attempt.result()
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    return inner
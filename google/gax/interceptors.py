@@ -0,0 +1,165 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides interceptors, which wrap each attempt of an API call.
+
+An interceptor is a callable taking an :class:`Invocation` and a
+continuation. It makes the attempt by calling the continuation with the
+request, and returns the response or lets the exception propagate, so it
+observes the outcome of the attempt; it may also change the request, the
+response or the error, or skip the attempt altogether.
+
+Example:
+    >>> def log_attempts(invocation, continuation):
+    ...     start = time.time()
+    ...     try:
+    ...         return continuation(invocation.request)
+    ...     finally:
+    ...         _LOG.info('attempt %d took %fs', invocation.attempt,
+    ...                   time.time() - start)
+    >>> interceptors.register(log_attempts)
+
+Interceptors registered with :func:`register` apply to every API callable
+created afterwards; those of a single method are passed to
+:func:`google.gax.api_callable.construct_settings`. The attempts of an API
+callable without interceptors are made directly, at no extra cost.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import itertools
+import threading
+
+_GLOBAL_INTERCEPTORS = []
+_LOCK = threading.Lock()
+
+
+class Invocation(
+        collections.namedtuple(
+            'Invocation', ['settings', 'request', 'attempt'])):
+    """Describes an attempt of an API call to an interceptor.
+
+    Attributes:
+      settings (_CallSettings): the settings of the call.
+      request (object): the request of the attempt.
+      attempt (int): the number of the attempt within the call, starting
+        from 1. It grows as the call is retried.
+    """
+    __slots__ = ()
+
+
+def register(interceptor):
+    """Adds ``interceptor`` to the interceptors of all API callables.
+
+    Interceptors registered first are outermost. Registration only affects
+    API callables created afterwards.
+
+    Args:
+      interceptor (Callable[[Invocation, Callable[[object], object]], object]):
+        the interceptor.
+    """
+    with _LOCK:
+        _GLOBAL_INTERCEPTORS.append(interceptor)
+
+
+def unregister(interceptor):
+    """Removes an interceptor added by :func:`register`.
+
+    Args:
+      interceptor (Callable[[Invocation, Callable[[object], object]], object]):
+        the interceptor.
+
+    Raises:
+      ValueError: if ``interceptor`` is not registered.
+    """
+    with _LOCK:
+        _GLOBAL_INTERCEPTORS.remove(interceptor)
+
+
+def chain(settings):
+    """Returns the interceptors for calls with ``settings``, outermost first.
+
+    Args:
+      settings (_CallSettings): the settings of the calls.
+
+    Returns:
+      tuple: the registered interceptors, then those of ``settings``.
+    """
+    with _LOCK:
+        return tuple(_GLOBAL_INTERCEPTORS) + settings.interceptors
+
+
+def intercept(a_func, interceptors, settings, wrap):
+    """Applies ``interceptors`` to each attempt of a call.
+
+    Args:
+      a_func (Callable[..., object]): makes an attempt. It is called with the
+        request followed by the arguments ``wrap`` passes to each attempt.
+      interceptors (Sequence[Callable]): the interceptors, outermost first.
+      settings (_CallSettings): the settings of the calls, passed to the
+        interceptors.
+      wrap (Callable[[Callable], Callable[[object], object]]): turns a
+        function making one attempt into one making the whole call, e.g. by
+        retrying it.
+
+    Returns:
+      Callable[[object], object]: makes the call, passing each attempt
+        through ``interceptors``.
+    """
+    def inner(request):
+        """Makes the call, counting its attempts."""
+        attempts = itertools.count(1)
+
+        def attempt(attempt_request, *args, **kwargs):
+            """Passes one attempt through the interceptors."""
+            def call(this_request):
+                """Makes the attempt after the last interceptor."""
+                return a_func(this_request, *args, **kwargs)
+
+            invocation = Invocation(settings, attempt_request, next(attempts))
+            return _continue(interceptors, invocation, call)(attempt_request)
+
+        return wrap(attempt)(request)
+
+    return inner
+
+
+def _continue(interceptors, invocation, call):
+    """Returns the continuation running ``interceptors`` and then ``call``."""
+    if not interceptors:
+        return call
+    first, rest = interceptors[0], interceptors[1:]
+
+    def continuation(request):
+        """Runs the first interceptor, with the rest as its continuation."""
+        this_invocation = invocation._replace(request=request)
+        return first(this_invocation, _continue(rest, this_invocation, call))
+
+    return continuation
@@ -0,0 +1,236 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides concurrent listing of the resources of many parents.
+
+:func:`merge_listings` walks the page streams of many requests, e.g. one
+per project, on a bounded number of threads, and merges their resources into
+a single iterator. It is exposed as the ``list_many`` method of the callables
+returned by :func:`google.gax.api_callable.create_api_call` for page-streamed
+methods.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import threading
+
+# The listings started and not yet fully consumed are bounded to this multiple
+# of the concurrency, so that listings completed ahead of the consumer do not
+# pile up.
+_OPEN_LISTINGS_FACTOR = 2
+
+
+class _Listing(object):
+    """The page stream of a request, and the pages buffered from it."""
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('request', 'pages', 'done')
+
+    def __init__(self, request):
+        self.request = request
+        self.pages = collections.deque()
+        self.done = False
+
+
+class _Merger(object):
+    """Walks page streams on worker threads, buffering their pages.
+
+    Each buffered page is a sequence of resources, or the error that ended
+    its listing.
+    """
+
+    def __init__(self, list_pages, requests, concurrency, buffered_pages):
+        self._list_pages = list_pages
+        self._requests = iter(requests)
+        self._buffered_pages = buffered_pages
+        self._max_open = concurrency * _OPEN_LISTINGS_FACTOR
+        self._condition = threading.Condition()
+        self._open = collections.deque()
+        self._exhausted = False
+        self._closed = False
+        for _ in range(concurrency):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+
+    def _start_listing(self):
+        """Returns the listing of the next request, or None if it must wait.
+
+        Must be called with the condition held.
+        """
+        if self._exhausted or len(self._open) >= self._max_open:
+            return None
+        try:
+            listing = _Listing(next(self._requests))
+        except StopIteration:
+            self._exhausted = True
+            self._condition.notify_all()
+            return None
+        except Exception as exception:  # pylint: disable=broad-except
+            self._exhausted = True
+            listing = _Listing(None)
+            listing.pages.append(exception)
+            listing.done = True
+        self._open.append(listing)
+        self._condition.notify_all()
+        return listing
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        return
+                    listing = self._start_listing()
+                    if listing is not None:
+                        break
+                    if self._exhausted:
+                        return
+                    self._condition.wait()
+            if not listing.done:
+                self._walk(listing)
+
+    def _walk(self, listing):
+        """Buffers the pages of ``listing``, waiting for room for each."""
+        pages = None
+        error = None
+        try:
+            pages = self._list_pages(listing.request)
+            for page in pages:
+                with self._condition:
+                    while (len(listing.pages) >= self._buffered_pages and
+                           not self._closed):
+                        self._condition.wait()
+                    if self._closed:
+                        break
+                    listing.pages.append(page)
+                    self._condition.notify_all()
+        except Exception as exception:  # pylint: disable=broad-except
+            error = exception
+        if self._closed and pages is not None:
+            close = getattr(pages, 'close', None)
+            if close is not None:
+                close()
+        with self._condition:
+            if error is not None:
+                listing.pages.append(error)
+            listing.done = True
+            self._condition.notify_all()
+
+    def next_page(self, ordered):
+        """Returns the next page to be consumed, waiting for it if needed.
+
+        Args:
+          ordered (bool): if True, the pages of each listing are returned
+            after those of the listings of the preceding requests.
+
+        Returns:
+          Optional[Tuple[_Listing, Sequence[object]]]: the listing and the
+            page, or None once all the listings have been consumed.
+
+        Raises:
+          Exception: the error ending a listing, in the place of the page it
+            failed to fetch.
+        """
+        with self._condition:
+            while True:
+                candidates = list(self._open)[:1] if ordered else list(
+                    self._open)
+                removed = False
+                for listing in candidates:
+                    if listing.pages:
+                        page = listing.pages.popleft()
+                        self._condition.notify_all()
+                        if isinstance(page, Exception):
+                            raise page
+                        return listing, page
+                    if listing.done:
+                        self._open.remove(listing)
+                        self._condition.notify_all()
+                        removed = True
+                if not self._open and self._exhausted:
+                    return None
+                if not removed:
+                    self._condition.wait()
+
+    def close(self):
+        """Stops the workers once their pending page fetches complete."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+def merge_listings(list_pages, requests, concurrency=10, ordered=True,
+                   buffered_pages=2):
+    """Lists the resources of many requests, with many listings at once.
+
+    Up to ``concurrency`` page streams are walked at once, each on a thread of
+    its own. A listing buffers at most ``buffered_pages`` pages ahead of the
+    consumer, and at most twice ``concurrency`` listings are started and not
+    yet consumed, so the page fetches pause when the consumer falls behind.
+
+    Args:
+      list_pages (Callable[[object], Iterable[Sequence[object]]]): returns
+        the pages of the listing of a request, e.g. a
+        :class:`google.gax.PageIterator`.
+      requests (Iterable[object]): the requests, e.g. one per parent. It is
+        consumed lazily.
+      concurrency (int): the maximum number of listings walked at once.
+      ordered (bool): if True, the resources of each request are yielded
+        after those of the preceding requests. Otherwise, ``(request,
+        resource)`` pairs are yielded as pages arrive, with the resources of
+        each request still in order.
+      buffered_pages (int): the maximum number of pages of a listing fetched
+        ahead of the consumer.
+
+    Yields:
+      object: each resource, or a ``(request, resource)`` pair if ``ordered``
+        is False.
+
+    Raises:
+      GaxError: when the failure of a listing is reached. The other listings
+        are stopped.
+      ValueError: if ``concurrency`` or ``buffered_pages`` is not positive.
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be positive')
+    if buffered_pages < 1:
+        raise ValueError('buffered_pages must be positive')
+
+    merger = _Merger(list_pages, requests, concurrency, buffered_pages)
+    try:
+        while True:
+            fetched = merger.next_page(ordered)
+            if fetched is None:
+                return
+            listing, page = fetched
+            for resource in page:
+                yield resource if ordered else (listing.request, resource)
+    finally:
+        merger.close()
@@ -33,8 +33,6 @@ from __future__ import absolute_import
 
 from collections import namedtuple
 
-from ply import lex, yacc
-
 _BINDING = 1
 _END_BINDING = 2
 _TERMINAL = 3
@@ -185,6 +183,9 @@ class _Parser(object):
     segment_count = 0
 
     def __init__(self):
+        # ply is only needed once a template is parsed, and slow to import.
+        from ply import lex, yacc
+
         self.lexer = lex.lex(module=self)
         self.parser = yacc.yacc(module=self, debug=False, write_tables=False)
 
@@ -0,0 +1,140 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides columnar projections of the resources of page-streamed calls.
+
+Rather than yielding each resource message, a :class:`ColumnIterator` pulls
+a few fields out of all the resources of a page at once, and yields them as
+columns. For example:
+
+    >>> pages = api.list_foos(request, CallOptions(page_token=INITIAL_PAGE))
+    >>> for columns in ColumnIterator(pages, ['name', 'stats.size'],
+    ...                               typecodes={'stats.size': 'q'}):
+    ...     total += sum(columns['stats.size'])
+
+The messages of a page can be released as soon as it is projected, and
+numeric columns can be packed in :class:`array.array` buffers.
+"""
+
+from __future__ import absolute_import
+
+import array
+import collections
+import operator
+
+from google.gax.utils import protobuf
+from google.protobuf.message import Message
+
+
+def project(resources, fields, typecodes=None):
+    """Extracts columns of fields from resources.
+
+    Args:
+      resources (Sequence[Union[~google.protobuf.message.Message, Mapping]]):
+        the resources, e.g. a page of a page-streamed call.
+      fields (Sequence[str]): the paths of the fields to extract, dotted for
+        nested fields as in :func:`google.gax.utils.protobuf.get`.
+      typecodes (Mapping[str, str]): the :mod:`array` type codes of the
+        fields whose column is an ``array.array``, e.g. ``'d'`` for a double
+        field. The other columns are lists.
+
+    Returns:
+      OrderedDict[str, Union[list, array.array]]: the column of each field,
+        in the order of ``fields``.
+
+    Raises:
+      KeyError: if a field is not found on a resource.
+    """
+    fields = tuple(fields)
+    typecodes = typecodes or {}
+    if not resources:
+        columns = [()] * len(fields)
+    elif isinstance(resources[0], Message):
+        getter = operator.attrgetter(*fields)
+        try:
+            rows = list(map(getter, resources))
+        except AttributeError:
+            # Report the missing field as protobuf.get does.
+            for field in fields:
+                protobuf.get(resources[0], field)
+            raise
+        columns = [rows] if len(fields) == 1 else zip(*rows)
+    else:
+        columns = zip(*[
+            tuple(protobuf.get(resource, field) for field in fields)
+            for resource in resources])
+
+    projection = collections.OrderedDict()
+    for field, column in zip(fields, columns):
+        typecode = typecodes.get(field)
+        if typecode:
+            projection[field] = array.array(typecode, column)
+        else:
+            projection[field] = list(column)
+    return projection
+
+
+class ColumnIterator(object):
+    """An iterator over the columns of the pages of a page iterator.
+
+    Each page of the page iterator is projected with :func:`project`.
+    """
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self, page_iterator, fields, typecodes=None):
+        """Constructor.
+
+        Args:
+          page_iterator (google.gax.PageIterator): the base iterator of
+            getting pages.
+          fields (Sequence[str]): the paths of the fields to extract.
+          typecodes (Mapping[str, str]): the :mod:`array` type codes of the
+            fields whose column is an ``array.array``.
+        """
+        self._page_iterator = page_iterator
+        self._fields = tuple(fields)
+        self._typecodes = dict(typecodes or {})
+
+    @property
+    def cursor(self):
+        """PageCursor: the position at which to resume with the next page,
+        or None once all the pages have been returned."""
+        return self._page_iterator.cursor
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """For Python 2.7 compatibility; see __next__."""
+        return self.__next__()
+
+    def __next__(self):
+        """Retrieves the columns of the next page."""
+        return project(
+            next(self._page_iterator), self._fields, self._typecodes)
@@ -0,0 +1,126 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides a client-side rate limit for the attempts of a method.
+
+:class:`RateLimiter` is a token bucket: it holds up to ``burst`` tokens and
+gains ``qps`` tokens per second, and each attempt takes one token. Attempts
+made while the bucket is empty either wait for their token or fail fast with
+:class:`google.gax.errors.RateLimitExceededError`.
+
+:func:`limited` wraps an API call so that its attempts go through a rate
+limiter. Bundled calls only make an attempt per bundle, so a whole bundle
+takes a single token.
+"""
+
+from __future__ import absolute_import, division
+
+import threading
+import time
+
+from google.gax import errors
+
+
+class RateLimiter(object):
+    """A token bucket shared by the attempts of a method."""
+
+    def __init__(self, options):
+        """Constructor.
+
+        Args:
+          options (gax.RateLimitOptions): configures the rate and burst of
+            the rate limiter.
+        """
+        if options.qps <= 0:
+            raise ValueError('qps must be positive')
+        self._qps = float(options.qps)
+        self._burst = options.burst
+        if self._burst is None:
+            self._burst = max(1.0, self._qps)
+        self._fail_fast = options.fail_fast
+        self._lock = threading.Lock()
+        self._tokens = self._burst
+        self._updated_at = time.time()
+
+    def _refill(self, now):
+        self._tokens = min(
+            self._burst,
+            self._tokens + (now - self._updated_at) * self._qps)
+        self._updated_at = now
+
+    def acquire(self, timeout=None):
+        """Takes a token, waiting for it unless the rate limiter fails fast.
+
+        Tokens are handed out in the order they are asked for: a waiting
+        attempt reserves its token, and later attempts wait behind it.
+
+        Args:
+          timeout (float): the longest time, in seconds, to wait for a token.
+            If None, waits as long as needed.
+
+        Raises:
+          RateLimitExceededError: if no token is available and the rate
+            limiter fails fast, or if the token would only be available after
+            ``timeout``.
+        """
+        with self._lock:
+            self._refill(time.time())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            wait = (1 - self._tokens) / self._qps
+            if self._fail_fast or (timeout is not None and wait > timeout):
+                raise errors.RateLimitExceededError(
+                    'Client-side rate limit exceeded, the call was not sent')
+            # Going into debt reserves the token that will be available
+            # after ``wait``.
+            self._tokens -= 1
+        time.sleep(wait)
+
+
+def limited(a_func, limiter):
+    """Creates a function equivalent to a_func, whose rate is limited.
+
+    The last positional argument of ``a_func`` must be the timeout of the
+    attempt, which bounds the time spent waiting for the rate limit.
+
+    Args:
+      a_func (callable): A callable.
+      limiter (RateLimiter): The rate limiter of the method.
+
+    Returns:
+      Callable: A function that takes a token from ``limiter`` before each
+        call.
+    """
+    def inner(*args, **kwargs):
+        """Equivalent to ``a_func``, but waits for the rate limit."""
+        limiter.acquire(args[-1] if args else None)
+        return a_func(*args, **kwargs)
+
+    return inner
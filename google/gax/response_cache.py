@@ -0,0 +1,224 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides a client-side cache of the responses of idempotent methods."""
+
+from __future__ import absolute_import
+
+import collections
+import threading
+import time
+
+_MILLIS_PER_SECOND = 1000.0
+
+
+def request_key(request):
+    """Returns the cache key of ``request``, or None if it has none.
+
+    Protocol buffer messages are keyed by their deterministic serialization;
+    other requests by themselves, if hashable.
+
+    Args:
+      request (object): the request.
+
+    Returns:
+      Optional[object]: the key.
+    """
+    serialize = getattr(request, 'SerializeToString', None)
+    if serialize is not None:
+        try:
+            return type(request), serialize(deterministic=True)
+        except TypeError:
+            return type(request), serialize()
+    try:
+        hash(request)
+    except TypeError:
+        return None
+    return request
+
+
+class _ScopedKey(
+        collections.namedtuple('_ScopedKey', ['request', 'scope'])):
+    """The cache key of a call: its request key and its kwargs scope."""
+    __slots__ = ()
+
+
+def _kwargs_scope(kwargs):
+    """Returns a hashable summary of the keyword arguments of a call.
+
+    Args:
+      kwargs (dict): the keyword arguments, e.g. the metadata of the call.
+
+    Returns:
+      Optional[tuple]: the summary, or None if ``kwargs`` cannot be hashed.
+    """
+    if not kwargs:
+        return ()
+    try:
+        scope = tuple(sorted(
+            [(name, tuple(value) if isinstance(value, list) else value)
+             for name, value in kwargs.items()]))
+        hash(scope)
+    except TypeError:
+        return None
+    return scope
+
+
+def copy_response(response):
+    """Returns a copy of ``response`` if it is a protocol buffer message."""
+    copy_from = getattr(response, 'CopyFrom', None)
+    if copy_from is None:
+        return response
+    copied = type(response)()
+    copied.CopyFrom(response)
+    return copied
+
+
+class ResponseCache(object):
+    """Caches the responses of a method for a time.
+
+    Responses are keyed by their request and the keyword arguments of their
+    call, e.g. its metadata, and the least recently used are evicted once
+    there are more than ``max_entries``. Callers receive copies
+    of the cached protocol buffer messages, so they cannot alter the cache.
+
+    Attributes:
+      hits (int): the number of calls answered from the cache.
+      misses (int): the number of calls made because no response was cached.
+    """
+
+    def __init__(self, options):
+        """Constructor.
+
+        Args:
+          options (gax.ResponseCacheOptions): configures the cache.
+        """
+        self._ttl = options.ttl_millis / _MILLIS_PER_SECOND
+        self._max_entries = options.max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """Returns the response cached for ``key``.
+
+        Args:
+          key (object): the key, e.g. as returned by :func:`request_key`.
+
+        Returns:
+          Tuple[bool, object]: whether a response is cached, and a copy of it.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries[key] = self._entries.pop(key)
+            self.hits += 1
+        return True, copy_response(entry[1])
+
+    def put(self, key, response):
+        """Caches ``response`` for ``key``.
+
+        Args:
+          key (object): the key, e.g. as returned by :func:`request_key`.
+          response (object): the response.
+        """
+        expiry = time.time() + self._ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expiry, copy_response(response))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, request=None):
+        """Removes the responses cached for ``request``, or all of them.
+
+        Args:
+          request (object): the request whose responses are removed, whatever
+            the keyword arguments of their calls. If None, the cache is
+            cleared.
+        """
+        with self._lock:
+            if request is None:
+                self._entries.clear()
+                return
+            key = request_key(request)
+            for entry_key in [
+                    entry_key for entry_key in self._entries
+                    if entry_key == key or (
+                        isinstance(entry_key, _ScopedKey) and
+                        entry_key.request == key)]:
+                del self._entries[entry_key]
+
+
+def cached(a_func, cache, kwargs=None):
+    """Answers calls from ``cache`` when possible, skipping ``a_func``.
+
+    Only successful responses are cached. Calls share the cached responses of
+    other calls only if their keyword arguments are equal, so calls with
+    different metadata, e.g. credentials or routing headers, do not see each
+    other's responses.
+
+    Args:
+      a_func (Callable[[object], object]): makes the call.
+      cache (ResponseCache): the cache.
+      kwargs (dict): the keyword arguments ``a_func`` passes to the RPC. If
+        they cannot be hashed, the calls bypass the cache.
+
+    Returns:
+      Callable[[object], object]: makes the call if its response is not
+        cached.
+    """
+    scope = _kwargs_scope(kwargs)
+    if scope is None:
+        return a_func
+
+    def inner(request):
+        """Looks ``request`` up in the cache before calling."""
+        key = request_key(request)
+        if key is None:
+            return a_func(request)
+        key = _ScopedKey(key, scope)
+        hit, response = cache.get(key)
+        if hit:
+            return response
+        response = a_func(request)
+        cache.put(key, response)
+        return response
+
+    return inner
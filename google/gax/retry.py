@@ -38,6 +38,11 @@ from google.gax import config, errors
 
 _MILLIS_PER_SECOND = 1000
 
+_UNSENT_ERRORS = (
+    errors.CircuitBreakerOpenError, errors.RateLimitExceededError,
+    errors.ConcurrencyLimitExceededError, errors.AdmissionRejectedError)
+"""The errors of attempts that the client declined to send."""
+
 
 def _has_timeout_settings(backoff_settings):
     return (backoff_settings.rpc_timeout_multiplier is not None and
@@ -70,7 +75,158 @@ def add_timeout_arg(a_func, timeout, **kwargs):
     return inner
 
 
-def retryable(a_func, retry_options, **kwargs):
+class _Backoff(object):
+    """Tracks the delays and timeouts of the attempts of a retrying call.
+
+    This holds the state of the exponential backoff algorithm for a single
+    call, so that it can be shared by the synchronous and asynchronous
+    retrying wrappers.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, retry_options, latency=None):
+        """Constructor.
+
+        Args:
+          retry_options (RetryOptions): Configures the exceptions upon which
+            the call should retry, and the parameters to the exponential
+            backoff retry algorithm.
+          latency (gax.utils.latency.LatencyTracker): The observed latency of
+            the attempts of the method, used if ``retry_options`` configures
+            adaptive timeouts.
+        """
+        backoff_settings = retry_options.backoff_settings
+        self._retry_codes = retry_options.retry_codes
+        self._backoff_settings = backoff_settings
+        self._backoff_overrides = retry_options.backoff_overrides or {}
+        self._has_timeout_settings = _has_timeout_settings(backoff_settings)
+        # The next delay of each schedule, keyed by the overridden code or
+        # None for the schedule shared by the other codes.
+        self._delays = {}
+        self._last_exception = None
+        if self._has_timeout_settings:
+            self._timeout_mult = backoff_settings.rpc_timeout_multiplier
+            self._max_timeout = (backoff_settings.max_rpc_timeout_millis /
+                                 _MILLIS_PER_SECOND)
+            self.timeout = (backoff_settings.initial_rpc_timeout_millis /
+                            _MILLIS_PER_SECOND)
+            self._now = time.time()
+            self.deadline = self._now + (
+                backoff_settings.total_timeout_millis / _MILLIS_PER_SECOND)
+            adaptive = retry_options.adaptive_timeout
+            if adaptive is not None and latency is not None:
+                self._adapt_timeout(adaptive, latency)
+        else:
+            self.timeout = None
+            self.deadline = None
+
+    def _adapt_timeout(self, adaptive, latency):
+        """Derives the timeout of the first attempt from ``latency``."""
+        observed = latency.percentile(adaptive.percentile)
+        if observed is None:
+            return
+        self.timeout = min(
+            max(observed * adaptive.margin,
+                adaptive.min_timeout_millis / _MILLIS_PER_SECOND),
+            self._max_timeout, self.deadline - self._now)
+
+    @property
+    def error(self):
+        """The RetryError to raise once the total timeout is exceeded."""
+        if self._last_exception is None:
+            return errors.RetryError('Retry total timeout exceeded before any'
+                                     'response was received')
+        return errors.RetryError(
+            'Retry total timeout exceeded with exception',
+            self._last_exception)
+
+    def in_time(self):
+        """Returns ``True`` if another attempt may be made."""
+        return self.deadline is None or self._now < self.deadline
+
+    def on_error(self, exception):
+        """Records a failed attempt.
+
+        Args:
+          exception (Exception): the exception raised by the attempt.
+
+        Returns:
+          float: the time to sleep, in seconds, before the next attempt.
+
+        Raises:
+          RetryError: if the exception is not classified as transient.
+          CircuitBreakerOpenError: if the attempt was not sent because the
+            circuit breaker of the call is open.
+          RateLimitExceededError: if the attempt was not sent because of the
+            rate limit of the call.
+          ConcurrencyLimitExceededError: if the attempt was not sent because
+            of the concurrency limit of the call.
+          AdmissionRejectedError: if the attempt was shed by the admission of
+            the client.
+        """
+        if isinstance(exception, _UNSENT_ERRORS):
+            raise exception
+
+        code = config.exc_to_code(exception)
+        if code not in self._retry_codes:
+            raise errors.RetryError(
+                'Exception occurred in retry method that was not'
+                ' classified as transient', exception)
+
+        self._last_exception = exception
+
+        # Each overridden code advances its own schedule, so that, e.g., a
+        # long throttling backoff is not shortened by an intervening
+        # connection error, nor the other way round.
+        schedule = code if code in self._backoff_overrides else None
+        settings = self._backoff_overrides.get(code, self._backoff_settings)
+        delay = self._delays.get(schedule,
+                                 settings.initial_retry_delay_millis)
+
+        # Sleep a random number which will, on average, equal the
+        # expected delay, unless the server asked for a specific delay.
+        to_sleep = random.uniform(0, delay * 2) / _MILLIS_PER_SECOND
+        self._delays[schedule] = min(delay * settings.retry_delay_multiplier,
+                                     settings.max_retry_delay_millis)
+
+        server_delay = config.exc_to_retry_delay(exception)
+        if server_delay is not None:
+            to_sleep = server_delay
+            if self.deadline is not None:
+                to_sleep = max(0, min(to_sleep, self.deadline - time.time()))
+        return to_sleep
+
+    def on_wake(self):
+        """Updates the timeout of the next attempt after sleeping."""
+        if self._has_timeout_settings:
+            self._now = time.time()
+            self.timeout = min(self.timeout * self._timeout_mult,
+                               self._max_timeout, self.deadline - self._now)
+
+
+def _observed(a_func, latency):
+    """Records the latency of the calls of ``a_func`` in ``latency``.
+
+    Failed calls are only recorded if they took at least their timeout, the
+    last positional argument, as they show the latency is at least that long.
+    """
+    def inner(*args, **kwargs):
+        """Calls ``a_func``, timing it."""
+        started = time.time()
+        try:
+            result = a_func(*args, **kwargs)
+        except Exception:
+            elapsed = time.time() - started
+            if args[-1] is not None and elapsed >= args[-1]:
+                latency.record(elapsed)
+            raise
+        latency.record(time.time() - started)
+        return result
+
+    return inner
+
+
+def retryable(a_func, retry_options, latency=None, **kwargs):
     """Creates a function equivalent to a_func, but that retries on certain
     exceptions.
 
@@ -79,21 +235,18 @@ def retryable(a_func, retry_options, **kwargs):
       retry_options (RetryOptions): Configures the exceptions upon which the
         callable should retry, and the parameters to the exponential backoff
         retry algorithm.
+      latency (gax.utils.latency.LatencyTracker): Records the latency of the
+        attempts, from which their timeouts are derived if ``retry_options``
+        configures adaptive timeouts.
       kwargs: Addtional arguments passed through to the callable.
 
     Returns:
         Callable: A function that will retry on exception.
     """
-    delay_mult = retry_options.backoff_settings.retry_delay_multiplier
-    max_delay_millis = retry_options.backoff_settings.max_retry_delay_millis
-    has_timeout_settings = _has_timeout_settings(retry_options.backoff_settings)
-
-    if has_timeout_settings:
-        timeout_mult = retry_options.backoff_settings.rpc_timeout_multiplier
-        max_timeout = (retry_options.backoff_settings.max_rpc_timeout_millis /
-                       _MILLIS_PER_SECOND)
-        total_timeout = (retry_options.backoff_settings.total_timeout_millis /
-                         _MILLIS_PER_SECOND)
+    if retry_options.adaptive_timeout is None:
+        latency = None
+    elif latency is not None:
+        a_func = _observed(a_func, latency)
 
     def inner(*args):
         """Equivalent to ``a_func``, but retries upon transient failure.
@@ -101,45 +254,15 @@ def retryable(a_func, retry_options, **kwargs):
         Retrying is done through an exponential backoff algorithm configured
         by the options in ``retry``.
         """
-        delay = retry_options.backoff_settings.initial_retry_delay_millis
-        exc = errors.RetryError('Retry total timeout exceeded before any'
-                                'response was received')
-        if has_timeout_settings:
-            timeout = (
-                retry_options.backoff_settings.initial_rpc_timeout_millis /
-                _MILLIS_PER_SECOND)
-
-            now = time.time()
-            deadline = now + total_timeout
-        else:
-            timeout = None
-            deadline = None
-
-        while deadline is None or now < deadline:
+        backoff = _Backoff(retry_options, latency)
+        while backoff.in_time():
             try:
-                to_call = add_timeout_arg(a_func, timeout, **kwargs)
-                return to_call(*args)
+                return a_func(*(args + (backoff.timeout,)), **kwargs)
             except Exception as exception:  # pylint: disable=broad-except
-                code = config.exc_to_code(exception)
-                if code not in retry_options.retry_codes:
-                    raise errors.RetryError(
-                        'Exception occurred in retry method that was not'
-                        ' classified as transient', exception)
-
-                exc = errors.RetryError(
-                    'Retry total timeout exceeded with exception', exception)
-
-                # Sleep a random number which will, on average, equal the
-                # expected delay.
-                to_sleep = random.uniform(0, delay * 2)
-                time.sleep(to_sleep / _MILLIS_PER_SECOND)
-                delay = min(delay * delay_mult, max_delay_millis)
-
-                if has_timeout_settings:
-                    now = time.time()
-                    timeout = min(
-                        timeout * timeout_mult, max_timeout, deadline - now)
-
-        raise exc
+                to_sleep = backoff.on_error(exception)
+                time.sleep(to_sleep)
+                backoff.on_wake()
+
+        raise backoff.error
 
     return inner
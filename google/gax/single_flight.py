@@ -0,0 +1,99 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides single-flight coalescing of identical concurrent calls."""
+
+from __future__ import absolute_import
+
+import threading
+
+from google.gax import response_cache
+
+
+class _Flight(object):
+    """An in-flight call, awaited by the calls coalesced into it."""
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('done', 'response', 'exception')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.exception = None
+
+
+def coalesced(a_func):
+    """Coalesces concurrent calls of ``a_func`` with identical requests.
+
+    While a call is in flight, calls with an identical request wait for it
+    rather than calling ``a_func`` again, and receive its response (a copy of
+    it, for protocol buffer messages) or its exception. Requests are compared
+    as in :func:`google.gax.response_cache.request_key`; calls whose request
+    has no key are not coalesced.
+
+    Args:
+      a_func (Callable[[object], object]): makes the call. It should be
+        idempotent.
+
+    Returns:
+      Callable[[object], object]: makes the call, or waits for an identical
+        one in flight.
+    """
+    flights = {}
+    lock = threading.Lock()
+
+    def inner(request):
+        """Joins the flight of ``request``, or starts it."""
+        key = response_cache.request_key(request)
+        if key is None:
+            return a_func(request)
+
+        with lock:
+            flight = flights.get(key)
+            leading = flight is None
+            if leading:
+                flight = flights[key] = _Flight()
+
+        if not leading:
+            flight.done.wait()
+            if flight.exception is not None:
+                raise flight.exception
+            return response_cache.copy_response(flight.response)
+
+        try:
+            flight.response = a_func(request)
+        except Exception as exception:  # pylint: disable=broad-except
+            flight.exception = exception
+            raise
+        finally:
+            with lock:
+                del flights[key]
+            flight.done.set()
+        return flight.response
+
+    return inner
@@ -0,0 +1,271 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Provides iterators over the responses of streaming calls.
+
+:class:`ResumableStream` iterates over the responses of a server-streaming
+call. After a transient error midway, the call is issued again, resuming
+after the latest resume token received, as described by a
+:class:`google.gax.StreamDescriptor`. Responses are only yielded once a
+resume token covers them, so the caller never sees a response twice.
+
+:func:`bidi_stream` iterates over the responses of a bidirectional-streaming
+call. Its requests cannot be replayed, so it is never retried.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import copy
+import time
+
+from future import utils
+
+from google.gax import config, errors, retry
+
+MAX_BUFFERED_RESPONSES = 256
+"""The number of responses without a resume token buffered by a stream.
+
+Beyond it, the buffered responses are yielded, and the stream cannot be
+resumed until another resume token is received.
+"""
+
+
+def _wrap_error(exception):
+    if isinstance(exception, tuple(config.API_ERRORS)):
+        return errors.create_error('RPC failed', cause=exception)
+    return exception
+
+
+class ResumableStream(object):
+    """An iterator over the responses of a server-streaming API call.
+
+    The stream is retried according to the retry options of its settings.
+    Before it receives a response, it is simply issued again. Afterwards, it
+    is only issued again if its settings have a stream descriptor, from the
+    latest resume token received. Each attempt that receives a response
+    starts the retries afresh, so a long stream is not bounded by the total
+    timeout of its retries, but each attempt is.
+
+    Attributes:
+      resume_token: the latest resume token received, which covers all the
+        responses yielded so far, or None if none was received.
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, api_call, settings, request, **kwargs):
+        """
+        Args:
+          api_call (Callable[[req, timeout], Iterator[resp]]): a
+            server-streaming API call.
+          settings (_CallSettings): the settings of the call.
+          request (object): The request to be passed to the API call. It is
+            copied before the resume token is set.
+          kwargs: Arbitrary keyword arguments to be passed to the API call.
+        """
+        self.resume_token = None
+        self._func = api_call
+        self._settings = settings
+        self._descriptor = settings.stream_descriptor
+        self._retrying = bool(settings.retry and settings.retry.retry_codes)
+        self._request = request
+        self._kwargs = kwargs
+        self._stream = None
+        self._probe = None
+        self._backoff = None
+        self._received = False
+        self._unresumable = False
+        self._pending = []
+        self._ready = collections.deque()
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """For Python 2.7 compatibility; see __next__."""
+        return self.__next__()
+
+    def __next__(self):
+        """Retrieves the next response."""
+        while not self._ready:
+            if self._done:
+                raise StopIteration
+            self._receive()
+        return self._ready.popleft()
+
+    def cancel(self):
+        """Cancels the call; the responses already received are dropped."""
+        if self._stream is not None:
+            if hasattr(self._stream, 'cancel'):
+                self._stream.cancel()
+            if self._settings.circuit_breaker is not None:
+                self._settings.circuit_breaker.release(self._probe)
+        self._stream = None
+        self._ready.clear()
+        self._done = True
+
+    def _start(self):
+        """Issues the call, from the latest resume token if any."""
+        timeout = self._settings.timeout
+        if self._retrying:
+            if self._backoff is None:
+                self._backoff = retry._Backoff(self._settings.retry)
+            timeout = None
+            if self._backoff.deadline is not None:
+                timeout = max(0, self._backoff.deadline - time.time())
+
+        request = self._request
+        if self.resume_token is not None:
+            request = copy.deepcopy(request)
+            setattr(request, self._descriptor.request_resume_token_field,
+                    self.resume_token)
+
+        if self._settings.rate_limiter is not None:
+            self._settings.rate_limiter.acquire(timeout)
+        breaker = self._settings.circuit_breaker
+        if breaker is not None:
+            self._probe = breaker.allow()
+        self._received = False
+        self._stream = self._func(request, timeout, **self._kwargs)
+
+    def _receive(self):
+        """Receives a response, or handles the end or failure of the call."""
+        breaker = self._settings.circuit_breaker
+        try:
+            if self._stream is None:
+                self._start()
+            response = next(self._stream)
+        except StopIteration:
+            if breaker is not None:
+                breaker.record(probe=self._probe)
+            self._ready.extend(self._pending)
+            self._pending = []
+            self._stream = None
+            self._done = True
+            return
+        except errors.GaxError:
+            raise
+        except Exception as exception:  # pylint: disable=broad-except
+            if breaker is not None:
+                breaker.record(exception, self._probe)
+            self._stream = None
+            self._on_error(exception)
+            return
+
+        if not self._received:
+            self._received = True
+            self._backoff = None
+        if self._descriptor is None:
+            self._unresumable = True
+            self._ready.append(response)
+            return
+
+        self._pending.append(response)
+        token = getattr(response, self._descriptor.response_resume_token_field)
+        if token:
+            self.resume_token = token
+            self._unresumable = False
+        elif len(self._pending) <= MAX_BUFFERED_RESPONSES:
+            return
+        else:
+            self._unresumable = True
+        self._ready.extend(self._pending)
+        self._pending = []
+
+    def _on_error(self, exception):
+        """Waits before resuming the call, or raises the error."""
+        if not self._retrying:
+            utils.raise_with_traceback(_wrap_error(exception))
+        if self._unresumable:
+            utils.raise_with_traceback(errors.create_error(
+                'RPC failed after yielding responses that cannot be resumed',
+                cause=exception))
+
+        if self._backoff is None:
+            self._backoff = retry._Backoff(self._settings.retry)
+        to_sleep = self._backoff.on_error(exception)
+        time.sleep(to_sleep)
+        self._backoff.on_wake()
+        if not self._backoff.in_time():
+            raise self._backoff.error
+        # The responses after the resume token are sent again.
+        self._pending = []
+
+
+def bidi_stream(api_call, settings, requests, **kwargs):
+    """Iterates over the responses of a bidirectional-streaming API call.
+
+    Closing the iterator cancels the call.
+
+    Args:
+      api_call (Callable[[Iterator[req], timeout], Iterator[resp]]): a
+        bidirectional-streaming API call.
+      settings (_CallSettings): the settings of the call. The call is not
+        retried; if it has retry options, their total timeout bounds it.
+      requests (Iterator[object]): The requests to be sent.
+      kwargs: Arbitrary keyword arguments to be passed to the API call.
+
+    Yields:
+      object: the responses of the call.
+
+    Raises:
+      GaxError: if the call fails.
+    """
+    timeout = settings.timeout
+    if settings.retry and settings.retry.backoff_settings:
+        total_timeout = settings.retry.backoff_settings.total_timeout_millis
+        if total_timeout is not None:
+            timeout = total_timeout / retry._MILLIS_PER_SECOND
+    if settings.rate_limiter is not None:
+        settings.rate_limiter.acquire(timeout)
+    breaker = settings.circuit_breaker
+    probe = None
+    if breaker is not None:
+        probe = breaker.allow()
+
+    stream = None
+    done = False
+    try:
+        stream = api_call(requests, timeout, **kwargs)
+        for response in stream:
+            yield response
+        done = True
+    except Exception as exception:  # pylint: disable=broad-except
+        done = True
+        if breaker is not None:
+            breaker.record(exception, probe)
+        utils.raise_with_traceback(_wrap_error(exception))
+    finally:
+        if not done:
+            if stream is not None and hasattr(stream, 'cancel'):
+                stream.cancel()
+            if breaker is not None:
+                breaker.release(probe)
+    if breaker is not None:
+        breaker.record(probe=probe)
@@ -0,0 +1,125 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Utility classes for tracking the latency of API calls."""
+
+from __future__ import absolute_import, division
+
+import math
+import threading
+
+_MIN_LATENCY_SECS = 0.0001
+_MAX_LATENCY_SECS = 600
+_BUCKET_GROWTH = 1.1
+_NUM_BUCKETS = int(math.ceil(
+    math.log(_MAX_LATENCY_SECS / _MIN_LATENCY_SECS, _BUCKET_GROWTH))) + 1
+
+
+def _bucket_for(seconds):
+    """Returns the index of the histogram bucket holding ``seconds``."""
+    if seconds <= _MIN_LATENCY_SECS:
+        return 0
+    index = int(math.log(seconds / _MIN_LATENCY_SECS, _BUCKET_GROWTH)) + 1
+    return min(index, _NUM_BUCKETS - 1)
+
+
+def _bucket_upper_bound(index):
+    """Returns the largest latency, in seconds, counted in bucket ``index``."""
+    return _MIN_LATENCY_SECS * _BUCKET_GROWTH ** index
+
+
+class LatencyTracker(object):
+    """A streaming sketch of the latency distribution of an API call.
+
+    Latencies are counted in a histogram of exponentially growing buckets, so
+    recording a sample is constant time and memory use does not depend on the
+    number of samples. Percentiles are approximated to within roughly 10% of
+    the true value, always rounding up.
+
+    Older samples are periodically decayed so that the sketch follows changes
+    in the latency of the backend.
+    """
+
+    def __init__(self, min_samples=20, decay_interval=1000):
+        """Constructor.
+
+        Args:
+            min_samples (int): the number of samples that must be recorded
+              before ``percentile`` returns an estimate.
+            decay_interval (int): the weight of all recorded samples is halved
+              each time this many new samples have been recorded.
+        """
+        self._min_samples = min_samples
+        self._decay_interval = decay_interval
+        self._counts = [0.0] * _NUM_BUCKETS
+        self._total = 0.0
+        self._since_decay = 0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        """The decayed number of samples currently held by the sketch."""
+        return self._total
+
+    def record(self, seconds):
+        """Adds a latency sample.
+
+        Args:
+            seconds (float): the observed latency, in seconds.
+        """
+        index = _bucket_for(seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._total += 1
+            self._since_decay += 1
+            if self._since_decay >= self._decay_interval:
+                self._counts = [count / 2 for count in self._counts]
+                self._total /= 2
+                self._since_decay = 0
+
+    def percentile(self, pct):
+        """Estimates a percentile of the recorded latencies.
+
+        Args:
+            pct (float): the percentile to estimate, between 0 and 100.
+
+        Returns:
+            Optional[float]: the estimated latency, in seconds, or None if
+              fewer than ``min_samples`` samples have been recorded.
+        """
+        with self._lock:
+            if self._total < self._min_samples:
+                return None
+            target = self._total * pct / 100
+            seen = 0.0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if count and seen >= target:
+                    return _bucket_upper_bound(index)
+        return _bucket_upper_bound(_NUM_BUCKETS - 1)
@@ -33,11 +33,32 @@ from __future__ import absolute_import
 
 import collections
 import platform
+import threading
 
-import pkg_resources
+import grpc
 
 from google import gax
 
+_HEADER_VALUE_CACHE_SIZE = 64
+
+_grpc_version = []
+_header_values = {}
+_header_values_lock = threading.Lock()
+
+
+def _get_grpc_version():
+    """Returns the version of grpcio, looked up once per process."""
+    if not _grpc_version:
+        version = getattr(grpc, '__version__', None)
+        if version is None:
+            # Older versions of grpcio do not expose their version.
+            import pkg_resources
+            # pylint: disable=no-member
+            version = pkg_resources.get_distribution('grpcio').version
+            # pylint: enable=no-member
+        _grpc_version.append(version)
+    return _grpc_version[0]
+
 
 def fill(metrics_headers=()):
     """Add the metrics headers known to GAX.
@@ -61,9 +82,7 @@ def fill(metrics_headers=()):
     # These come after what may have been passed in (generally the GAPIC
     # library).
     answer['gax'] = gax.__version__
-    # pylint: disable=no-member
-    answer['grpc'] = pkg_resources.get_distribution('grpcio').version
-    # pylint: enable=no-member
+    answer['grpc'] = _get_grpc_version()
 
     return answer
 
@@ -77,3 +96,25 @@ def stringify(metrics_headers=()):
     """
     metrics_headers = collections.OrderedDict(metrics_headers)
     return ' '.join(['%s/%s' % (k, v) for k, v in metrics_headers.items()])
+
+
+def header_value(metrics_headers=()):
+    """Returns the value of the metrics header for ``metrics_headers``.
+
+    This is ``stringify(fill(metrics_headers))``, computed once per distinct
+    ``metrics_headers`` in a process.
+    """
+    key = tuple(collections.OrderedDict(metrics_headers).items())
+    try:
+        return _header_values[key]
+    except KeyError:
+        pass
+    except TypeError:
+        return stringify(fill(metrics_headers))
+
+    value = stringify(fill(metrics_headers))
+    with _header_values_lock:
+        if len(_header_values) >= _HEADER_VALUE_CACHE_SIZE:
+            _header_values.clear()
+        _header_values[key] = value
+    return value
@@ -87,6 +87,15 @@ def cover(session):
         'coverage', 'report', '--show-missing', '--fail-under=98')
 
 
+@nox.session
+def benchmarks(session):
+    session.interpreter = 'python3.6'
+    session.install('.')
+    session.run('python', 'benchmarks/api_callable_benchmark.py')
+    session.run('python', 'benchmarks/client_construction_benchmark.py')
+    session.run('python', 'benchmarks/import_benchmark.py')
+
+
 @nox.session
 @nox.parametrize(
     'python', ['python2.7', 'python3.4', 'python3.5', 'python3.6'])
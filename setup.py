@@ -30,6 +30,7 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import io
+import re
 
 from setuptools import find_packages
 from setuptools import setup
@@ -49,9 +50,15 @@ DEPENDENCIES = [
 with io.open('README.rst', 'r') as readme:
     long_description = readme.read()
 
+# The version is set in the package itself, so it can be read without
+# looking up the installed distribution.
+with io.open('google/gax/__init__.py', 'r') as init:
+    version = re.search(
+        r"^__version__ = '([^']+)'", init.read(), re.MULTILINE).group(1)
+
 setup(
     name='google-gax',
-    version='0.16.0',
+    version=version,
     description='Google API Extensions',
     long_description=long_description,
     author='Google API Authors',
@@ -0,0 +1,261 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name,protected-access
+"""Unit tests for admission"""
+
+from __future__ import absolute_import
+
+import threading
+
+import mock
+import unittest2
+
+from google.gax import (
+    _CallSettings, admission, AdmissionOptions, api_callable,
+    circuit_breaker, CircuitBreakerOptions, PRIORITY_HIGH, PRIORITY_LOW,
+    PRIORITY_NORMAL)
+from google.gax.errors import AdmissionRejectedError, GaxError
+
+
+def _admitted_order(scheduler, waiters):
+    order = []
+    pending = dict(waiters)
+    while pending:
+        scheduler.release()
+        for name, waiter in list(pending.items()):
+            if waiter.state == admission._ADMITTED:
+                order.append(name)
+                del pending[name]
+    return order
+
+
+class TestAdmissionScheduler(unittest2.TestCase):
+
+    def test_admits_immediately_below_bound(self):
+        scheduler = admission.AdmissionScheduler(
+            AdmissionOptions(max_in_flight=2))
+        scheduler.acquire(PRIORITY_LOW, 'method')
+        scheduler.acquire(PRIORITY_LOW, 'method')
+        self.assertEqual(scheduler.in_flight, 2)
+        scheduler.release()
+        self.assertEqual(scheduler.in_flight, 1)
+
+    def test_weighted_fair_queueing(self):
+        scheduler = admission.AdmissionScheduler(AdmissionOptions(
+            max_in_flight=1, priority_weights=(1, 1, 4)))
+        scheduler.acquire(PRIORITY_LOW, 'backfill')
+        waiters = {}
+        for i in range(2):
+            waiters['low%d' % i] = scheduler._enqueue(
+                PRIORITY_LOW, (PRIORITY_LOW, 'backfill'))
+        for i in range(5):
+            waiters['high%d' % i] = scheduler._enqueue(
+                PRIORITY_HIGH, (PRIORITY_HIGH, 'get'))
+        self.assertEqual(scheduler.queue_depth, 7)
+
+        # High priority calls get four admissions for each low priority one,
+        # and low priority calls are not starved.
+        self.assertEqual(
+            _admitted_order(scheduler, waiters),
+            ['high0', 'high1', 'high2', 'low0', 'high3', 'high4', 'low1'])
+        self.assertEqual(scheduler.queue_depth, 0)
+        self.assertEqual(scheduler.in_flight, 1)
+
+    def test_methods_share_fairly(self):
+        scheduler = admission.AdmissionScheduler(
+            AdmissionOptions(max_in_flight=1))
+        scheduler.acquire(PRIORITY_NORMAL, 'a')
+        waiters = {}
+        for i in range(3):
+            waiters['a%d' % i] = scheduler._enqueue(
+                PRIORITY_NORMAL, (PRIORITY_NORMAL, 'a'))
+        for i in range(2):
+            waiters['b%d' % i] = scheduler._enqueue(
+                PRIORITY_NORMAL, (PRIORITY_NORMAL, 'b'))
+        self.assertEqual(
+            _admitted_order(scheduler, waiters),
+            ['a0', 'b0', 'a1', 'b1', 'a2'])
+
+    def test_full_queue_sheds_lowest_priority(self):
+        scheduler = admission.AdmissionScheduler(
+            AdmissionOptions(max_in_flight=1, max_queue_size=2))
+        scheduler.acquire(PRIORITY_LOW, 'a')
+        low = scheduler._enqueue(PRIORITY_LOW, (PRIORITY_LOW, 'a'))
+        normal = scheduler._enqueue(PRIORITY_NORMAL, (PRIORITY_NORMAL, 'a'))
+
+        self.assertRaises(
+            AdmissionRejectedError, scheduler.acquire, PRIORITY_LOW, 'a')
+        self.assertIsNone(low.state)
+
+        high = scheduler._enqueue(PRIORITY_HIGH, (PRIORITY_HIGH, 'a'))
+        self.assertEqual(low.state, admission._SHED)
+        self.assertTrue(low.event.is_set())
+        self.assertEqual(scheduler.queue_depth, 2)
+        self.assertEqual(
+            _admitted_order(scheduler, {'normal': normal, 'high': high}),
+            ['high', 'normal'])
+
+    def test_shed_after_timeout(self):
+        scheduler = admission.AdmissionScheduler(
+            AdmissionOptions(max_in_flight=1))
+        scheduler.acquire(PRIORITY_NORMAL, 'a')
+        self.assertRaises(AdmissionRejectedError, scheduler.acquire,
+                          PRIORITY_NORMAL, 'a', 0.01)
+        self.assertEqual(scheduler.queue_depth, 0)
+        scheduler.release()
+        self.assertEqual(scheduler.in_flight, 0)
+
+    @mock.patch('time.time')
+    def test_measures_admission_interval(self, mock_time):
+        scheduler = admission.AdmissionScheduler(
+            AdmissionOptions(max_in_flight=1))
+        scheduler.acquire(PRIORITY_NORMAL, 'a')
+        for _ in range(3):
+            scheduler._enqueue(PRIORITY_NORMAL, (PRIORITY_NORMAL, 'a'))
+
+        mock_time.side_effect = [10, 12, 13]
+        for _ in range(3):
+            scheduler.release()
+        self.assertAlmostEqual(scheduler.admission_interval, 1.8)
+
+        # Releases without waiters do not measure the idle time.
+        scheduler.release()
+        scheduler.acquire(PRIORITY_NORMAL, 'a')
+        scheduler._enqueue(PRIORITY_NORMAL, (PRIORITY_NORMAL, 'a'))
+        mock_time.side_effect = [100]
+        scheduler.release()
+        self.assertAlmostEqual(scheduler.admission_interval, 1.8)
+
+    def test_sheds_up_front_when_deadline_unreachable(self):
+        scheduler = admission.AdmissionScheduler(AdmissionOptions(
+            max_in_flight=1, priority_weights=(1, 1, 1)))
+        scheduler.acquire(PRIORITY_NORMAL, 'a')
+        scheduler._admission_interval = 1.0
+        normal = [scheduler._enqueue(PRIORITY_NORMAL, (PRIORITY_NORMAL, 'a'))
+                  for _ in range(3)]
+        low = [scheduler._enqueue(PRIORITY_LOW, (PRIORITY_LOW, 'a'))
+               for _ in range(3)]
+
+        # Seven admissions, at a second each, including its own: the lowest
+        # priority waiters are shed, newest first, to make the 5.5s deadline.
+        waiter = scheduler._enqueue(
+            PRIORITY_NORMAL, (PRIORITY_NORMAL, 'a'), 5.5)
+        self.assertEqual([w.state for w in low], [None, admission._SHED,
+                                                  admission._SHED])
+        self.assertEqual([w.state for w in normal], [None] * 3)
+        self.assertIsNone(waiter.state)
+        self.assertEqual(scheduler.queue_depth, 5)
+
+        # Shedding the remaining waiter of lower priority would not do.
+        self.assertRaises(AdmissionRejectedError, scheduler.acquire,
+                          PRIORITY_NORMAL, 'a', 3)
+        self.assertIsNone(low[0].state)
+        self.assertEqual(scheduler.queue_depth, 5)
+
+        # Without a timeout, the wait is not estimated.
+        scheduler._enqueue(PRIORITY_LOW, (PRIORITY_LOW, 'a'))
+        self.assertEqual(scheduler.queue_depth, 6)
+
+    def test_admitted_on_release(self):
+        scheduler = admission.AdmissionScheduler(
+            AdmissionOptions(max_in_flight=1))
+        scheduler.acquire(PRIORITY_NORMAL, 'a')
+        acquired = threading.Event()
+
+        def waiter():
+            scheduler.acquire(PRIORITY_HIGH, 'b', 10)
+            acquired.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        self.assertEqual(scheduler.queue_depth, 1)
+        scheduler.release()
+        thread.join(10)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(scheduler.in_flight, 1)
+
+    def test_unknown_priority(self):
+        scheduler = admission.AdmissionScheduler(AdmissionOptions())
+        self.assertRaises(ValueError, scheduler.acquire, 3, 'a')
+        self.assertRaises(ValueError, scheduler.acquire, -1, 'a')
+
+
+class TestAdmitted(unittest2.TestCase):
+
+    def test_releases_after_call(self):
+        scheduler = mock.Mock(spec=admission.AdmissionScheduler)
+        admitted = admission.admitted(
+            lambda req, timeout: req * 2, scheduler, PRIORITY_HIGH, 'flow')
+        self.assertEqual(admitted(21, 5), 42)
+        scheduler.acquire.assert_called_once_with(PRIORITY_HIGH, 'flow', 5)
+        scheduler.release.assert_called_once_with()
+
+        def failing(_req, _timeout):
+            raise ValueError()
+
+        scheduler.reset_mock()
+        admitted = admission.admitted(
+            failing, scheduler, PRIORITY_HIGH, 'flow')
+        self.assertRaises(ValueError, admitted, None, 5)
+        scheduler.release.assert_called_once_with()
+
+    def test_not_called_when_shed(self):
+        scheduler = mock.Mock(spec=admission.AdmissionScheduler)
+        scheduler.acquire.side_effect = AdmissionRejectedError('shed')
+        a_func = mock.Mock()
+        admitted = admission.admitted(a_func, scheduler, PRIORITY_LOW, 'flow')
+        self.assertRaises(AdmissionRejectedError, admitted, None, 5)
+        a_func.assert_not_called()
+        scheduler.release.assert_not_called()
+
+    @mock.patch('time.time')
+    def test_shed_probe_does_not_close_breaker(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(CircuitBreakerOptions(
+            minimum_calls=1, open_millis=5000, half_open_probes=1))
+        breaker._open(100)
+        mock_time.return_value = 105
+
+        scheduler = admission.AdmissionScheduler(
+            AdmissionOptions(max_in_flight=1, max_queue_size=0))
+        scheduler.acquire(PRIORITY_NORMAL, 'other')
+        func = mock.Mock(return_value=42)
+        my_callable = api_callable.create_api_call(func, _CallSettings(
+            circuit_breaker=breaker, admission=scheduler))
+        for _ in range(2):
+            self.assertRaises(GaxError, my_callable, None)
+        func.assert_not_called()
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+
+        # The shed attempts did not hold on to the probe slot.
+        scheduler.release()
+        self.assertEqual(my_callable(None), 42)
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
@@ -32,7 +32,9 @@
 
 from __future__ import absolute_import, division
 
+import copy
 import platform
+import threading
 
 import grpc
 import mock
@@ -40,10 +42,19 @@ import pkg_resources
 import unittest2
 
 from google.gax import (
-    __version__ as GAX_VERSION, _CallSettings, api_callable, BackoffSettings,
-    BundleDescriptor, BundleOptions, bundling, CallOptions, INITIAL_PAGE,
-    PageDescriptor, RetryOptions)
-from google.gax.errors import GaxError
+    __version__ as GAX_VERSION, _CallSettings, AdaptivePageSizeOptions,
+    AdaptiveTimeoutOptions,
+    admission, AdmissionOptions, api_callable, BackoffSettings,
+    BatchDescriptor, BundleDescriptor, BundleOptions, bundling, CallOptions, circuit_breaker,
+    CircuitBreakerOptions, concurrency_limiter, ConcurrencyLimitOptions,
+    HedgingOptions, INITIAL_PAGE, PageCursor, PageDescriptor, PRIORITY_HIGH,
+    PRIORITY_LOW, PRIORITY_NORMAL, rate_limiter, RateLimitOptions,
+    RetryOptions, StreamDescriptor, streaming)
+from google.gax.errors import (
+    CircuitBreakerOpenError, ConcurrencyLimitExceededError, GaxError,
+    RateLimitExceededError)
+from google.longrunning import operations_pb2
+from tests.fixtures.fixture_pb2 import Bundled
 
 # pylint: disable=no-member
 GRPC_VERSION = pkg_resources.get_distribution('grpcio').version
@@ -141,6 +152,17 @@ class TestCreateApiCallable(unittest2.TestCase):
         self.assertEqual(my_callable(None, CallOptions(key='updated')),
                          'updated')
 
+    def test_call_wait_for_ready(self):
+        settings = _CallSettings(kwargs={'metadata': []})
+        my_callable = api_callable.create_api_call(
+            lambda _req, _timeout, **kwargs: kwargs.get('wait_for_ready'),
+            settings)
+        self.assertIsNone(my_callable(None))
+        self.assertTrue(my_callable(None, CallOptions(wait_for_ready=True)))
+        self.assertTrue(my_callable(
+            None, CallOptions(wait_for_ready=True, metadata=[('k', 'v')])))
+        self.assertIsNone(my_callable(None, CallOptions(timeout=20)))
+
     def test_call_merge_options_metadata(self):
         settings_kwargs = {
             'key': 'value',
@@ -184,6 +206,65 @@ class TestCreateApiCallable(unittest2.TestCase):
                 metadata=[('key3', 'val3'), ('key2', '_val2')])),
             expected_kwargs)
 
+    @mock.patch('google.gax.retry.add_timeout_arg')
+    def test_call_compiled_once(self, mock_add_timeout_arg):
+        mock_add_timeout_arg.side_effect = (
+            lambda a_func, timeout, **kwargs:
+            lambda *args: a_func(*(args + (timeout,)), **kwargs))
+        settings = _CallSettings(timeout=10, kwargs={'metadata': []})
+        my_callable = api_callable.create_api_call(
+            lambda _req, timeout, **kwargs: (timeout, kwargs), settings)
+        self.assertEqual(mock_add_timeout_arg.call_count, 1)
+
+        for _ in range(3):
+            self.assertEqual(my_callable(None), (10, {'metadata': []}))
+        self.assertEqual(mock_add_timeout_arg.call_count, 1)
+
+        # Options are compiled per call when first seen, and compiled and
+        # cached when the same instance recurs.
+        options = CallOptions(timeout=20, metadata=[('key', 'value')])
+        for _ in range(3):
+            self.assertEqual(
+                my_callable(None, options),
+                (20, {'metadata': [('key', 'value')]}))
+        self.assertEqual(mock_add_timeout_arg.call_count, 3)
+
+        # Equal options built afresh for each call are compiled per call.
+        for _ in range(2):
+            my_callable(None, CallOptions(timeout=30, key=set()))
+        self.assertEqual(mock_add_timeout_arg.call_count, 5)
+
+    def test_call_cache_evicts_oldest(self):
+        compiled = []
+
+        def compile_call(options):
+            compiled.append(options.timeout)
+            return None, options.timeout
+
+        cache = api_callable._ApiCallCache(compile_call, maxsize=2)
+        options = dict(
+            [(timeout, CallOptions(timeout=timeout)) for timeout in (1, 2, 3)])
+        results = []
+        for timeout in (1, 2, 1, 3, 2, 1, 3, 1):
+            entry = cache.get(options[timeout])
+            results.append(entry and entry[1])
+        self.assertEqual(results, [None, None, 1, None, 2, 1, 3, None])
+        self.assertEqual(compiled, [1, 2, 3])
+
+    def test_call_cache_skips_options_seen_once(self):
+        compiled = []
+
+        def compile_call(options):
+            compiled.append(options.kwargs['metadata'])
+            return None, None
+
+        cache = api_callable._ApiCallCache(compile_call, maxsize=2)
+        for request_id in range(10):
+            self.assertIsNone(cache.get(CallOptions(
+                metadata=[('x-request-id', str(request_id))])))
+        self.assertEqual(compiled, [])
+        self.assertLessEqual(len(cache._seen), 2)
+
     @mock.patch('time.time')
     @mock.patch('google.gax.config.exc_to_code')
     def test_retry(self, mock_exc_to_code, mock_time):
@@ -247,6 +328,18 @@ class TestCreateApiCallable(unittest2.TestCase):
                 mock_grpc, settings=settings)
             self.assertEqual(list(my_callable(PageStreamingRequest())),
                              list(range(page_size * pages_to_stream)))
+            self.assertEqual(
+                list(my_callable(PageStreamingRequest(),
+                                 CallOptions(prefetch_pages=2))),
+                list(range(page_size * pages_to_stream)))
+            self.assertEqual(
+                list(my_callable(PageStreamingRequest(),
+                                 CallOptions(cursor=PageCursor(6, 1)))),
+                list(range(7, page_size * pages_to_stream)))
+            self.assertEqual(
+                list(my_callable(PageStreamingRequest(),
+                                 CallOptions(max_results=7))),
+                list(range(7)))
 
             unflattened_option = CallOptions(page_token=INITIAL_PAGE)
             # Expect a list of pages_to_stream pages, each of size page_size,
@@ -269,6 +362,17 @@ class TestCreateApiCallable(unittest2.TestCase):
                                               explicit_page_token_option)),
                              expected)
 
+            # The compiled call is reused with a different page token.
+            pages_already_read = 3
+            explicit_page_token_option = CallOptions(
+                page_token=str(page_size * pages_already_read))
+            expected = [list(range(page_size * n, page_size * (n + 1)))
+                        for n in range(pages_already_read, pages_to_stream)]
+            expected += [()]
+            self.assertEqual(list(my_callable(PageStreamingRequest(),
+                                              explicit_page_token_option)),
+                             expected)
+
     def test_bundling_page_streaming_error(self):
         settings = _CallSettings(
             page_descriptor=object(), bundle_descriptor=object(),
@@ -298,6 +402,137 @@ class TestCreateApiCallable(unittest2.TestCase):
         second = my_callable(BundlingRequest([0] * 5))
         self.assertEqual(second.result, 8)  # pylint: disable=no-member
 
+    def _batching(self, element_count_threshold=3, delay_threshold=60000,
+                  timeout=5):
+        descriptor = BatchDescriptor(
+            Bundled, 'name', 'field1', 'operations')
+        batcher = bundling.Executor(BundleOptions(
+            element_count_threshold=element_count_threshold,
+            delay_threshold=delay_threshold))
+        batch_func = mock.Mock(side_effect=lambda req, _: (
+            operations_pb2.ListOperationsResponse(operations=[
+                operations_pb2.Operation(name=name, done=True)
+                for name in req.field1 if name != 'missing'])))
+        settings = _CallSettings(
+            batcher=batcher, batch_descriptor=descriptor, timeout=timeout)
+        return settings, batch_func
+
+    def test_batching(self):
+        settings, batch_func = self._batching()
+        func = mock.Mock()
+        my_callable = api_callable.create_api_call(
+            func, settings, batch_func=batch_func)
+        requests = [operations_pb2.GetOperationRequest(name=name)
+                    for name in ('a', 'b', 'a')]
+        threads, outcomes = [], {}
+
+        def call(request):
+            outcomes[request.name] = my_callable(request)
+
+        for request in requests:
+            threads.append(threading.Thread(target=call, args=(request,)))
+            threads[-1].start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes['a'],
+                         operations_pb2.Operation(name='a', done=True))
+        self.assertEqual(outcomes['b'].name, 'b')
+        self.assertFalse(func.called)
+        batch_func.assert_called_once_with(Bundled(field1=['a', 'b']), 5)
+
+    def test_batching_delay_threshold(self):
+        settings, batch_func = self._batching(
+            element_count_threshold=0, delay_threshold=10)
+        my_callable = api_callable.create_api_call(
+            mock.Mock(), settings, batch_func=batch_func)
+        response = my_callable(operations_pb2.GetOperationRequest(name='a'))
+        self.assertEqual(response.name, 'a')
+        self.assertEqual(batch_func.call_count, 1)
+
+    def test_batching_requires_delay_threshold(self):
+        settings, batch_func = self._batching(delay_threshold=0)
+        with self.assertRaises(ValueError):
+            api_callable.create_api_call(
+                mock.Mock(), settings, batch_func=batch_func)
+
+    def test_batching_wait_bounded_by_timeout(self):
+        settings, batch_func = self._batching(
+            element_count_threshold=10, timeout=0.01)
+        my_callable = api_callable.create_api_call(
+            mock.Mock(), settings, batch_func=batch_func)
+        with self.assertRaises(GaxError) as context:
+            my_callable(operations_pb2.GetOperationRequest(name='a'))
+        self.assertEqual(context.exception.cause.code(),
+                         grpc.StatusCode.DEADLINE_EXCEEDED)
+        self.assertFalse(batch_func.called)
+
+        retry = RetryOptions([], BackoffSettings(0, 0, 0, 0, 0, 0, 10))
+        settings = settings._replace(timeout=60, retry=retry)
+        self.assertEqual(api_callable._call_timeout(settings), 0.01)
+
+    def test_batching_missing_item(self):
+        settings, batch_func = self._batching(element_count_threshold=1)
+        my_callable = api_callable.create_api_call(
+            mock.Mock(), settings, batch_func=batch_func)
+        with self.assertRaises(GaxError):
+            my_callable(operations_pb2.GetOperationRequest(name='missing'))
+
+    @mock.patch('google.gax.config.API_ERRORS', (CustomException,))
+    def test_batching_error(self):
+        settings, batch_func = self._batching(element_count_threshold=1)
+        batch_func.side_effect = CustomException('', None)
+        my_callable = api_callable.create_api_call(
+            mock.Mock(), settings, batch_func=batch_func)
+        with self.assertRaises(GaxError) as context:
+            my_callable(operations_pb2.GetOperationRequest(name='a'))
+        self.assertIsInstance(context.exception.cause, CustomException)
+
+    def test_batching_disabled_by_options(self):
+        settings, batch_func = self._batching()
+        func = mock.Mock(return_value=42)
+        my_callable = api_callable.create_api_call(
+            func, settings, batch_func=batch_func)
+        request = operations_pb2.GetOperationRequest(name='a')
+        self.assertEqual(my_callable(request, CallOptions(timeout=5)), 42)
+        func.assert_called_once_with(request, 5)
+        self.assertFalse(batch_func.called)
+
+    def test_batching_bundling_error(self):
+        settings, batch_func = self._batching()
+        settings = settings._replace(
+            bundler=object(), bundle_descriptor=object())
+        with self.assertRaises(ValueError):
+            api_callable.create_api_call(
+                mock.Mock(), settings, batch_func=batch_func)
+
+    def test_construct_settings_batching(self):
+        descriptor = BatchDescriptor(Bundled, 'name', 'field1', 'operations')
+        config = {'interfaces': {'service': {
+            'retry_codes': {},
+            'retry_params': {},
+            'methods': {
+                'GetFoo': {'timeout_millis': 1000,
+                           'batching': {'element_count_threshold': 10,
+                                        'delay_threshold_millis': 5}},
+                'GetBar': {'timeout_millis': 1000}}}}}
+        defaults = api_callable.construct_settings(
+            'service', config, {}, {},
+            batch_descriptors={'get_foo': descriptor,
+                               'get_bar': descriptor})
+        settings = defaults['get_foo']
+        self.assertIs(settings.batch_descriptor, descriptor)
+        self.assertIsInstance(settings.batcher, bundling.Executor)
+        self.assertEqual(settings.batcher._options.delay_threshold, 5)
+        self.assertIsNone(defaults['get_bar'].batcher)
+
+        del config['interfaces']['service']['methods']['GetFoo']['batching'][
+            'delay_threshold_millis']
+        with self.assertRaises(ValueError):
+            api_callable.construct_settings(
+                'service', config, {}, {},
+                batch_descriptors={'get_foo': descriptor})
+
     def test_construct_settings(self):
         defaults = api_callable.construct_settings(
             _SERVICE_NAME, _A_CONFIG, dict(), _RETRY_DICT,
@@ -345,6 +580,35 @@ class TestCreateApiCallable(unittest2.TestCase):
         self.assertIn('gax/%s' % GAX_VERSION, metadata)
         self.assertIn('grpc/%s' % GRPC_VERSION, metadata)
 
+    def test_construct_settings_compiled_once(self):
+        first = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, dict(), _RETRY_DICT,
+            bundle_descriptors=_BUNDLE_DESCRIPTORS)
+        with mock.patch.object(api_callable, '_construct_retry') as construct:
+            second = api_callable.construct_settings(
+                _SERVICE_NAME, _A_CONFIG, dict(), _RETRY_DICT,
+                bundle_descriptors=_BUNDLE_DESCRIPTORS)
+            self.assertFalse(construct.called)
+        self.assertIs(first['bundling_method'].retry,
+                      second['bundling_method'].retry)
+        # Per-client state is not shared.
+        self.assertIsNot(first['bundling_method'].bundler,
+                         second['bundling_method'].bundler)
+
+    def test_construct_settings_compiled_per_override(self):
+        override = {'interfaces': {_SERVICE_NAME: {'methods': {
+            'PageStreamingMethod': {'timeout_millis': 5000}}}}}
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, override, _RETRY_DICT)
+        self.assertEqual(defaults['page_streaming_method'].timeout, 5)
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, dict(), _RETRY_DICT)
+        self.assertEqual(defaults['page_streaming_method'].timeout, 12)
+
+        copied = api_callable.construct_settings(
+            _SERVICE_NAME, copy.deepcopy(_A_CONFIG), dict(), _RETRY_DICT)
+        self.assertEqual(copied['page_streaming_method'].timeout, 12)
+
     def test_construct_settings_override(self):
         _override = {
             'interfaces': {
@@ -421,6 +685,411 @@ class TestCreateApiCallable(unittest2.TestCase):
         self.assertEqual(backoff.max_retry_delay_millis, 1000)
         self.assertEqual(settings.retry.retry_codes, [_RETRY_DICT['code_c']])
 
+    def test_adaptive_timeout(self):
+        timeouts = []
+
+        def func(_, timeout):
+            timeouts.append(timeout)
+            return 42
+
+        retry = RetryOptions(
+            ['code'], BackoffSettings(0, 1, 0, 5000, 1, 5000, 10000),
+            adaptive_timeout=AdaptiveTimeoutOptions(min_timeout_millis=100))
+        my_callable = api_callable.create_api_call(
+            func, _CallSettings(retry=retry))
+        for _ in range(25):
+            my_callable(None)
+        # The observed latency is far below the minimum timeout.
+        self.assertEqual(timeouts[0], 5)
+        self.assertEqual(timeouts[-1], 0.1)
+
+    def test_construct_settings_adaptive_timeout(self):
+        config = copy.deepcopy(_A_CONFIG)
+        methods = config['interfaces'][_SERVICE_NAME]['methods']
+        methods['PageStreamingMethod']['adaptive_timeout'] = {'margin': 3}
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, config, dict(), _RETRY_DICT)
+        self.assertEqual(
+            defaults['page_streaming_method'].retry.adaptive_timeout,
+            AdaptiveTimeoutOptions(margin=3))
+        self.assertIsNone(defaults['bundling_method'].retry.adaptive_timeout)
+
+    def test_construct_settings_wait_for_ready(self):
+        config = copy.deepcopy(_A_CONFIG)
+        methods = config['interfaces'][_SERVICE_NAME]['methods']
+        methods['PageStreamingMethod']['wait_for_ready'] = True
+        _override = {
+            'interfaces': {
+                _SERVICE_NAME: {
+                    'methods': {
+                        'BundlingMethod': {'wait_for_ready': True},
+                    },
+                }
+            }
+        }
+        kwargs = {'key': 'value'}
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, config, dict(), _RETRY_DICT, kwargs=kwargs)
+        self.assertTrue(
+            defaults['page_streaming_method'].kwargs['wait_for_ready'])
+        self.assertNotIn('wait_for_ready', defaults['bundling_method'].kwargs)
+        self.assertNotIn('wait_for_ready', kwargs)
+
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, config, _override, _RETRY_DICT)
+        self.assertTrue(defaults['bundling_method'].kwargs['wait_for_ready'])
+
+    def test_construct_settings_backoff_overrides(self):
+        config = copy.deepcopy(_A_CONFIG)
+        params = config['interfaces'][_SERVICE_NAME]['retry_params']
+        params['default']['backoff_overrides'] = {
+            'code_c': {'initial_retry_delay_millis': 2000,
+                       'max_retry_delay_millis': 30000}}
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, config, dict(), _RETRY_DICT)
+        retry_options = defaults['page_streaming_method'].retry
+        self.assertEqual(retry_options.backoff_settings.max_retry_delay_millis,
+                         1000)
+        self.assertEqual(
+            retry_options.backoff_overrides,
+            {_RETRY_DICT['code_c']: retry_options.backoff_settings._replace(
+                initial_retry_delay_millis=2000,
+                max_retry_delay_millis=30000)})
+
+        # Overriding the retry params replaces their code overrides too.
+        _override = {
+            'interfaces': {
+                _SERVICE_NAME: {
+                    'retry_params': {
+                        'fast': {
+                            'initial_retry_delay_millis': 10,
+                            'retry_delay_multiplier': 1.5,
+                            'max_retry_delay_millis': 100,
+                            'initial_rpc_timeout_millis': 300,
+                            'rpc_timeout_multiplier': 1.3,
+                            'max_rpc_timeout_millis': 3000,
+                            'total_timeout_millis': 30000
+                        }
+                    },
+                    'methods': {
+                        'PageStreamingMethod': {
+                            'retry_params_name': 'fast',
+                        },
+                    },
+                }
+            }
+        }
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, config, _override, _RETRY_DICT)
+        retry_options = defaults['page_streaming_method'].retry
+        self.assertEqual(
+            retry_options.backoff_settings.initial_retry_delay_millis, 10)
+        self.assertIsNone(retry_options.backoff_overrides)
+
+    def test_construct_settings_hedging(self):
+        _override = {
+            'interfaces': {
+                _SERVICE_NAME: {
+                    'retry_codes': {
+                        'no_retry': [],
+                    },
+                    'methods': {
+                        'PageStreamingMethod': {
+                            'hedging': {'delay_millis': 50},
+                        },
+                        'BundlingMethod': {
+                            'retry_codes_name': 'no_retry',
+                            'hedging': {'delay_millis': 50},
+                        },
+                    },
+                }
+            }
+        }
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, _override, _RETRY_DICT,
+            bundle_descriptors=_BUNDLE_DESCRIPTORS,
+            page_descriptors=_PAGE_DESCRIPTORS)
+        settings = defaults['page_streaming_method']
+        self.assertEqual(settings.retry.hedging, HedgingOptions(
+            delay_millis=50, max_hedged_attempts=1, budget_ratio=0.1))
+
+        # Methods that do not retry are not idempotent, and are not hedged.
+        settings = defaults['bundling_method']
+        self.assertEqual(settings.retry.retry_codes, [])
+        self.assertIsNone(settings.retry.hedging)
+
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_retry_hedging(self, mock_exc_to_code):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        retry = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 0, 0, None, None, None, None),
+            hedging=HedgingOptions(delay_millis=1000))
+
+        future = mock.Mock(spec=['add_done_callback', 'cancel', 'exception',
+                                 'result'])
+        future.add_done_callback.side_effect = lambda clbk: clbk(future)
+        future.exception.return_value = None
+        future.result.return_value = 1729
+        mock_call = mock.Mock()
+        mock_call.future.return_value = future
+
+        settings = _CallSettings(timeout=0, retry=retry)
+        my_callable = api_callable.create_api_call(mock_call, settings)
+        self.assertEqual(my_callable(None), 1729)
+        mock_call.future.assert_called_once_with(None, None)
+        mock_call.assert_not_called()
+
+    def test_construct_settings_circuit_breaker(self):
+        _override = {
+            'interfaces': {
+                _SERVICE_NAME: {
+                    'circuit_breaker_params': {
+                        'strict': {'minimum_calls': 5},
+                    },
+                    'methods': {
+                        'PageStreamingMethod': {
+                            'circuit_breaker_params_name': 'strict',
+                        },
+                    },
+                }
+            }
+        }
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, _override, _RETRY_DICT,
+            bundle_descriptors=_BUNDLE_DESCRIPTORS,
+            page_descriptors=_PAGE_DESCRIPTORS)
+        breaker = defaults['page_streaming_method'].circuit_breaker
+        self.assertIsInstance(breaker, circuit_breaker.CircuitBreaker)
+        self.assertEqual(breaker._options, CircuitBreakerOptions(
+            minimum_calls=5))
+        self.assertIsNone(defaults['bundling_method'].circuit_breaker)
+
+    @mock.patch('time.time')
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_retry_circuit_breaker_open(self, mock_exc_to_code, mock_time):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        mock_time.return_value = 0
+        retry = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 0, 0, 0, 0, 0, 1))
+        breaker = mock.Mock(spec=circuit_breaker.CircuitBreaker)
+        breaker.allow.side_effect = CircuitBreakerOpenError('open')
+        mock_call = mock.Mock()
+
+        settings = _CallSettings(retry=retry, circuit_breaker=breaker)
+        my_callable = api_callable.create_api_call(mock_call, settings)
+        self.assertRaises(CircuitBreakerOpenError, my_callable, None)
+        mock_call.assert_not_called()
+
+    def test_construct_settings_rate_limit(self):
+        _override = {
+            'interfaces': {
+                _SERVICE_NAME: {
+                    'methods': {
+                        'PageStreamingMethod': {
+                            'rate_limit': {'qps': 10, 'fail_fast': True},
+                        },
+                    },
+                }
+            }
+        }
+        first = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, _override, _RETRY_DICT)
+        second = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, _override, _RETRY_DICT)
+        limiter = first['page_streaming_method'].rate_limiter
+        self.assertIsInstance(limiter, rate_limiter.RateLimiter)
+        self.assertTrue(limiter._fail_fast)
+        self.assertEqual(limiter._burst, 10)
+        self.assertIsNone(first['bundling_method'].rate_limiter)
+
+        # Each client has its own rate limiters.
+        self.assertIsNot(second['page_streaming_method'].rate_limiter, limiter)
+
+    @mock.patch('time.time')
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_retry_rate_limit_exceeded(self, mock_exc_to_code, mock_time):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        mock_time.return_value = 0
+        retry = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 0, 0, 0, 0, 0, 1))
+        limiter = rate_limiter.RateLimiter(
+            RateLimitOptions(qps=1, fail_fast=True))
+        mock_call = mock.Mock(return_value=1729)
+
+        settings = _CallSettings(retry=retry, rate_limiter=limiter)
+        my_callable = api_callable.create_api_call(mock_call, settings)
+        self.assertEqual(my_callable(None), 1729)
+        self.assertRaises(RateLimitExceededError, my_callable, None)
+        self.assertEqual(mock_call.call_count, 1)
+
+    def test_construct_settings_concurrency_limit(self):
+        config = copy.deepcopy(_A_CONFIG)
+        methods = config['interfaces'][_SERVICE_NAME]['methods']
+        methods['PageStreamingMethod']['concurrency_limit'] = {
+            'initial_limit': 8, 'max_wait_millis': 50}
+        first = api_callable.construct_settings(
+            _SERVICE_NAME, config, dict(), _RETRY_DICT)
+        second = api_callable.construct_settings(
+            _SERVICE_NAME, config, dict(), _RETRY_DICT)
+        limiter = first['page_streaming_method'].concurrency_limiter
+        self.assertIsInstance(limiter, concurrency_limiter.ConcurrencyLimiter)
+        self.assertEqual(limiter._options, ConcurrencyLimitOptions(
+            initial_limit=8, max_wait_millis=50))
+        self.assertEqual(limiter.limit, 8)
+        self.assertIsNone(first['bundling_method'].concurrency_limiter)
+        self.assertIsNot(
+            second['page_streaming_method'].concurrency_limiter, limiter)
+
+    def test_call_concurrency_limit(self):
+        limiter = concurrency_limiter.ConcurrencyLimiter(
+            ConcurrencyLimitOptions(initial_limit=1, max_limit=1))
+        in_flight = []
+
+        def my_func(_request, _timeout):
+            in_flight.append(limiter.in_flight)
+            return 1729
+
+        settings = _CallSettings(timeout=0.1, concurrency_limiter=limiter)
+        my_callable = api_callable.create_api_call(my_func, settings)
+        self.assertIs(my_callable.concurrency_limiter, limiter)
+        self.assertEqual(my_callable(None), 1729)
+        self.assertEqual(in_flight, [1])
+        self.assertEqual(limiter.in_flight, 0)
+
+        # The wait for the limit is bounded by the timeout.
+        limiter.acquire()
+        self.assertRaises(ConcurrencyLimitExceededError, my_callable, None)
+        self.assertEqual(in_flight, [1])
+
+    def test_construct_settings_admission(self):
+        config = copy.deepcopy(_A_CONFIG)
+        service = config['interfaces'][_SERVICE_NAME]
+        service['admission'] = {'max_in_flight': 10}
+        service['methods']['PageStreamingMethod']['priority'] = PRIORITY_HIGH
+        _override = {
+            'interfaces': {
+                _SERVICE_NAME: {
+                    'admission': {'max_in_flight': 5},
+                    'methods': {
+                        'BundlingMethod': {'priority': PRIORITY_LOW},
+                    },
+                }
+            }
+        }
+        first = api_callable.construct_settings(
+            _SERVICE_NAME, config, dict(), _RETRY_DICT)
+        scheduler = first['page_streaming_method'].admission
+        self.assertIsInstance(scheduler, admission.AdmissionScheduler)
+        self.assertEqual(scheduler._options, AdmissionOptions(max_in_flight=10))
+        self.assertIs(first['bundling_method'].admission, scheduler)
+        self.assertEqual(first['page_streaming_method'].priority, PRIORITY_HIGH)
+        self.assertEqual(first['bundling_method'].priority, PRIORITY_NORMAL)
+
+        second = api_callable.construct_settings(
+            _SERVICE_NAME, config, _override, _RETRY_DICT)
+        self.assertIsNot(second['bundling_method'].admission, scheduler)
+        self.assertEqual(second['bundling_method'].admission._options,
+                         AdmissionOptions(max_in_flight=5))
+        self.assertEqual(second['bundling_method'].priority, PRIORITY_LOW)
+
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, dict(), _RETRY_DICT)
+        self.assertIsNone(defaults['bundling_method'].admission)
+
+    def test_call_priority(self):
+        scheduler = mock.Mock(spec=admission.AdmissionScheduler)
+        func = mock.Mock(return_value=1729)
+        settings = _CallSettings(timeout=5, admission=scheduler)
+        my_callable = api_callable.create_api_call(func, settings)
+
+        self.assertEqual(my_callable(None), 1729)
+        scheduler.acquire.assert_called_once_with(PRIORITY_NORMAL, func, 5)
+        scheduler.release.assert_called_once_with()
+
+        scheduler.reset_mock()
+        self.assertEqual(
+            my_callable(None, CallOptions(priority=PRIORITY_HIGH)), 1729)
+        scheduler.acquire.assert_called_once_with(PRIORITY_HIGH, func, 5)
+
+        scheduler.reset_mock()
+        self.assertEqual(
+            my_callable(None, CallOptions(priority=PRIORITY_LOW)), 1729)
+        scheduler.acquire.assert_called_once_with(PRIORITY_LOW, func, 5)
+
+    def test_construct_settings_adaptive_page_size(self):
+        _override = {
+            'interfaces': {
+                _SERVICE_NAME: {
+                    'methods': {
+                        'PageStreamingMethod': {
+                            'adaptive_page_size': {
+                                'initial_page_size': 10,
+                                'max_page_size': 100,
+                            },
+                        },
+                    },
+                }
+            }
+        }
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, _override, _RETRY_DICT)
+        self.assertEqual(
+            defaults['page_streaming_method'].page_sizing,
+            AdaptivePageSizeOptions(100, initial_page_size=10))
+        self.assertIsNone(defaults['bundling_method'].page_sizing)
+
+    def test_construct_settings_stream_descriptors(self):
+        descriptor = StreamDescriptor('resume_token', 'resume_token')
+        defaults = api_callable.construct_settings(
+            _SERVICE_NAME, _A_CONFIG, dict(), _RETRY_DICT,
+            stream_descriptors={'page_streaming_method': descriptor})
+        self.assertIs(
+            defaults['page_streaming_method'].stream_descriptor, descriptor)
+        self.assertIsNone(defaults['bundling_method'].stream_descriptor)
+
+    def test_stream_call(self):
+        func = mock.Mock(side_effect=lambda req, timeout, **kwargs: iter(
+            [req, timeout, kwargs]))
+        settings = _CallSettings(timeout=7, kwargs={'key': 'value'})
+        my_callable = api_callable.create_stream_call(func, settings)
+        stream = my_callable('request')
+        self.assertIsInstance(stream, streaming.ResumableStream)
+        self.assertEqual(list(stream), ['request', 7, {'key': 'value'}])
+        self.assertEqual(
+            list(my_callable('request', CallOptions(timeout=20, key='new'))),
+            ['request', 20, {'key': 'new'}])
+
+    def test_bidi_stream_call(self):
+        func = mock.Mock(side_effect=lambda reqs, timeout, **kwargs: iter(
+            [list(reqs), timeout, kwargs]))
+        settings = _CallSettings(timeout=7, kwargs={'key': 'value'})
+        my_callable = api_callable.create_bidi_stream_call(func, settings)
+        self.assertEqual(list(my_callable(iter([1, 2]))),
+                         [[1, 2], 7, {'key': 'value'}])
+        self.assertEqual(
+            list(my_callable(iter([]), CallOptions(timeout=20))),
+            [[], 20, {'key': 'value'}])
+
+    def test_bundling_rate_limit(self):
+        # pylint: disable=abstract-method, too-few-public-methods
+        class BundlingRequest(object):
+            def __init__(self, elements=None):
+                self.elements = elements
+
+        bundler = bundling.Executor(BundleOptions(element_count_threshold=8))
+        limiter = mock.Mock(spec=rate_limiter.RateLimiter)
+        settings = _CallSettings(
+            bundler=bundler, bundle_descriptor=BundleDescriptor('elements', []),
+            timeout=0, rate_limiter=limiter)
+        my_callable = api_callable.create_api_call(
+            lambda request, _: len(request.elements), settings)
+        events = [my_callable(BundlingRequest([0] * 2)) for _ in range(4)]
+        self.assertEqual(events[-1].result, 8)
+        limiter.acquire.assert_called_once_with(0)
+
     @mock.patch('google.gax.config.API_ERRORS', (CustomException, ))
     def test_catch_error(self):
         def abortion_error_func(*dummy_args, **dummy_kwargs):
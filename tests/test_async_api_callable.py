@@ -0,0 +1,367 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name,protected-access
+"""Unit tests for async_api_callable"""
+
+from __future__ import absolute_import
+
+import inspect
+import sys
+import threading
+
+import mock
+import unittest2
+
+from google.gax import (
+    _CallSettings, BackoffSettings, CallOptions, INITIAL_PAGE, PageCursor,
+    PageDescriptor, RetryOptions)
+from google.gax.errors import GaxError, RetryError
+
+if sys.version_info >= (3, 5):
+    import asyncio
+
+    from google.gax import async_api_callable
+
+
+_FAKE_STATUS_CODE_1 = object()
+
+
+class CustomException(Exception):
+    def __init__(self, msg, code):
+        super(CustomException, self).__init__(msg)
+        self.code = code
+
+
+class _FakeGrpcFuture(object):
+    """A gRPC-style future completed from another thread."""
+
+    def __init__(self, result=None, exception=None, delay=0):
+        self._result = result
+        self._exception = exception
+        self._delay = delay
+        self.cancelled_by_caller = False
+
+    def add_done_callback(self, callback):
+        if self._delay is None:
+            return
+        threading.Timer(self._delay, callback, args=[self]).start()
+
+    def cancelled(self):
+        return False
+
+    def exception(self):
+        return self._exception
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def cancel(self):
+        self.cancelled_by_caller = True
+        return True
+
+
+class _KeywordTimeoutStub(object):
+    """A stub method taking its timeout as a keyword only, like grpc.aio."""
+
+    def __init__(self):
+        self.calls = []
+        if sys.version_info >= (3, 5):
+            parameter = inspect.Parameter
+            self.__signature__ = inspect.Signature([
+                parameter('request', parameter.POSITIONAL_OR_KEYWORD),
+                parameter('timeout', parameter.KEYWORD_ONLY, default=None),
+                parameter('metadata', parameter.KEYWORD_ONLY, default=None)])
+
+    def __call__(self, request, **kwargs):
+        self.calls.append((request, kwargs))
+        return _completed(request * 2)
+
+
+def _completed(result):
+    future = asyncio.get_event_loop().create_future()
+    future.set_result(result)
+    return future
+
+
+@unittest2.skipIf(sys.version_info < (3, 5), 'requires asyncio')
+class TestCreateAsyncApiCall(unittest2.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def _run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_call_plain_function(self):
+        my_callable = async_api_callable.create_async_api_call(
+            lambda _req, _timeout: 42, _CallSettings())
+        self.assertEqual(self._run(my_callable(None)), 42)
+
+    def test_call_awaitable(self):
+        settings = _CallSettings(timeout=10, kwargs={'key': 'value'})
+        my_callable = async_api_callable.create_async_api_call(
+            lambda _req, timeout, **kwargs: _completed((timeout, kwargs)),
+            settings)
+        self.assertEqual(self._run(my_callable(None)), (10, {'key': 'value'}))
+        self.assertEqual(
+            self._run(my_callable(None, CallOptions(timeout=20, key='new'))),
+            (20, {'key': 'new'}))
+
+    def test_call_keyword_timeout(self):
+        stub_method = _KeywordTimeoutStub()
+        my_callable = async_api_callable.create_async_api_call(
+            stub_method, _CallSettings(timeout=5, kwargs={'metadata': []}))
+        self.assertEqual(self._run(my_callable(21)), 42)
+        self.assertEqual(stub_method.calls,
+                         [(21, {'timeout': 5, 'metadata': []})])
+
+        retry = RetryOptions(
+            [_FAKE_STATUS_CODE_1], BackoffSettings(0, 0, 0, 0, 0, 0, 1000))
+        my_callable = async_api_callable.create_async_api_call(
+            stub_method, _CallSettings(retry=retry))
+        self.assertEqual(self._run(my_callable(1)), 2)
+        self.assertIn('timeout', stub_method.calls[-1][1])
+
+    def test_call_future(self):
+        stub_method = mock.Mock(spec=['future'])
+        stub_method.future.return_value = _FakeGrpcFuture(1729, delay=0.01)
+        my_callable = async_api_callable.create_async_api_call(
+            stub_method, _CallSettings(timeout=5))
+        self.assertEqual(self._run(my_callable('request')), 1729)
+        stub_method.future.assert_called_once_with('request', 5)
+
+    def test_call_future_timeout(self):
+        grpc_future = _FakeGrpcFuture(delay=None)
+        stub_method = mock.Mock(spec=['future'])
+        stub_method.future.return_value = grpc_future
+        my_callable = async_api_callable.create_async_api_call(
+            stub_method, _CallSettings(timeout=0.01))
+        with self.assertRaises(GaxError):
+            self._run(my_callable('request'))
+        self.assertTrue(grpc_future.cancelled_by_caller)
+
+    @mock.patch('google.gax.config.API_ERRORS', (CustomException, ))
+    def test_catch_error(self):
+        def abortion_error_func(*dummy_args, **dummy_kwargs):
+            raise CustomException(None, None)
+
+        my_callable = async_api_callable.create_async_api_call(
+            abortion_error_func, _CallSettings())
+        with self.assertRaises(GaxError):
+            self._run(my_callable(None))
+
+    @mock.patch('asyncio.sleep')
+    @mock.patch('time.time')
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_retry(self, mock_exc_to_code, mock_time, mock_sleep):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        mock_time.return_value = 0
+        mock_sleep.side_effect = lambda _: _completed(None)
+        to_attempt = 3
+        retry = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(100, 1, 100, 1000, 1, 1000, 10000))
+
+        mock_call = mock.Mock(spec=['__call__'])
+        mock_call.side_effect = ([CustomException('', _FAKE_STATUS_CODE_1)] *
+                                 (to_attempt - 1) + [_completed(1729)])
+        settings = _CallSettings(timeout=0, retry=retry)
+        my_callable = async_api_callable.create_async_api_call(
+            mock_call, settings)
+        self.assertEqual(self._run(my_callable(None)), 1729)
+        self.assertEqual(mock_call.call_count, to_attempt)
+        self.assertEqual(mock_sleep.call_count, to_attempt - 1)
+
+    @mock.patch('time.time')
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_retry_aborts_on_unexpected_exception(
+            self, mock_exc_to_code, mock_time):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        mock_time.return_value = 0
+        retry = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 0, 0, 0, 0, 0, 1))
+
+        mock_call = mock.Mock(spec=['__call__'])
+        mock_call.side_effect = CustomException('', object())
+        my_callable = async_api_callable.create_async_api_call(
+            mock_call, _CallSettings(retry=retry))
+        with self.assertRaises(RetryError):
+            self._run(my_callable(None))
+        self.assertEqual(mock_call.call_count, 1)
+
+    def test_bundling_unsupported(self):
+        settings = _CallSettings(
+            bundler=object(), bundle_descriptor=object())
+        with self.assertRaises(ValueError):
+            async_api_callable.create_async_api_call(
+                lambda _req, _timeout: 42, settings)
+
+
+class _PagedRequest(object):
+    def __init__(self, page_token=0):
+        self.page_token = page_token
+
+
+class _PagedResponse(object):
+    def __init__(self, nums=(), next_page_token=0):
+        self.nums = nums
+        self.next_page_token = next_page_token
+
+
+_PAGE_DESCRIPTOR = PageDescriptor('page_token', 'next_page_token', 'nums')
+
+
+class _PagedMethod(object):
+    """Returns ``pages`` pages of two numbers, the last one empty.
+
+    The calls at the page tokens in ``errors`` fail once with the error.
+    """
+
+    def __init__(self, pages, errors=None):
+        self._pages = pages
+        self._errors = dict(errors or {})
+        self.tokens = []
+
+    def __call__(self, request, _timeout):
+        self.tokens.append(request.page_token)
+        start = int(request.page_token)
+        if start in self._errors:
+            raise self._errors.pop(start)
+        if start >= 2 * self._pages:
+            return _completed(_PagedResponse())
+        return _completed(_PagedResponse([start, start + 1], start + 2))
+
+
+@unittest2.skipIf(sys.version_info < (3, 5), 'requires asyncio')
+class TestAsyncPageStreaming(unittest2.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def _collect(self, iterator):
+        items = []
+        while True:
+            try:
+                items.append(self.loop.run_until_complete(iterator.__anext__()))
+            except StopAsyncIteration:  # pylint: disable=undefined-variable
+                return items
+
+    def test_resources(self):
+        method = _PagedMethod(3)
+        my_callable = async_api_callable.create_async_api_call(
+            method, _CallSettings(page_descriptor=_PAGE_DESCRIPTOR))
+        iterator = my_callable(_PagedRequest())
+        self.assertIsInstance(
+            iterator, async_api_callable.AsyncResourceIterator)
+        self.assertEqual(method.tokens, [])
+        self.assertEqual(self._collect(iterator), list(range(6)))
+        self.assertEqual(method.tokens, [0, 2, 4, 6])
+        self.assertIsNone(iterator.cursor)
+
+    def test_pages(self):
+        my_callable = async_api_callable.create_async_api_call(
+            _PagedMethod(2), _CallSettings(page_descriptor=_PAGE_DESCRIPTOR))
+        iterator = my_callable(
+            _PagedRequest(), CallOptions(page_token=INITIAL_PAGE))
+        self.assertIsInstance(iterator, async_api_callable.AsyncPageIterator)
+        self.assertEqual(self._collect(iterator), [[0, 1], [2, 3], ()])
+        self.assertEqual(iterator.page_token, 0)
+
+        iterator = my_callable(_PagedRequest(), CallOptions(page_token=2))
+        self.assertEqual(self._collect(iterator), [[2, 3], ()])
+
+    @mock.patch('asyncio.sleep')
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_retry_per_page(self, mock_exc_to_code, mock_sleep):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        mock_sleep.side_effect = lambda _: _completed(None)
+        retry = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(100, 1, 100, 1000, 1, 1000, 10000))
+        method = _PagedMethod(
+            2, errors={2: CustomException('', _FAKE_STATUS_CODE_1)})
+        my_callable = async_api_callable.create_async_api_call(
+            method,
+            _CallSettings(page_descriptor=_PAGE_DESCRIPTOR, retry=retry))
+        self.assertEqual(self._collect(my_callable(_PagedRequest())),
+                         list(range(4)))
+        self.assertEqual(method.tokens, [0, 2, 2, 4])
+
+    def test_prefetch(self):
+        method = _PagedMethod(10)
+        my_callable = async_api_callable.create_async_api_call(
+            method, _CallSettings(page_descriptor=_PAGE_DESCRIPTOR))
+        iterator = my_callable(
+            _PagedRequest(), CallOptions(page_token=INITIAL_PAGE,
+                                         prefetch_pages=2))
+        self.assertEqual(
+            self.loop.run_until_complete(iterator.__anext__()), [0, 1])
+        for _ in range(10):
+            self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(method.tokens, [0, 2, 4])
+        self.assertEqual(len(self._collect(iterator)), 10)
+
+    @mock.patch('google.gax.config.API_ERRORS', (CustomException, ))
+    def test_prefetch_error(self):
+        method = _PagedMethod(
+            10, errors={4: CustomException('', _FAKE_STATUS_CODE_1)})
+        my_callable = async_api_callable.create_async_api_call(
+            method, _CallSettings(page_descriptor=_PAGE_DESCRIPTOR))
+        iterator = my_callable(_PagedRequest(), CallOptions(prefetch_pages=3))
+        for expected in range(4):
+            self.assertEqual(
+                self.loop.run_until_complete(iterator.__anext__()), expected)
+        with self.assertRaises(GaxError):
+            self.loop.run_until_complete(iterator.__anext__())
+        self.assertEqual(self._collect(iterator), [])
+
+    def test_cursor_and_max_results(self):
+        method = _PagedMethod(10)
+        my_callable = async_api_callable.create_async_api_call(
+            method, _CallSettings(page_descriptor=_PAGE_DESCRIPTOR))
+        iterator = my_callable(
+            _PagedRequest(),
+            CallOptions(cursor=PageCursor(2, 1), max_results=4))
+        self.assertEqual(self._collect(iterator), [3, 4, 5, 6])
+        self.assertEqual(method.tokens, [2, 4, 6])
+        self.assertEqual(iterator.cursor, PageCursor(6, 1))
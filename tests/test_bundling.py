@@ -490,7 +490,7 @@ class TestExecutor_DelayThreshold(unittest2.TestCase):
         self.assertIsNone(got_event.result)
         self.assertTrue(timer_class.called)
         timer_args, timer_kwargs = timer_class.call_args_list[0]
-        self.assertEqual(delay_threshold, timer_args[0])
+        self.assertEqual(delay_threshold / 1000.0, timer_args[0])
         self.assertEqual({'args': [an_id]}, timer_kwargs)
         timer_class.return_value.start.assert_called_once_with()
 
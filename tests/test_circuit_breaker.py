@@ -0,0 +1,263 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name,protected-access
+"""Unit tests for circuit_breaker"""
+
+from __future__ import absolute_import
+
+import grpc
+import mock
+import unittest2
+
+from google.gax import (
+    _CallSettings, api_callable, circuit_breaker, CircuitBreakerOptions,
+    concurrency_limiter, ConcurrencyLimitOptions)
+from google.gax.errors import (
+    CircuitBreakerOpenError, ConcurrencyLimitExceededError, GaxError)
+
+_OPTIONS = CircuitBreakerOptions(
+    failure_ratio_threshold=0.5, minimum_calls=4, window_millis=10000,
+    open_millis=5000, half_open_probes=2)
+
+
+def _rpc_error(code):
+    error = grpc.RpcError()
+    error.code = lambda: code
+    return error
+
+
+_UNAVAILABLE = _rpc_error(grpc.StatusCode.UNAVAILABLE)
+
+
+class TestCircuitBreaker(unittest2.TestCase):
+
+    @mock.patch('time.time')
+    def test_opens_on_failure_ratio(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        breaker.record()
+        breaker.record()
+        breaker.record(_UNAVAILABLE)
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        breaker.allow()
+
+        breaker.record(_UNAVAILABLE)
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        self.assertRaises(CircuitBreakerOpenError, breaker.allow)
+
+    @mock.patch('time.time')
+    def test_ignores_non_backend_failures(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        for _ in range(10):
+            breaker.record(_rpc_error(grpc.StatusCode.NOT_FOUND))
+            breaker.record(ValueError())
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+    @mock.patch('time.time')
+    def test_old_failures_expire(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        for _ in range(3):
+            breaker.record(_UNAVAILABLE)
+        mock_time.return_value = 111
+        breaker.record()
+        breaker.record()
+        breaker.record()
+        breaker.record(_UNAVAILABLE)
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+    @mock.patch('time.time')
+    def test_half_open_probes_close(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        for _ in range(4):
+            breaker.record(_UNAVAILABLE)
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+
+        mock_time.return_value = 105
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        probes = [breaker.allow(), breaker.allow()]
+        self.assertRaises(CircuitBreakerOpenError, breaker.allow)
+        breaker.record(probe=probes[0])
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        breaker.record(probe=probes[1])
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        self.assertIsNone(breaker.allow())
+
+        # The failures recorded before opening have been forgotten.
+        breaker.record(_UNAVAILABLE)
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+    @mock.patch('time.time')
+    def test_half_open_probe_failure_reopens(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        for _ in range(4):
+            breaker.record(_UNAVAILABLE)
+
+        mock_time.return_value = 105
+        breaker.record(_UNAVAILABLE, breaker.allow())
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        mock_time.return_value = 109
+        self.assertRaises(CircuitBreakerOpenError, breaker.allow)
+
+    @mock.patch('time.time')
+    def test_released_probe_is_replaced(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        for _ in range(4):
+            breaker.record(_UNAVAILABLE)
+
+        mock_time.return_value = 105
+        probes = [breaker.allow(), breaker.allow()]
+        self.assertRaises(CircuitBreakerOpenError, breaker.allow)
+        breaker.release(probes[0])
+        breaker.record(probe=breaker.allow())
+        breaker.record(probe=probes[1])
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+        # Releasing a call of a closed circuit has no effect.
+        breaker.release()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+    @mock.patch('time.time')
+    def test_lost_probes_expire(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        for _ in range(4):
+            breaker.record(_UNAVAILABLE)
+
+        mock_time.return_value = 105
+        breaker.record(probe=breaker.allow())
+        breaker.allow()
+        mock_time.return_value = 109
+        self.assertRaises(CircuitBreakerOpenError, breaker.allow)
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+
+        # The probe never recorded no longer holds its slot.
+        mock_time.return_value = 110
+        probe = breaker.allow()
+        self.assertRaises(CircuitBreakerOpenError, breaker.allow)
+        breaker.record(probe=probe)
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+    @mock.patch('time.time')
+    def test_only_probes_decide(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        late = breaker.allow()
+        self.assertIsNone(late)
+        for _ in range(4):
+            breaker.record(_UNAVAILABLE)
+
+        # Calls let through while the circuit was closed neither close nor
+        # reopen it when they complete late.
+        mock_time.return_value = 105
+        probes = [breaker.allow(), breaker.allow()]
+        breaker.record(probe=late)
+        breaker.record(probe=late)
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        breaker.record(_UNAVAILABLE, late)
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        breaker.release(late)
+        self.assertRaises(CircuitBreakerOpenError, breaker.allow)
+
+        # Nor do the probes of an earlier half-open period.
+        breaker.record(_UNAVAILABLE, probes[0])
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        mock_time.return_value = 110
+        breaker.allow()
+        breaker.record(probe=probes[1])
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+
+
+class TestGuarded(unittest2.TestCase):
+
+    def test_records_outcomes(self):
+        breaker = mock.Mock(spec=circuit_breaker.CircuitBreaker)
+        guarded = circuit_breaker.guarded(lambda x: x * 2, breaker)
+        self.assertEqual(guarded(21), 42)
+        breaker.allow.assert_called_once_with()
+        breaker.record.assert_called_once_with(
+            probe=breaker.allow.return_value)
+
+        def failing(_):
+            raise _UNAVAILABLE
+
+        breaker.reset_mock()
+        guarded = circuit_breaker.guarded(failing, breaker)
+        self.assertRaises(grpc.RpcError, guarded, None)
+        breaker.record.assert_called_once_with(
+            _UNAVAILABLE, breaker.allow.return_value)
+
+    def test_releases_unsent_attempts(self):
+        breaker = mock.Mock(spec=circuit_breaker.CircuitBreaker)
+
+        def rejected(_):
+            raise ConcurrencyLimitExceededError('limited')
+
+        guarded = circuit_breaker.guarded(rejected, breaker)
+        self.assertRaises(ConcurrencyLimitExceededError, guarded, None)
+        breaker.release.assert_called_once_with(breaker.allow.return_value)
+        breaker.record.assert_not_called()
+
+    @mock.patch('time.time')
+    def test_limited_probe_does_not_close(self, mock_time):
+        mock_time.return_value = 100
+        breaker = circuit_breaker.CircuitBreaker(_OPTIONS)
+        for _ in range(4):
+            breaker.record(_UNAVAILABLE)
+        mock_time.return_value = 105
+
+        limiter = concurrency_limiter.ConcurrencyLimiter(
+            ConcurrencyLimitOptions(initial_limit=1, min_limit=1,
+                                    max_wait_millis=0))
+        limiter.acquire()
+        func = mock.Mock(return_value=42)
+        my_callable = api_callable.create_api_call(func, _CallSettings(
+            circuit_breaker=breaker, concurrency_limiter=limiter))
+        for _ in range(3):
+            self.assertRaises(GaxError, my_callable, None)
+        func.assert_not_called()
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+
+        # The rejected attempts did not hold on to the probe slots.
+        limiter.release(0)
+        self.assertEqual(my_callable(None), 42)
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+
+    def test_fails_fast_when_open(self):
+        breaker = mock.Mock(spec=circuit_breaker.CircuitBreaker)
+        breaker.allow.side_effect = CircuitBreakerOpenError('open')
+        a_func = mock.Mock()
+        guarded = circuit_breaker.guarded(a_func, breaker)
+        self.assertRaises(CircuitBreakerOpenError, guarded, None)
+        a_func.assert_not_called()
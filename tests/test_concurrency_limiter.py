@@ -0,0 +1,177 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name,protected-access
+"""Unit tests for concurrency_limiter"""
+
+from __future__ import absolute_import
+
+import threading
+
+import grpc
+import mock
+import unittest2
+
+from google.gax import concurrency_limiter, ConcurrencyLimitOptions
+from google.gax.errors import ConcurrencyLimitExceededError
+
+
+def _rpc_error(code):
+    error = grpc.RpcError()
+    error.code = lambda: code
+    return error
+
+
+_OPTIONS = ConcurrencyLimitOptions(
+    initial_limit=4, min_limit=2, max_limit=5, max_wait_millis=1000,
+    latency_tolerance=2.0, backoff_ratio=0.5)
+
+
+class TestConcurrencyLimiter(unittest2.TestCase):
+
+    def _fill(self, limiter, count):
+        for _ in range(count):
+            limiter.acquire()
+
+    def test_grows_while_latency_holds(self):
+        limiter = concurrency_limiter.ConcurrencyLimiter(_OPTIONS)
+        self._fill(limiter, 4)
+        for _ in range(5):
+            limiter.release(0.1)
+            limiter.acquire()
+        self.assertEqual(limiter.limit, 5)
+        self.assertEqual(limiter.in_flight, 4)
+
+        # Bounded by max_limit.
+        self._fill(limiter, 1)
+        for _ in range(20):
+            limiter.release(0.1)
+            limiter.acquire()
+        self.assertEqual(limiter.limit, 5)
+
+    def test_does_not_grow_when_underused(self):
+        limiter = concurrency_limiter.ConcurrencyLimiter(_OPTIONS)
+        for _ in range(20):
+            limiter.acquire()
+            limiter.release(0.1)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_cut_back_on_latency_growth(self):
+        limiter = concurrency_limiter.ConcurrencyLimiter(
+            _OPTIONS._replace(initial_limit=5))
+        self._fill(limiter, 3)
+        limiter.release(0.1)
+        limiter.release(0.3)
+        self.assertEqual(limiter.limit, 2)
+
+        # Bounded by min_limit.
+        limiter.release(0.3)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_cut_back_on_overload_codes(self):
+        limiter = concurrency_limiter.ConcurrencyLimiter(_OPTIONS)
+        self._fill(limiter, 3)
+        limiter.release(0.1, _rpc_error(grpc.StatusCode.INVALID_ARGUMENT))
+        self.assertEqual(limiter.limit, 4)
+        limiter.release(0.1, _rpc_error(grpc.StatusCode.RESOURCE_EXHAUSTED))
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_fast_failures_do_not_lower_baseline(self):
+        limiter = concurrency_limiter.ConcurrencyLimiter(_OPTIONS)
+        self._fill(limiter, 2)
+        limiter.release(0.001, _rpc_error(grpc.StatusCode.NOT_FOUND))
+        limiter.release(0.1)
+        self.assertEqual(limiter.limit, 4)
+
+    @mock.patch('time.time')
+    def test_wait_bounded(self, mock_time):
+        mock_time.return_value = 100
+        limiter = concurrency_limiter.ConcurrencyLimiter(_OPTIONS)
+        self._fill(limiter, 4)
+
+        def wait(_):
+            self.assertEqual(limiter.queue_depth, 1)
+            mock_time.return_value += 0.6
+
+        with mock.patch.object(limiter._condition, 'wait', side_effect=wait):
+            self.assertRaises(ConcurrencyLimitExceededError, limiter.acquire)
+            self.assertRaises(
+                ConcurrencyLimitExceededError, limiter.acquire, 0.5)
+        self.assertEqual(limiter.queue_depth, 0)
+        self.assertEqual(limiter.in_flight, 4)
+
+    def test_waiter_let_in_on_release(self):
+        limiter = concurrency_limiter.ConcurrencyLimiter(_OPTIONS)
+        self._fill(limiter, 4)
+        acquired = threading.Event()
+
+        def waiter():
+            limiter.acquire(10)
+            acquired.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release(0.1)
+        thread.join(10)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(limiter.in_flight, 4)
+
+
+class TestLimited(unittest2.TestCase):
+
+    @mock.patch('time.time')
+    def test_reports_outcomes(self, mock_time):
+        mock_time.side_effect = [10, 12, 20, 21]
+        limiter = mock.Mock(spec=concurrency_limiter.ConcurrencyLimiter)
+        limited = concurrency_limiter.limited(
+            lambda req, timeout: req * 2, limiter)
+        self.assertEqual(limited(21, 5), 42)
+        limiter.acquire.assert_called_once_with(5)
+        limiter.release.assert_called_once_with(2)
+
+        error = _rpc_error(grpc.StatusCode.UNAVAILABLE)
+
+        def failing(_req, _timeout):
+            raise error
+
+        limiter.reset_mock()
+        limited = concurrency_limiter.limited(failing, limiter)
+        self.assertRaises(grpc.RpcError, limited, None, 5)
+        limiter.release.assert_called_once_with(1, error)
+
+    def test_not_called_when_exceeded(self):
+        limiter = mock.Mock(spec=concurrency_limiter.ConcurrencyLimiter)
+        limiter.acquire.side_effect = ConcurrencyLimitExceededError('exceeded')
+        a_func = mock.Mock()
+        limited = concurrency_limiter.limited(a_func, limiter)
+        self.assertRaises(ConcurrencyLimitExceededError, limited, None, 5)
+        a_func.assert_not_called()
+        limiter.release.assert_not_called()
@@ -0,0 +1,278 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,no-self-use,no-init,invalid-name,protected-access
+"""Unit tests for fanout"""
+
+from __future__ import absolute_import
+
+import threading
+
+import mock
+import unittest2
+
+from google.gax import (
+    _CallSettings, api_callable, BackoffSettings, CallOptions, circuit_breaker,
+    fanout, PageDescriptor, RetryOptions)
+from google.gax.errors import GaxError, RetryError
+
+_FAKE_STATUS_CODE_1 = object()
+
+_FAKE_STATUS_CODE_2 = object()
+
+
+class CustomException(Exception):
+    def __init__(self, msg, code):
+        super(CustomException, self).__init__(msg)
+        self.code = code
+
+
+class _TimerFuture(object):
+    """A future that completes on a timer thread after ``delay`` seconds."""
+
+    def __init__(self, stub, result=None, exception=None, delay=0.001):
+        self._stub = stub
+        self._result = result
+        self._exception = exception
+        self._callbacks = []
+        self._done = False
+        self._lock = threading.Lock()
+        self.cancelled = False
+        threading.Timer(delay, self._complete).start()
+
+    def _complete(self):
+        with self._lock:
+            self._done = True
+            self._stub.in_flight -= 1
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        with self._lock:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def exception(self):
+        return self._exception
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def cancel(self):
+        self.cancelled = True
+        return not self._done
+
+
+class _FakeStubMethod(object):
+    """Answers each request with ``outcome(request, attempt)``."""
+
+    def __init__(self, outcome=lambda request, _: request * 2, delay=None):
+        self.outcome = outcome
+        self.delay = delay or (lambda _: 0.001)
+        self.attempts = {}
+        self.timeouts = []
+        self.kwargs = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.futures = []
+
+    def __call__(self, request, timeout, **kwargs):
+        return self._answer(request, timeout, kwargs).result()
+
+    def _answer(self, request, timeout, kwargs):
+        attempt = self.attempts.get(request, 0)
+        self.attempts[request] = attempt + 1
+        self.timeouts.append(timeout)
+        self.kwargs.append(kwargs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        outcome = self.outcome(request, attempt)
+        if isinstance(outcome, Exception):
+            result = _TimerFuture(
+                self, exception=outcome, delay=self.delay(request))
+        else:
+            result = _TimerFuture(
+                self, result=outcome, delay=self.delay(request))
+        self.futures.append(result)
+        return result
+
+    def future(self, request, timeout, **kwargs):
+        return self._answer(request, timeout, kwargs)
+
+
+def _retry_settings(total_timeout_millis=1000):
+    return _CallSettings(retry=RetryOptions(
+        [_FAKE_STATUS_CODE_1],
+        BackoffSettings(1, 1, 1, 100, 1, 100, total_timeout_millis)))
+
+
+class TestMapCalls(unittest2.TestCase):
+
+    def test_ordered(self):
+        stub = _FakeStubMethod(delay=lambda request: 0.001 * (10 - request))
+        responses = list(fanout.map_calls(
+            stub, _CallSettings(timeout=7), range(10), concurrency=3))
+        self.assertEqual(responses, [i * 2 for i in range(10)])
+        self.assertLessEqual(stub.max_in_flight, 3)
+        self.assertEqual(stub.timeouts, [7] * 10)
+
+    def test_unordered(self):
+        stub = _FakeStubMethod()
+        pairs = list(fanout.map_calls(
+            stub, _CallSettings(), range(10), concurrency=4, ordered=False))
+        self.assertEqual(sorted(pairs), [(i, i * 2) for i in range(10)])
+        self.assertLessEqual(stub.max_in_flight, 4)
+
+    def test_consumes_requests_lazily(self):
+        consumed = []
+
+        def requests():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        stub = _FakeStubMethod()
+        responses = fanout.map_calls(
+            stub, _CallSettings(), requests(), concurrency=2)
+        self.assertEqual(next(responses), 0)
+        self.assertLess(len(consumed), 10)
+        responses.close()
+
+    def test_passes_kwargs(self):
+        stub = _FakeStubMethod()
+        settings = _CallSettings(kwargs={'metadata': [('key', 'value')]})
+        list(fanout.map_calls(stub, settings, range(3)))
+        self.assertEqual(stub.kwargs, [{'metadata': [('key', 'value')]}] * 3)
+
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_retries_each_request(self, mock_exc_to_code):
+        mock_exc_to_code.side_effect = lambda e: e.code
+
+        def outcome(request, attempt):
+            if request % 2 and attempt < 2:
+                return CustomException('', _FAKE_STATUS_CODE_1)
+            return request
+
+        stub = _FakeStubMethod(outcome)
+        responses = list(fanout.map_calls(
+            stub, _retry_settings(), range(6), concurrency=2))
+        self.assertEqual(responses, list(range(6)))
+        self.assertEqual(stub.attempts, {0: 1, 1: 3, 2: 1, 3: 3, 4: 1, 5: 3})
+
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_raises_non_retryable_error(self, mock_exc_to_code):
+        mock_exc_to_code.side_effect = lambda e: e.code
+
+        def outcome(request, _):
+            if request == 1:
+                return CustomException('', _FAKE_STATUS_CODE_2)
+            return request
+
+        stub = _FakeStubMethod(outcome)
+        responses = fanout.map_calls(
+            stub, _retry_settings(), range(6), concurrency=2)
+        self.assertEqual(next(responses), 0)
+        self.assertRaises(RetryError, next, responses)
+        self.assertEqual(stub.attempts[1], 1)
+
+    @mock.patch('google.gax.config.exc_to_code')
+    def test_gives_up_after_total_timeout(self, mock_exc_to_code):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        stub = _FakeStubMethod(
+            lambda request, _: CustomException('', _FAKE_STATUS_CODE_1))
+        responses = fanout.map_calls(
+            stub, _retry_settings(total_timeout_millis=20), [1])
+        self.assertRaises(RetryError, next, responses)
+        self.assertGreater(stub.attempts[1], 1)
+
+    @mock.patch('google.gax.config.API_ERRORS', (CustomException,))
+    def test_wraps_error_without_retry(self):
+        stub = _FakeStubMethod(
+            lambda request, _: CustomException('', _FAKE_STATUS_CODE_1))
+        responses = fanout.map_calls(stub, _CallSettings(), [1])
+        with self.assertRaises(GaxError) as context:
+            next(responses)
+        self.assertIsInstance(context.exception.cause, CustomException)
+
+    def test_cancels_in_flight_on_close(self):
+        stub = _FakeStubMethod(
+            delay=lambda request: 0.001 if request == 1 else 1)
+        responses = fanout.map_calls(
+            stub, _CallSettings(), range(4), concurrency=4, ordered=False)
+        self.assertEqual(next(responses)[0], 1)
+        responses.close()
+        self.assertTrue(stub.futures[0].cancelled)
+
+    def test_releases_breaker_on_close(self):
+        stub = _FakeStubMethod(
+            delay=lambda request: 0.001 if request == 1 else 1)
+        breaker = mock.Mock(spec=circuit_breaker.CircuitBreaker)
+        responses = fanout.map_calls(
+            stub, _CallSettings(circuit_breaker=breaker), range(4),
+            concurrency=4, ordered=False)
+        self.assertEqual(next(responses)[0], 1)
+        responses.close()
+        self.assertEqual(breaker.allow.call_count, 4)
+        self.assertEqual(breaker.record.call_count, 1)
+        self.assertEqual(breaker.release.call_count, 3)
+
+    def test_without_future(self):
+        responses = list(fanout.map_calls(
+            lambda request, _: request + 1, _CallSettings(), range(3)))
+        self.assertEqual(responses, [1, 2, 3])
+
+    def test_rejects_bad_concurrency(self):
+        responses = fanout.map_calls(
+            _FakeStubMethod(), _CallSettings(), range(3), concurrency=0)
+        self.assertRaises(ValueError, next, responses)
+
+
+class TestApiCallMap(unittest2.TestCase):
+
+    def test_map(self):
+        stub = _FakeStubMethod()
+        my_callable = api_callable.create_api_call(
+            stub, _CallSettings(timeout=10))
+        self.assertEqual(list(my_callable.map(range(3))), [0, 2, 4])
+        self.assertEqual(
+            list(my_callable.map(range(3), options=CallOptions(timeout=20))),
+            [0, 2, 4])
+        self.assertEqual(stub.timeouts, [10] * 3 + [20] * 3)
+
+    def test_map_rejects_page_streaming(self):
+        settings = _CallSettings(page_descriptor=PageDescriptor(
+            'page_token', 'next_page_token', 'page_streams'))
+        my_callable = api_callable.create_api_call(
+            _FakeStubMethod(), settings)
+        self.assertRaises(ValueError, my_callable.map, range(3))
@@ -32,15 +32,22 @@
 
 from __future__ import absolute_import
 
+import json
 import logging
 import multiprocessing as mp
+import subprocess
+import sys
+import threading
+import time
 
 import mock
 import unittest2
 
 from google.gax import (
-    _CallSettings, _LOG, _OperationFuture, BundleOptions, CallOptions,
-    INITIAL_PAGE, OPTION_INHERIT, RetryOptions)
+    __version__, _CallSettings, _LOG, _OperationFuture,
+    AdaptivePageSizeOptions, BundleOptions,
+    CallOptions, INITIAL_PAGE, OPTION_INHERIT, PageCursor, PageDescriptor,
+    PageIterator, ResourceIterator, RetryOptions)
 from google.gax.errors import GaxError, RetryError
 from google.longrunning import operations_pb2
 from google.rpc import code_pb2, status_pb2
@@ -48,6 +55,46 @@ from google.rpc import code_pb2, status_pb2
 from tests.fixtures.fixture_pb2 import Simple
 
 
+# Imports google.gax after its required dependencies, with the modules that
+# GAX only needs for some features removed, and prints those imported again.
+_CHECK_LAZY_IMPORTS = """
+import sys
+import grpc
+import google.rpc.code_pb2
+
+LAZY = ('dill', 'multiprocessing', 'pkg_resources', 'ply', 'google.auth',
+        'requests', 'tkinter')
+
+def is_lazy(name):
+    return any(name == lazy or name.startswith(lazy + '.') for lazy in LAZY)
+
+for name in [name for name in sys.modules if is_lazy(name)]:
+    del sys.modules[name]
+
+import google.gax
+import google.gax.api_callable
+import google.gax.grpc
+import google.gax.path_template
+
+print(' '.join(sorted(name for name in sys.modules if is_lazy(name))))
+"""
+
+
+class TestImport(unittest2.TestCase):
+
+    def test_lazy_imports(self):
+        output = subprocess.check_output(
+            [sys.executable, '-c', _CHECK_LAZY_IMPORTS])
+        self.assertEqual(output.decode().strip(), '')
+
+    def test_version(self):
+        import pkg_resources
+        # pylint: disable=no-member
+        self.assertEqual(
+            __version__, pkg_resources.get_distribution('google-gax').version)
+        # pylint: enable=no-member
+
+
 class TestBundleOptions(unittest2.TestCase):
 
     def test_cannot_construct_with_noarg_options(self):
@@ -67,6 +114,265 @@ class TestBundleOptions(unittest2.TestCase):
                           delay_threshold=not_an_int)
 
 
+class _PagedRequest(object):
+    def __init__(self, page_token=0):
+        self.page_token = page_token
+
+
+class _PagedResponse(object):
+    def __init__(self, nums=(), next_page_token=0):
+        self.nums = nums
+        self.next_page_token = next_page_token
+
+
+_PAGE_DESCRIPTOR = PageDescriptor('page_token', 'next_page_token', 'nums')
+
+
+class _PagedMethod(object):
+    """Returns ``pages`` pages of two numbers, the last one empty."""
+
+    def __init__(self, pages, error_at=None):
+        self._pages = pages
+        self._error_at = error_at
+        self.tokens = []
+
+    def __call__(self, request, **kwargs):
+        self.tokens.append(request.page_token)
+        start = int(request.page_token)
+        if start == self._error_at:
+            raise ValueError(start)
+        if start >= 2 * self._pages:
+            return _PagedResponse()
+        return _PagedResponse([start, start + 1], start + 2)
+
+
+_SIZED_PAGE_DESCRIPTOR = PageDescriptor(
+    'page_token', 'next_page_token', 'nums', 'page_size')
+
+
+class _SizedPagedRequest(_PagedRequest):
+    def __init__(self, page_token=0, page_size=0):
+        super(_SizedPagedRequest, self).__init__(page_token)
+        self.page_size = page_size
+
+
+class _SizedPagedMethod(object):
+    """Returns up to ``page_size`` of ``total`` numbers, 10 by default.
+
+    Each call advances the clock by ``overhead`` and ``per_item`` for each
+    number returned.
+    """
+
+    def __init__(self, total, overhead=0, per_item=0):
+        self._total = total
+        self._overhead = overhead
+        self._per_item = per_item
+        self.now = 0
+        self.sizes = []
+
+    def __call__(self, request, **kwargs):
+        self.sizes.append(request.page_size)
+        start = int(request.page_token)
+        end = min(self._total, start + (request.page_size or 10))
+        self.now += self._overhead + self._per_item * (end - start)
+        return _PagedResponse(
+            list(range(start, end)), end if end < self._total else 0)
+
+
+def _wait_for(condition):
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+
+
+class TestPageIterator(unittest2.TestCase):
+
+    def test_prefetch_matches_sequential(self):
+        pages = list(PageIterator(
+            _PagedMethod(3), _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest()))
+        iterator = PageIterator(
+            _PagedMethod(3), _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest(),
+            prefetch_pages=2)
+        tokens = []
+        prefetched = []
+        for page in iterator:
+            prefetched.append(page)
+            tokens.append(iterator.page_token)
+        self.assertEqual(prefetched, pages)
+        self.assertEqual(pages, [[0, 1], [2, 3], [4, 5], ()])
+        self.assertEqual(tokens, [2, 4, 6, 0])
+
+    def test_prefetch_is_bounded(self):
+        method = _PagedMethod(10)
+        iterator = PageIterator(
+            method, _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest(),
+            prefetch_pages=2)
+        self.assertEqual(method.tokens, [])
+        self.assertEqual(next(iterator), [0, 1])
+        _wait_for(lambda: len(method.tokens) == 3)
+        time.sleep(0.05)
+        self.assertEqual(method.tokens, [0, 2, 4])
+
+        self.assertEqual(next(iterator), [2, 3])
+        _wait_for(lambda: len(method.tokens) == 4)
+        iterator.close()
+        self.assertRaises(StopIteration, next, iterator)
+
+    def test_prefetch_error_in_order(self):
+        iterator = PageIterator(
+            _PagedMethod(10, error_at=4), _PAGE_DESCRIPTOR, INITIAL_PAGE,
+            _PagedRequest(), prefetch_pages=3)
+        self.assertEqual(next(iterator), [0, 1])
+        self.assertEqual(next(iterator), [2, 3])
+        self.assertRaises(ValueError, next, iterator)
+        self.assertRaises(StopIteration, next, iterator)
+
+    def test_prefetch_stops_when_abandoned(self):
+        threads = threading.active_count()
+        method = _PagedMethod(10)
+        iterator = PageIterator(
+            method, _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest(),
+            prefetch_pages=1)
+        next(iterator)
+        del iterator
+        _wait_for(lambda: threading.active_count() == threads)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_page_cursor(self):
+        iterator = PageIterator(
+            _PagedMethod(2), _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest())
+        self.assertEqual(iterator.cursor, PageCursor('', 0))
+        self.assertIsNone(iterator.page_cursor)
+        next(iterator)
+        self.assertEqual(iterator.page_cursor, PageCursor('', 0))
+        self.assertEqual(iterator.cursor, PageCursor(2, 0))
+        next(iterator)
+        next(iterator)
+        self.assertEqual(iterator.page_cursor, PageCursor(4, 0))
+        self.assertIsNone(iterator.cursor)
+
+    def test_resume_from_cursor(self):
+        method = _PagedMethod(3)
+        iterator = PageIterator(
+            method, _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest(),
+            cursor=PageCursor(2, 1))
+        self.assertEqual(list(iterator), [[3], [4, 5], ()])
+        self.assertEqual(method.tokens, [2, 4, 6])
+
+    def test_max_results_trims_page_size(self):
+        method = _SizedPagedMethod(100)
+        iterator = PageIterator(
+            method, _SIZED_PAGE_DESCRIPTOR, INITIAL_PAGE,
+            _SizedPagedRequest(page_size=10), max_results=25)
+        self.assertEqual([len(page) for page in iterator], [10, 10, 5])
+        self.assertEqual(method.sizes, [10, 10, 5])
+        self.assertEqual(iterator.cursor, PageCursor(25, 0))
+
+    def test_max_results_without_page_size(self):
+        method = _PagedMethod(10)
+        iterator = PageIterator(
+            method, _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest(),
+            max_results=3, prefetch_pages=2)
+        self.assertEqual(list(iterator), [[0, 1], [2]])
+        self.assertEqual(method.tokens, [0, 2])
+        self.assertEqual(iterator.cursor, PageCursor(2, 1))
+
+        iterator = PageIterator(
+            method, _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest(),
+            max_results=0)
+        self.assertEqual(list(iterator), [])
+        self.assertEqual(method.tokens, [0, 2])
+
+    def test_max_results_from_cursor(self):
+        method = _SizedPagedMethod(100)
+        iterator = PageIterator(
+            method, _SIZED_PAGE_DESCRIPTOR, INITIAL_PAGE,
+            _SizedPagedRequest(), cursor=PageCursor(40, 8), max_results=1)
+        self.assertEqual(list(iterator), [[48]])
+        self.assertEqual(method.sizes, [9])
+
+    def test_max_results_with_unset_page_size(self):
+        requests = []
+
+        def list_operations(request, **_):
+            requests.append(operations_pb2.ListOperationsRequest())
+            requests[-1].CopyFrom(request)
+            start = int(request.page_token or 0)
+            end = start + (request.page_size or 100)
+            return operations_pb2.ListOperationsResponse(
+                operations=[operations_pb2.Operation(name=str(n))
+                            for n in range(start, end)],
+                next_page_token=str(end))
+
+        descriptor = PageDescriptor(
+            'page_token', 'next_page_token', 'operations', 'page_size')
+        iterator = PageIterator(
+            list_operations, descriptor, INITIAL_PAGE,
+            operations_pb2.ListOperationsRequest(), max_results=5)
+        self.assertEqual([len(page) for page in iterator], [5])
+        self.assertEqual(requests[0].page_size, 5)
+
+        del requests[:]
+        iterator = PageIterator(
+            list_operations, descriptor, INITIAL_PAGE,
+            operations_pb2.ListOperationsRequest(),
+            cursor=PageCursor('10', 3), max_results=4)
+        self.assertEqual([[op.name for op in page] for page in iterator],
+                         [['13', '14', '15', '16']])
+        self.assertEqual(requests[0].page_size, 7)
+
+    def test_adaptive_page_size_overhead(self):
+        method = _SizedPagedMethod(1000, overhead=1, per_item=0.001)
+        with mock.patch('time.time', lambda: method.now):
+            pages = list(PageIterator(
+                method, _SIZED_PAGE_DESCRIPTOR, INITIAL_PAGE,
+                _SizedPagedRequest(),
+                page_sizing=AdaptivePageSizeOptions(100, 10)))
+        self.assertEqual(method.sizes[:5], [10, 20, 40, 80, 100])
+        self.assertEqual(sum(len(page) for page in pages), 1000)
+
+    def test_adaptive_page_size_per_item(self):
+        method = _SizedPagedMethod(1000, overhead=0.01, per_item=1)
+        with mock.patch('time.time', lambda: method.now):
+            list(PageIterator(
+                method, _SIZED_PAGE_DESCRIPTOR, INITIAL_PAGE,
+                _SizedPagedRequest(), max_results=100,
+                page_sizing=AdaptivePageSizeOptions(100, 10)))
+        # Only the first page grows the page size.
+        self.assertEqual(method.sizes, [10, 20, 20, 20, 20, 10])
+
+
+class TestResourceIterator(unittest2.TestCase):
+
+    def test_cursor(self):
+        iterator = ResourceIterator(PageIterator(
+            _PagedMethod(2), _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest()))
+        cursors = [iterator.cursor]
+        for _ in iterator:
+            cursors.append(iterator.cursor)
+        self.assertEqual(cursors, [PageCursor('', 0), PageCursor('', 1),
+                                   PageCursor(2, 0), PageCursor(2, 1),
+                                   PageCursor(4, 0)])
+        # The empty last page is only seen by trying to go past it.
+        self.assertRaises(StopIteration, next, iterator)
+        self.assertIsNone(iterator.cursor)
+
+    def test_resume_from_each_cursor(self):
+        expected = list(range(6))
+        iterator = ResourceIterator(PageIterator(
+            _PagedMethod(3), _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest()))
+        for consumed in range(len(expected)):
+            # A cursor survives a round trip through a serialization format.
+            cursor = PageCursor(*json.loads(json.dumps(iterator.cursor)))
+            method = _PagedMethod(3)
+            resumed = ResourceIterator(PageIterator(
+                method, _PAGE_DESCRIPTOR, INITIAL_PAGE, _PagedRequest(),
+                cursor=cursor))
+            self.assertEqual(list(resumed), expected[consumed:])
+            self.assertEqual(method.tokens[0], consumed // 2 * 2)
+            next(iterator)
+
+
 class TestCallSettings(unittest2.TestCase):
 
     def test_call_options_simple(self):
@@ -110,6 +416,41 @@ class TestCallSettings(unittest2.TestCase):
         self.assertFalse(final.flatten_pages)
         self.assertEqual(final.retry, retry)
 
+    def test_settings_merge_wait_for_ready(self):
+        settings = _CallSettings(kwargs={'key': 'value'})
+        final = settings.merge(CallOptions(wait_for_ready=True))
+        self.assertEqual(final.kwargs, {'key': 'value', 'wait_for_ready': True})
+        self.assertEqual(settings.kwargs, {'key': 'value'})
+
+        final = final.merge(CallOptions(wait_for_ready=False))
+        self.assertEqual(final.kwargs, {'key': 'value'})
+
+        settings = _CallSettings(kwargs={'wait_for_ready': True})
+        final = settings.merge(CallOptions(timeout=46))
+        self.assertEqual(final.kwargs, {'wait_for_ready': True})
+
+    def test_settings_merge_prefetch_pages(self):
+        settings = _CallSettings(prefetch_pages=1)
+        self.assertEqual(settings.merge(CallOptions()).prefetch_pages, 1)
+        final = settings.merge(CallOptions(prefetch_pages=3))
+        self.assertEqual(final.prefetch_pages, 3)
+        self.assertEqual(settings.prefetch_pages, 1)
+
+    def test_settings_merge_cursor(self):
+        cursor = PageCursor('token', 3)
+        settings = _CallSettings()
+        self.assertIsNone(settings.merge(CallOptions()).cursor)
+        final = settings.merge(CallOptions(cursor=cursor))
+        self.assertEqual(final.cursor, cursor)
+        self.assertTrue(final.flatten_pages)
+
+    def test_settings_merge_max_results(self):
+        settings = _CallSettings()
+        self.assertIsNone(settings.merge(CallOptions()).max_results)
+        final = settings.merge(CallOptions(max_results=50))
+        self.assertEqual(final.max_results, 50)
+        self.assertTrue(final.flatten_pages)
+
     def test_settings_merge_none(self):
         settings = _CallSettings(
             timeout=23, page_descriptor=object(), bundler=object(),
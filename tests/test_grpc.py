@@ -36,6 +36,8 @@ import mock
 import unittest2
 
 from google.gax import grpc
+from google.protobuf import duration_pb2
+from google.rpc import error_details_pb2, status_pb2
 
 
 def _fake_create_stub(channel):
@@ -103,3 +105,45 @@ class TestErrors(unittest2.TestCase):
         self.assertEqual(code, grpc.STATUS_CODE_NAMES['UNKNOWN'])
         self.assertIsNone(grpc.exc_to_code(Exception))
         self.assertIsNone(grpc.exc_to_code(grpc.RpcError()))
+
+    def _error_with_details(self, *details):
+        status = status_pb2.Status(code=14)
+        for detail in details:
+            status.details.add().Pack(detail)
+        error = grpc.RpcError()
+        error.trailing_metadata = lambda: (
+            ('other-key', 'value'),
+            ('grpc-status-details-bin', status.SerializeToString()))
+        return error
+
+    def test_exc_to_retry_delay(self):
+        retry_info = error_details_pb2.RetryInfo(
+            retry_delay=duration_pb2.Duration(seconds=2, nanos=500000000))
+        error = self._error_with_details(
+            error_details_pb2.DebugInfo(detail='unrelated'), retry_info)
+        self.assertEqual(grpc.exc_to_retry_delay(error), 2.5)
+
+    def test_exc_to_retry_delay_none(self):
+        self.assertIsNone(grpc.exc_to_retry_delay(Exception()))
+        self.assertIsNone(grpc.exc_to_retry_delay(grpc.RpcError()))
+        error = grpc.RpcError()
+        error.trailing_metadata = lambda: None
+        self.assertIsNone(grpc.exc_to_retry_delay(error))
+        self.assertIsNone(grpc.exc_to_retry_delay(
+            self._error_with_details(error_details_pb2.DebugInfo())))
+
+    def test_exc_to_retry_delay_malformed(self):
+        error = grpc.RpcError()
+        error.trailing_metadata = lambda: (
+            ('grpc-status-details-bin', b'\xff\xff'),)
+        self.assertIsNone(grpc.exc_to_retry_delay(error))
+
+        status = status_pb2.Status(code=14)
+        detail = status.details.add()
+        detail.type_url = (
+            'type.googleapis.com/' +
+            error_details_pb2.RetryInfo.DESCRIPTOR.full_name)
+        detail.value = b'\xff\xff'
+        error.trailing_metadata = lambda: (
+            ('grpc-status-details-bin', status.SerializeToString()),)
+        self.assertIsNone(grpc.exc_to_retry_delay(error))
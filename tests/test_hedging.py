@@ -0,0 +1,205 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name,protected-access
+"""Unit tests for hedging"""
+
+from __future__ import absolute_import
+
+import unittest2
+
+from google.gax import hedging, HedgingOptions
+
+
+class _FakeFuture(object):
+    """A future that completes when ``complete`` is called."""
+
+    def __init__(self, result=None, exception=None, done=False):
+        self._result = result
+        self._exception = exception
+        self._callbacks = []
+        self._done = False
+        self.cancelled = False
+        if done:
+            self.complete()
+
+    def complete(self):
+        self._done = True
+        for callback in self._callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def exception(self):
+        return self._exception
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def cancel(self):
+        self.cancelled = True
+        return not self._done
+
+
+class _FakeStubMethod(object):
+    """Returns the given futures, in order, from its ``future`` method."""
+
+    def __init__(self, *futures):
+        self.futures = list(futures)
+        self.calls = []
+
+    def __call__(self, *args, **kwargs):
+        raise AssertionError('Hedged calls should use future invocation')
+
+    def future(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.futures[len(self.calls) - 1]
+
+
+class TestHedger(unittest2.TestCase):
+
+    def test_hedge_delay_configured(self):
+        hedger = hedging.Hedger()
+        self.assertEqual(
+            hedger.hedge_delay(HedgingOptions(delay_millis=250)), 0.25)
+
+    def test_hedge_delay_observed(self):
+        hedger = hedging.Hedger()
+        options = HedgingOptions()
+        self.assertIsNone(hedger.hedge_delay(options))
+        for _ in range(100):
+            hedger.latency.record(0.1)
+        self.assertAlmostEqual(hedger.hedge_delay(options), 0.1, delta=0.011)
+
+    def test_budget(self):
+        hedger = hedging.Hedger()
+        for _ in range(hedging._MAX_BUDGET_TOKENS):
+            self.assertTrue(hedger.withdraw())
+        self.assertFalse(hedger.withdraw())
+        hedger.deposit(0.5)
+        self.assertFalse(hedger.withdraw())
+        hedger.deposit(0.5)
+        self.assertTrue(hedger.withdraw())
+
+
+class TestHedgeable(unittest2.TestCase):
+
+    def test_no_future_invocation(self):
+        def a_func(_req, _timeout):
+            return 42
+
+        hedged = hedging.hedgeable(
+            a_func, HedgingOptions(delay_millis=0), hedging.Hedger())
+        self.assertIs(hedged, a_func)
+
+    def test_fast_attempt_is_not_hedged(self):
+        stub_method = _FakeStubMethod(_FakeFuture(result=42, done=True))
+        hedged = hedging.hedgeable(
+            stub_method, HedgingOptions(delay_millis=1000), hedging.Hedger())
+        self.assertEqual(hedged('request', 10, metadata=[]), 42)
+        self.assertEqual(
+            stub_method.calls, [(('request', 10), {'metadata': []})])
+
+    def test_hedged_attempt_wins(self):
+        slow = _FakeFuture(result='slow')
+        fast = _FakeFuture(result='fast', done=True)
+        stub_method = _FakeStubMethod(slow, fast)
+        hedger = hedging.Hedger()
+        hedged = hedging.hedgeable(
+            stub_method, HedgingOptions(delay_millis=0), hedger)
+
+        self.assertEqual(hedged('request', 10), 'fast')
+        self.assertEqual(len(stub_method.calls), 2)
+        self.assertTrue(slow.cancelled)
+        self.assertEqual(hedger.latency.count, 1)
+
+    def test_max_hedged_attempts(self):
+        first = _FakeFuture(result='first')
+        second = _FakeFuture(result='second')
+        stub_method = _FakeStubMethod(first, second)
+
+        def complete_first(_):
+            first.complete()
+
+        # The first attempt completes once the hedged attempt is sent.
+        second.add_done_callback = complete_first
+        hedged = hedging.hedgeable(
+            stub_method, HedgingOptions(delay_millis=0, max_hedged_attempts=1),
+            hedging.Hedger())
+
+        self.assertEqual(hedged('request', 10), 'first')
+        self.assertEqual(len(stub_method.calls), 2)
+        self.assertTrue(second.cancelled)
+
+    def test_no_hedge_without_budget(self):
+        future = _FakeFuture(result=42)
+        stub_method = _FakeStubMethod(future)
+        hedger = hedging.Hedger()
+        while hedger.withdraw():
+            pass
+
+        # Without budget, the call waits for the original attempt.
+        original_withdraw = hedger.withdraw
+
+        def withdraw():
+            allowed = original_withdraw()
+            future.complete()
+            return allowed
+
+        hedger.withdraw = withdraw
+        hedged = hedging.hedgeable(
+            stub_method, HedgingOptions(delay_millis=0, budget_ratio=0),
+            hedger)
+
+        self.assertEqual(hedged('request', 10), 42)
+        self.assertEqual(len(stub_method.calls), 1)
+
+    def test_all_attempts_fail(self):
+        error = ValueError('boom')
+        stub_method = _FakeStubMethod(
+            _FakeFuture(exception=error),
+            _FakeFuture(exception=error, done=True))
+        futures = list(stub_method.futures)
+
+        def complete_first(callback):
+            futures[0].complete()
+            callback(futures[1])
+
+        futures[1].add_done_callback = complete_first
+        hedged = hedging.hedgeable(
+            stub_method, HedgingOptions(delay_millis=0), hedging.Hedger())
+
+        with self.assertRaises(ValueError):
+            hedged('request', 10)
@@ -0,0 +1,182 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,no-self-use,no-init,invalid-name,protected-access
+"""Unit tests for interceptors"""
+
+from __future__ import absolute_import
+
+import mock
+import unittest2
+
+from google.gax import (
+    _CallSettings, api_callable, BackoffSettings, CallOptions, interceptors,
+    RetryOptions)
+from google.gax.errors import GaxError
+
+_FAKE_STATUS_CODE_1 = object()
+
+
+class CustomException(Exception):
+    def __init__(self, msg, code):
+        super(CustomException, self).__init__(msg)
+        self.code = code
+
+
+class _Recorder(object):
+    """Records the invocations and outcomes it sees."""
+
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    def __call__(self, invocation, continuation):
+        self.log.append((self.name, invocation.request, invocation.attempt))
+        try:
+            response = continuation(invocation.request)
+        except Exception as exception:
+            self.log.append((self.name, 'error', type(exception).__name__))
+            raise
+        self.log.append((self.name, 'response', response))
+        return response
+
+
+class TestInterceptors(unittest2.TestCase):
+
+    def tearDown(self):
+        del interceptors._GLOBAL_INTERCEPTORS[:]
+
+    def test_no_interceptors(self):
+        func = mock.Mock(return_value=42)
+        my_callable = api_callable.create_api_call(func, _CallSettings())
+        self.assertEqual(my_callable(1), 42)
+        func.assert_called_once_with(1, 30)
+
+    def test_chain_order(self):
+        log = []
+        interceptors.register(_Recorder('global', log))
+        settings = _CallSettings(
+            timeout=10, interceptors=[_Recorder('method', log)])
+        my_callable = api_callable.create_api_call(
+            lambda req, timeout: req + timeout, settings)
+        self.assertEqual(my_callable(1), 11)
+        self.assertEqual(log, [('global', 1, 1),
+                               ('method', 1, 1),
+                               ('method', 'response', 11),
+                               ('global', 'response', 11)])
+
+    def test_registration_applies_to_new_callables(self):
+        log = []
+        recorder = _Recorder('global', log)
+        settings = _CallSettings()
+        before = api_callable.create_api_call(lambda req, _: req, settings)
+        interceptors.register(recorder)
+        after = api_callable.create_api_call(lambda req, _: req, settings)
+        before(1)
+        self.assertEqual(log, [])
+        after(1)
+        self.assertEqual(len(log), 2)
+        interceptors.unregister(recorder)
+        self.assertRaises(ValueError, interceptors.unregister, recorder)
+
+    def test_changes_request_and_response(self):
+        def double_request(invocation, continuation):
+            return continuation(invocation.request * 2)
+
+        def negate_response(invocation, continuation):
+            return -continuation(invocation.request)
+
+        settings = _CallSettings(
+            interceptors=[negate_response, double_request])
+        my_callable = api_callable.create_api_call(
+            lambda req, _: req, settings)
+        self.assertEqual(my_callable(3), -6)
+
+    def test_sees_settings(self):
+        seen = []
+
+        def record_timeout(invocation, continuation):
+            seen.append(invocation.settings.timeout)
+            return continuation(invocation.request)
+
+        settings = _CallSettings(timeout=10, interceptors=[record_timeout])
+        my_callable = api_callable.create_api_call(
+            lambda req, _: req, settings)
+        my_callable(1)
+        my_callable(1, CallOptions(timeout=20))
+        self.assertEqual(seen, [10, 20])
+
+    @mock.patch('google.gax.config.exc_to_code')
+    @mock.patch('time.sleep')
+    def test_sees_each_attempt(self, _, mock_exc_to_code):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        log = []
+        func = mock.Mock()
+        func.side_effect = [CustomException('', _FAKE_STATUS_CODE_1),
+                            CustomException('', _FAKE_STATUS_CODE_1),
+                            mock.DEFAULT, mock.DEFAULT]
+        func.return_value = 42
+        retry = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(1, 1, 1, 100, 1, 100, 10000))
+        settings = _CallSettings(
+            retry=retry, interceptors=[_Recorder('method', log)])
+        my_callable = api_callable.create_api_call(func, settings)
+        self.assertEqual(my_callable(1), 42)
+        self.assertEqual(my_callable(2), 42)
+        self.assertEqual(log, [('method', 1, 1),
+                               ('method', 'error', 'CustomException'),
+                               ('method', 1, 2),
+                               ('method', 'error', 'CustomException'),
+                               ('method', 1, 3),
+                               ('method', 'response', 42),
+                               ('method', 2, 1),
+                               ('method', 'response', 42)])
+
+    @mock.patch('google.gax.config.API_ERRORS', (CustomException,))
+    def test_errors_are_wrapped_after_interceptors(self):
+        log = []
+        func = mock.Mock(side_effect=CustomException('', _FAKE_STATUS_CODE_1))
+        settings = _CallSettings(interceptors=[_Recorder('method', log)])
+        my_callable = api_callable.create_api_call(func, settings)
+        self.assertRaises(GaxError, my_callable, 1)
+        self.assertEqual(log[-1], ('method', 'error', 'CustomException'))
+
+    def test_construct_settings(self):
+        recorder = _Recorder('method', [])
+        config = {'interfaces': {'service': {
+            'retry_codes': {},
+            'retry_params': {},
+            'methods': {'GetFoo': {'timeout_millis': 1000},
+                        'GetBar': {'timeout_millis': 1000}}}}}
+        defaults = api_callable.construct_settings(
+            'service', config, {}, {},
+            method_interceptors={'get_foo': [recorder]})
+        self.assertEqual(defaults['get_foo'].interceptors, (recorder,))
+        self.assertEqual(defaults['get_bar'].interceptors, ())
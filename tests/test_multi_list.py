@@ -0,0 +1,202 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name
+"""Unit tests for multi_list"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+import unittest2
+
+from google.gax import (
+    _CallSettings, api_callable, CallOptions, multi_list, PageDescriptor)
+
+
+def _wait_for(condition):
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+
+
+class _Lister(object):
+    """Lists ``pages`` pages of two resources ``(request, n)`` per request.
+
+    The listings of the requests in ``errors`` fail after their first page.
+    """
+
+    def __init__(self, pages=3, errors=(), delay=0):
+        self._pages = pages
+        self._errors = errors
+        self._delay = delay
+        self._lock = threading.Lock()
+        self.fetched = 0
+        self.active = 0
+        self.max_active = 0
+
+    def __call__(self, request):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            for page in range(self._pages):
+                if page and request in self._errors:
+                    raise ValueError(request)
+                time.sleep(self._delay * (request % 3))
+                with self._lock:
+                    self.fetched += 1
+                yield [(request, 2 * page), (request, 2 * page + 1)]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestMergeListings(unittest2.TestCase):
+
+    def test_ordered(self):
+        lister = _Lister(delay=0.001)
+        resources = list(multi_list.merge_listings(
+            lister, range(20), concurrency=4))
+        self.assertEqual(resources, [(request, n) for request in range(20)
+                                     for n in range(6)])
+        self.assertLessEqual(lister.max_active, 4)
+        self.assertGreater(lister.max_active, 1)
+
+    def test_unordered(self):
+        lister = _Lister(delay=0.001)
+        pairs = list(multi_list.merge_listings(
+            lister, range(20), concurrency=4, ordered=False))
+        self.assertEqual(sorted(pairs), [(request, (request, n))
+                                         for request in range(20)
+                                         for n in range(6)])
+        for request in range(20):
+            self.assertEqual(
+                [resource for key, resource in pairs if key == request],
+                [(request, n) for n in range(6)])
+
+    def test_backpressure(self):
+        lister = _Lister(pages=100)
+        resources = multi_list.merge_listings(
+            lister, range(100), concurrency=2, buffered_pages=1)
+        self.assertEqual(next(resources), (0, 0))
+        time.sleep(0.05)
+        # At most 4 open listings, each with a buffered page and the one
+        # waiting for room, and the page consumed.
+        self.assertLessEqual(lister.fetched, 4 * 2 + 1)
+        resources.close()
+
+    def test_error(self):
+        lister = _Lister(errors=(1,))
+        resources = multi_list.merge_listings(lister, range(10), concurrency=3)
+        self.assertEqual([next(resources) for _ in range(8)],
+                         [(0, n) for n in range(6)] + [(1, 0), (1, 1)])
+        self.assertRaises(ValueError, next, resources)
+        self.assertRaises(StopIteration, next, resources)
+        _wait_for(lambda: lister.active == 0)
+        self.assertEqual(lister.active, 0)
+
+    def test_requests_error(self):
+        def requests():
+            yield 0
+            raise ValueError('no more requests')
+
+        resources = multi_list.merge_listings(
+            _Lister(), requests(), concurrency=2)
+        self.assertEqual([next(resources) for _ in range(6)],
+                         [(0, n) for n in range(6)])
+        self.assertRaises(ValueError, next, resources)
+
+    def test_close_stops_workers(self):
+        threads = threading.active_count()
+        lister = _Lister(pages=100)
+        resources = multi_list.merge_listings(
+            lister, range(100), concurrency=3)
+        next(resources)
+        resources.close()
+        _wait_for(lambda: threading.active_count() == threads)
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(lister.active, 0)
+
+    def test_empty(self):
+        self.assertEqual(list(multi_list.merge_listings(_Lister(), [])), [])
+
+    def test_bad_arguments(self):
+        self.assertRaises(ValueError, next, multi_list.merge_listings(
+            _Lister(), [1], concurrency=0))
+        self.assertRaises(ValueError, next, multi_list.merge_listings(
+            _Lister(), [1], buffered_pages=0))
+
+
+class _PagedRequest(object):
+    def __init__(self, parent, page_token=0):
+        self.parent = parent
+        self.page_token = page_token
+
+
+class _PagedResponse(object):
+    def __init__(self, nums=(), next_page_token=0):
+        self.nums = nums
+        self.next_page_token = next_page_token
+
+
+def _list_nums(request, timeout, **_):
+    start = int(request.page_token)
+    if start >= 4:
+        return _PagedResponse()
+    return _PagedResponse(
+        [(request.parent, start, timeout), (request.parent, start + 1,
+                                            timeout)], start + 2)
+
+
+class TestListMany(unittest2.TestCase):
+
+    def test_list_many(self):
+        settings = _CallSettings(
+            timeout=10, page_descriptor=PageDescriptor(
+                'page_token', 'next_page_token', 'nums'))
+        my_callable = api_callable.create_api_call(_list_nums, settings)
+        requests = [_PagedRequest(parent) for parent in 'abc']
+        self.assertEqual(
+            list(my_callable.list_many(requests, concurrency=2)),
+            [(parent, n, 10) for parent in 'abc' for n in range(4)])
+
+        requests = [_PagedRequest(parent) for parent in 'abc']
+        pairs = my_callable.list_many(
+            requests, options=CallOptions(timeout=20, max_results=3),
+            ordered=False)
+        self.assertEqual(
+            sorted((request.parent, resource) for request, resource in pairs),
+            [(parent, (parent, n, 20)) for parent in 'abc' for n in range(3)])
+
+    def test_list_many_rejects_unary(self):
+        my_callable = api_callable.create_api_call(
+            lambda _req, _timeout: 42, _CallSettings())
+        self.assertRaises(ValueError, my_callable.list_many, [1])
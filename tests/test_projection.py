@@ -0,0 +1,121 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name
+"""Unit tests for projection"""
+
+from __future__ import absolute_import
+
+import array
+
+import unittest2
+
+from google.gax import INITIAL_PAGE, PageDescriptor, PageIterator, projection
+from google.protobuf import duration_pb2
+from tests.fixtures.fixture_pb2 import Outer, Simple
+
+
+class TestProject(unittest2.TestCase):
+
+    def test_messages(self):
+        resources = [
+            Outer(field1='a', inner=Simple(field1='x', field2='1')),
+            Outer(field1='b', inner=Simple(field1='y', field2='2'))]
+        columns = projection.project(
+            resources, ['inner.field2', 'field1'])
+        self.assertEqual(list(columns), ['inner.field2', 'field1'])
+        self.assertEqual(columns['field1'], ['a', 'b'])
+        self.assertEqual(columns['inner.field2'], ['1', '2'])
+
+    def test_single_field(self):
+        resources = [Simple(field1='x'), Simple(field1='y')]
+        self.assertEqual(projection.project(resources, ['field1']),
+                         {'field1': ['x', 'y']})
+
+    def test_typecodes(self):
+        resources = [duration_pb2.Duration(seconds=seconds, nanos=5)
+                     for seconds in range(3)]
+        columns = projection.project(
+            resources, ['seconds', 'nanos'], typecodes={'seconds': 'q'})
+        self.assertEqual(columns['seconds'], array.array('q', [0, 1, 2]))
+        self.assertEqual(columns['nanos'], [5, 5, 5])
+
+    def test_dicts(self):
+        resources = [{'a': {'b': 1}, 'c': 'x'}, {'a': {'b': 2}, 'c': 'y'}]
+        columns = projection.project(
+            resources, ['a.b', 'c'], typecodes={'a.b': 'l'})
+        self.assertEqual(columns['a.b'], array.array('l', [1, 2]))
+        self.assertEqual(columns['c'], ['x', 'y'])
+
+    def test_empty(self):
+        columns = projection.project(
+            [], ['a', 'b'], typecodes={'b': 'd'})
+        self.assertEqual(columns['a'], [])
+        self.assertEqual(columns['b'], array.array('d'))
+
+    def test_missing_field(self):
+        with self.assertRaises(KeyError):
+            projection.project([Simple()], ['field1', 'field3'])
+        with self.assertRaises(KeyError):
+            projection.project([{'a': 1}], ['b'])
+
+
+class _PagedRequest(object):
+    def __init__(self, page_token=0):
+        self.page_token = page_token
+
+
+class _PagedResponse(object):
+    def __init__(self, resources=(), next_page_token=0):
+        self.resources = resources
+        self.next_page_token = next_page_token
+
+
+def _list_durations(request, **_):
+    start = int(request.page_token)
+    if start >= 4:
+        return _PagedResponse()
+    return _PagedResponse(
+        [duration_pb2.Duration(seconds=start), duration_pb2.Duration(
+            seconds=start + 1)], start + 2)
+
+
+class TestColumnIterator(unittest2.TestCase):
+
+    def test_pages(self):
+        pages = PageIterator(
+            _list_durations,
+            PageDescriptor('page_token', 'next_page_token', 'resources'),
+            INITIAL_PAGE, _PagedRequest())
+        iterator = projection.ColumnIterator(
+            pages, ['seconds'], typecodes={'seconds': 'q'})
+        self.assertEqual(
+            [columns['seconds'].tolist() for columns in iterator],
+            [[0, 1], [2, 3], []])
+        self.assertIsNone(iterator.cursor)
@@ -0,0 +1,131 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name,protected-access
+"""Unit tests for rate_limiter"""
+
+from __future__ import absolute_import
+
+import mock
+import unittest2
+
+from google.gax import rate_limiter, RateLimitOptions
+from google.gax.errors import RateLimitExceededError
+
+
+class TestRateLimiter(unittest2.TestCase):
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_burst_then_waits(self, mock_time, mock_sleep):
+        mock_time.return_value = 100
+        limiter = rate_limiter.RateLimiter(RateLimitOptions(qps=2, burst=3))
+        for _ in range(3):
+            limiter.acquire()
+        mock_sleep.assert_not_called()
+
+        # Waiting attempts reserve their tokens in turn.
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(
+            mock_sleep.call_args_list, [mock.call(0.5), mock.call(1.0)])
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_refills_up_to_burst(self, mock_time, mock_sleep):
+        mock_time.return_value = 100
+        limiter = rate_limiter.RateLimiter(RateLimitOptions(qps=2, burst=2))
+        limiter.acquire()
+        limiter.acquire()
+        mock_time.return_value = 110
+        for _ in range(2):
+            limiter.acquire()
+        mock_sleep.assert_not_called()
+        limiter.acquire()
+        mock_sleep.assert_called_once_with(0.5)
+
+    @mock.patch('time.time')
+    def test_default_burst(self, mock_time):
+        mock_time.return_value = 100
+        limiter = rate_limiter.RateLimiter(
+            RateLimitOptions(qps=5, fail_fast=True))
+        for _ in range(5):
+            limiter.acquire()
+        self.assertRaises(RateLimitExceededError, limiter.acquire)
+
+        limiter = rate_limiter.RateLimiter(
+            RateLimitOptions(qps=0.5, fail_fast=True))
+        limiter.acquire()
+        self.assertRaises(RateLimitExceededError, limiter.acquire)
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_fail_fast(self, mock_time, mock_sleep):
+        mock_time.return_value = 100
+        limiter = rate_limiter.RateLimiter(
+            RateLimitOptions(qps=1, burst=1, fail_fast=True))
+        limiter.acquire()
+        self.assertRaises(RateLimitExceededError, limiter.acquire)
+        mock_sleep.assert_not_called()
+
+        # The failed attempt did not take a token.
+        mock_time.return_value = 101
+        limiter.acquire()
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_wait_bounded_by_timeout(self, mock_time, mock_sleep):
+        mock_time.return_value = 100
+        limiter = rate_limiter.RateLimiter(RateLimitOptions(qps=1, burst=1))
+        limiter.acquire()
+        self.assertRaises(RateLimitExceededError, limiter.acquire, 0.5)
+        mock_sleep.assert_not_called()
+        limiter.acquire(1)
+        mock_sleep.assert_called_once_with(1)
+
+    def test_rejects_non_positive_qps(self):
+        self.assertRaises(
+            ValueError, rate_limiter.RateLimiter, RateLimitOptions(qps=0))
+
+
+class TestLimited(unittest2.TestCase):
+
+    def test_acquires_with_attempt_timeout(self):
+        limiter = mock.Mock(spec=rate_limiter.RateLimiter)
+        limited = rate_limiter.limited(lambda req, timeout: req * 2, limiter)
+        self.assertEqual(limited(21, 5), 42)
+        limiter.acquire.assert_called_once_with(5)
+
+    def test_not_called_when_exceeded(self):
+        limiter = mock.Mock(spec=rate_limiter.RateLimiter)
+        limiter.acquire.side_effect = RateLimitExceededError('exceeded')
+        a_func = mock.Mock()
+        limited = rate_limiter.limited(a_func, limiter)
+        self.assertRaises(RateLimitExceededError, limited, None, 5)
+        a_func.assert_not_called()
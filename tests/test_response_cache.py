@@ -0,0 +1,205 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,no-self-use,no-init,invalid-name,protected-access
+"""Unit tests for response_cache"""
+
+from __future__ import absolute_import
+
+import mock
+import unittest2
+
+from google.gax import (
+    _CallSettings, api_callable, BackoffSettings, CallOptions,
+    response_cache, ResponseCacheOptions, RetryOptions)
+from google.gax.errors import GaxError
+from google.longrunning import operations_pb2
+
+
+class CustomException(Exception):
+    def __init__(self, msg, code):
+        super(CustomException, self).__init__(msg)
+        self.code = code
+
+
+class TestRequestKey(unittest2.TestCase):
+
+    def test_protobuf(self):
+        first = operations_pb2.GetOperationRequest(name='operations/1')
+        same = operations_pb2.GetOperationRequest(name='operations/1')
+        other = operations_pb2.GetOperationRequest(name='operations/2')
+        self.assertEqual(response_cache.request_key(first),
+                         response_cache.request_key(same))
+        self.assertNotEqual(response_cache.request_key(first),
+                            response_cache.request_key(other))
+
+    def test_other_requests(self):
+        self.assertEqual(response_cache.request_key(1), 1)
+        self.assertIsNone(response_cache.request_key([1]))
+
+
+class TestResponseCache(unittest2.TestCase):
+
+    @mock.patch('time.time')
+    def test_expires(self, mock_time):
+        mock_time.return_value = 100
+        cache = response_cache.ResponseCache(
+            ResponseCacheOptions(ttl_millis=1000))
+        cache.put('key', 'response')
+        mock_time.return_value = 100.5
+        self.assertEqual(cache.get('key'), (True, 'response'))
+        mock_time.return_value = 101
+        self.assertEqual(cache.get('key'), (False, None))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = response_cache.ResponseCache(
+            ResponseCacheOptions(max_entries=2))
+        cache.put(1, 'one')
+        cache.put(2, 'two')
+        cache.get(1)
+        cache.put(3, 'three')
+        self.assertEqual(cache.get(1), (True, 'one'))
+        self.assertEqual(cache.get(2), (False, None))
+        self.assertEqual(cache.get(3), (True, 'three'))
+
+    def test_invalidate(self):
+        cache = response_cache.ResponseCache(ResponseCacheOptions())
+        cache.put(1, 'one')
+        cache.put(2, 'two')
+        cache.invalidate(1)
+        self.assertEqual(cache.get(1), (False, None))
+        self.assertEqual(cache.get(2), (True, 'two'))
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_returns_copies(self):
+        cache = response_cache.ResponseCache(ResponseCacheOptions())
+        response = operations_pb2.Operation(name='operations/1')
+        cache.put('key', response)
+        response.name = 'changed'
+        _, cached = cache.get('key')
+        cached.done = True
+        self.assertEqual(cache.get('key')[1],
+                         operations_pb2.Operation(name='operations/1'))
+
+
+class TestCachedApiCall(unittest2.TestCase):
+
+    def _settings(self, **kwargs):
+        return _CallSettings(
+            response_cache=response_cache.ResponseCache(
+                ResponseCacheOptions()),
+            **kwargs)
+
+    def test_hit_skips_call(self):
+        func = mock.Mock(side_effect=lambda req, _: req * 2)
+        my_callable = api_callable.create_api_call(func, self._settings())
+        self.assertEqual(my_callable(1), 2)
+        self.assertEqual(my_callable(1), 2)
+        self.assertEqual(my_callable(2, CallOptions(timeout=10)), 4)
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(my_callable.response_cache.hits, 1)
+        self.assertEqual(my_callable.response_cache.misses, 2)
+
+        my_callable.response_cache.invalidate(1)
+        my_callable(1)
+        self.assertEqual(func.call_count, 3)
+
+    def test_keyed_by_kwargs(self):
+        func = mock.Mock(side_effect=lambda req, _, **kwargs: req * 2)
+        my_callable = api_callable.create_api_call(
+            func, self._settings(kwargs={'metadata': [('a', 'b')]}))
+        self.assertEqual(my_callable(1), 2)
+        options = CallOptions(metadata=[('authorization', 'other')])
+        self.assertEqual(my_callable(1, options), 2)
+        self.assertEqual(func.call_count, 2)
+
+        # Each call sees only the responses of calls with equal metadata.
+        my_callable(1)
+        my_callable(1, CallOptions(metadata=[('authorization', 'other')]))
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(my_callable.response_cache.hits, 2)
+
+        # Invalidating a request drops the responses of all its calls.
+        my_callable.response_cache.invalidate(1)
+        self.assertEqual(len(my_callable.response_cache), 0)
+
+        # Calls whose kwargs cannot be hashed bypass the cache.
+        for _ in range(2):
+            my_callable(1, CallOptions(key=set()))
+        self.assertEqual(func.call_count, 4)
+
+    @mock.patch('google.gax.config.exc_to_code')
+    @mock.patch('time.sleep')
+    def test_hit_skips_retry(self, _, mock_exc_to_code):
+        mock_exc_to_code.side_effect = lambda e: e.code
+        func = mock.Mock()
+        func.side_effect = [CustomException('', 'code'), mock.DEFAULT,
+                            CustomException('', 'code')]
+        func.return_value = 42
+        retry = RetryOptions(
+            ['code'], BackoffSettings(1, 1, 1, 100, 1, 100, 10000))
+        my_callable = api_callable.create_api_call(
+            func, self._settings(retry=retry))
+        self.assertEqual(my_callable(1), 42)
+        self.assertEqual(my_callable(1), 42)
+        self.assertEqual(func.call_count, 2)
+
+    @mock.patch('google.gax.config.API_ERRORS', (CustomException,))
+    def test_errors_are_not_cached(self):
+        func = mock.Mock()
+        func.side_effect = [CustomException('', 'code'), mock.DEFAULT]
+        func.return_value = 42
+        my_callable = api_callable.create_api_call(func, self._settings())
+        self.assertRaises(GaxError, my_callable, 1)
+        self.assertEqual(my_callable(1), 42)
+
+    def test_without_cache(self):
+        my_callable = api_callable.create_api_call(
+            lambda req, _: req, _CallSettings())
+        self.assertIsNone(my_callable.response_cache)
+
+    def test_construct_settings(self):
+        config = {'interfaces': {'service': {
+            'retry_codes': {},
+            'retry_params': {},
+            'methods': {
+                'GetFoo': {'timeout_millis': 1000,
+                           'response_cache': {'ttl_millis': 500}},
+                'GetBar': {'timeout_millis': 1000}}}}}
+        override = {'interfaces': {'service': {'methods': {
+            'GetBar': {'response_cache': {'max_entries': 10}}}}}}
+        defaults = api_callable.construct_settings(
+            'service', config, override, {})
+        self.assertEqual(defaults['get_foo'].response_cache._ttl, 0.5)
+        self.assertEqual(defaults['get_bar'].response_cache._max_entries, 10)
+        defaults = api_callable.construct_settings('service', config, {}, {})
+        self.assertIsNone(defaults['get_bar'].response_cache)
@@ -35,7 +35,9 @@ from __future__ import absolute_import, division
 import mock
 import unittest2
 
-from google.gax import BackoffSettings, errors, retry, RetryOptions
+from google.gax import (
+    AdaptiveTimeoutOptions, BackoffSettings, errors, retry, RetryOptions)
+from google.gax.utils import latency
 
 _MILLIS_PER_SEC = 1000
 
@@ -187,3 +189,181 @@ class TestRetry(unittest2.TestCase):
         calls_upper_bound = (params.total_timeout_millis /
                              params.initial_retry_delay_millis)
         self.assertLess(mock_call.call_count, calls_upper_bound)
+
+    @mock.patch('random.uniform', side_effect=lambda low, high: high)
+    @mock.patch('google.gax.config.exc_to_code')
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_retryable_backoff_overrides(
+            self, mock_time, mock_sleep, mock_exc_to_code, _):
+        mock_time.return_value = 0
+        mock_exc_to_code.side_effect = lambda e: e.code
+
+        mock_call = mock.Mock()
+        mock_call.side_effect = [
+            CustomException('', _FAKE_STATUS_CODE_1),
+            CustomException('', _FAKE_STATUS_CODE_2),
+            CustomException('', _FAKE_STATUS_CODE_1),
+            CustomException('', _FAKE_STATUS_CODE_2),
+            mock.DEFAULT]
+        mock_call.return_value = 1729
+
+        params = BackoffSettings(10, 2, 1000, None, None, None, None)
+        retry_options = RetryOptions(
+            [_FAKE_STATUS_CODE_1, _FAKE_STATUS_CODE_2], params,
+            backoff_overrides={_FAKE_STATUS_CODE_1: params._replace(
+                initial_retry_delay_millis=1000, retry_delay_multiplier=3,
+                max_retry_delay_millis=60000)})
+
+        my_callable = retry.retryable(mock_call, retry_options)
+
+        self.assertEqual(my_callable(None), 1729)
+        # Each schedule advances independently of the other.
+        self.assertEqual(
+            mock_sleep.call_args_list,
+            [mock.call(2), mock.call(0.02), mock.call(6), mock.call(0.04)])
+
+    @mock.patch('google.gax.config.exc_to_retry_delay')
+    @mock.patch('google.gax.config.exc_to_code')
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_retryable_honors_server_delay(
+            self, mock_time, mock_sleep, mock_exc_to_code,
+            mock_exc_to_retry_delay):
+        mock_time.return_value = 0
+        mock_exc_to_code.side_effect = lambda e: e.code
+        mock_exc_to_retry_delay.side_effect = [3.5, None]
+
+        mock_call = mock.Mock()
+        mock_call.side_effect = ([CustomException('', _FAKE_STATUS_CODE_1)] *
+                                 2 + [mock.DEFAULT])
+        mock_call.return_value = 1729
+
+        retry_options = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 1, 0, None, None, None, None))
+
+        my_callable = retry.retryable(mock_call, retry_options)
+
+        self.assertEqual(my_callable(None), 1729)
+        self.assertEqual(
+            mock_sleep.call_args_list, [mock.call(3.5), mock.call(0)])
+
+    @mock.patch('google.gax.config.exc_to_retry_delay')
+    @mock.patch('google.gax.config.exc_to_code')
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_retryable_bounds_server_delay_by_deadline(
+            self, mock_time, mock_sleep, mock_exc_to_code,
+            mock_exc_to_retry_delay):
+        def incr_time(secs):
+            mock_time.return_value += secs
+
+        mock_time.return_value = 0
+        mock_sleep.side_effect = incr_time
+        mock_exc_to_code.side_effect = lambda e: e.code
+        mock_exc_to_retry_delay.return_value = 60
+
+        mock_call = mock.Mock()
+        mock_call.side_effect = CustomException('', _FAKE_STATUS_CODE_1)
+
+        retry_options = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 1, 0, 1000, 1, 1000, 2000))
+
+        my_callable = retry.retryable(mock_call, retry_options)
+
+        self.assertRaises(errors.RetryError, my_callable)
+        mock_sleep.assert_called_once_with(2)
+        self.assertEqual(mock_call.call_count, 1)
+
+
+class _FixedLatency(object):
+    """A latency tracker whose percentiles are all ``seconds``."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.recorded = []
+
+    def percentile(self, _):
+        return self.seconds
+
+    def record(self, seconds):
+        self.recorded.append(seconds)
+
+
+class TestAdaptiveTimeout(unittest2.TestCase):
+
+    def _options(self, **kwargs):
+        return RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 1, 0, 2000, 2, 5000, 8000),
+            adaptive_timeout=AdaptiveTimeoutOptions(**kwargs))
+
+    @mock.patch('time.time')
+    def test_timeout_from_percentile(self, mock_time):
+        mock_time.return_value = 0
+        backoff = retry._Backoff(
+            self._options(margin=3.0), _FixedLatency(0.25))
+        self.assertEqual(backoff.timeout, 0.75)
+
+    @mock.patch('time.time')
+    def test_timeout_bounds(self, mock_time):
+        mock_time.return_value = 0
+        options = self._options(min_timeout_millis=500)
+        self.assertEqual(
+            retry._Backoff(options, _FixedLatency(0.001)).timeout, 0.5)
+        self.assertEqual(
+            retry._Backoff(options, _FixedLatency(100)).timeout, 5)
+
+    @mock.patch('time.time')
+    def test_initial_timeout_until_observed(self, mock_time):
+        mock_time.return_value = 0
+        backoff = retry._Backoff(self._options(), latency.LatencyTracker())
+        self.assertEqual(backoff.timeout, 2)
+
+    @mock.patch('time.time')
+    def test_static_without_options(self, mock_time):
+        mock_time.return_value = 0
+        options = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 1, 0, 2000, 2, 5000, 8000))
+        backoff = retry._Backoff(options, _FixedLatency(0.25))
+        self.assertEqual(backoff.timeout, 2)
+
+    @mock.patch('google.gax.config.exc_to_code')
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_retries_grow_from_adaptive_timeout(
+            self, mock_time, _, mock_exc_to_code):
+        mock_time.return_value = 0
+        mock_exc_to_code.side_effect = lambda e: e.code
+        timeouts = []
+
+        def fail(timeout):
+            timeouts.append(timeout)
+            mock_time.return_value += timeout
+            raise CustomException('', _FAKE_STATUS_CODE_1)
+
+        tracker = _FixedLatency(0.5)
+        my_callable = retry.retryable(
+            fail, self._options(margin=2.0), latency=tracker)
+        self.assertRaises(errors.RetryError, my_callable)
+        self.assertEqual(timeouts, [1, 2, 4, 1])
+        # Timed out attempts are recorded, as the latency is at least as long.
+        self.assertEqual(tracker.recorded, [1, 2, 4, 1])
+
+    def test_records_successful_attempts(self):
+        tracker = _FixedLatency(0.5)
+        my_callable = retry.retryable(
+            lambda timeout: 42, self._options(), latency=tracker)
+        self.assertEqual(my_callable(), 42)
+        self.assertEqual(len(tracker.recorded), 1)
+
+    def test_not_recorded_without_options(self):
+        tracker = _FixedLatency(0.5)
+        options = RetryOptions(
+            [_FAKE_STATUS_CODE_1],
+            BackoffSettings(0, 1, 0, 2000, 2, 5000, 8000))
+        retry.retryable(lambda timeout: 42, options, latency=tracker)()
+        self.assertEqual(tracker.recorded, [])
@@ -0,0 +1,236 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,no-self-use,no-init,invalid-name,protected-access
+"""Unit tests for single_flight"""
+
+from __future__ import absolute_import
+
+import threading
+
+import mock
+import unittest2
+
+from google.gax import _CallSettings, api_callable, CallOptions, single_flight
+from google.longrunning import operations_pb2
+
+
+class _BlockingCall(object):
+    """Blocks each call until ``release`` is called, counting the calls."""
+
+    def __init__(self, response=None, exception=None):
+        self.response = response
+        self.exception = exception
+        self.calls = 0
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self._condition = threading.Condition()
+
+    def __call__(self, request, *_):
+        with self._condition:
+            self.calls += 1
+            self._condition.notify_all()
+        self.started.set()
+        self.released.wait()
+        if self.exception is not None:
+            raise self.exception
+        return self.response if self.response is not None else request
+
+    def release(self):
+        self.released.set()
+
+    def wait_for_calls(self, count):
+        with self._condition:
+            while self.calls < count:
+                self._condition.wait()
+
+
+def _call_concurrently(a_func, requests):
+    """Calls ``a_func`` for each of ``requests`` on its own thread.
+
+    Returns the threads and the outcomes, filled in as the calls complete.
+    """
+    outcomes = [None] * len(requests)
+
+    def run(index, request):
+        try:
+            outcomes[index] = ('response', a_func(request))
+        except Exception as exception:  # pylint: disable=broad-except
+            outcomes[index] = ('error', exception)
+
+    threads = [threading.Thread(target=run, args=(index, request))
+               for index, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+class _CountingEvent(object):
+    """An Event counting the threads waiting on it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._condition = threading.Condition()
+        self.waiters = 0
+
+    def wait(self):
+        with self._condition:
+            self.waiters += 1
+            self._condition.notify_all()
+        self._event.wait()
+
+    def set(self):
+        self._event.set()
+
+    def wait_for_waiters(self, count):
+        with self._condition:
+            while self.waiters < count:
+                self._condition.wait()
+
+
+class _CountingFlight(single_flight._Flight):
+    """A flight whose followers can be awaited."""
+    instances = []
+
+    def __init__(self):
+        super(_CountingFlight, self).__init__()
+        self.done = _CountingEvent()
+        _CountingFlight.instances.append(self)
+
+
+def _wait_for_followers(count):
+    """Waits until ``count`` calls wait for the last flight."""
+    _CountingFlight.instances[-1].done.wait_for_waiters(count)
+
+
+@mock.patch('google.gax.single_flight._Flight', _CountingFlight)
+class TestCoalesced(unittest2.TestCase):
+
+    def test_shares_response(self):
+        call = _BlockingCall()
+        coalesced = single_flight.coalesced(call)
+        leader, outcomes = _call_concurrently(coalesced, [1])
+        call.started.wait()
+        followers, follower_outcomes = _call_concurrently(coalesced, [1] * 5)
+        _wait_for_followers(5)
+        call.release()
+        for thread in leader + followers:
+            thread.join()
+        self.assertEqual(call.calls, 1)
+        self.assertEqual(outcomes + follower_outcomes, [('response', 1)] * 6)
+
+    def test_shares_error(self):
+        error = ValueError('failed')
+        call = _BlockingCall(exception=error)
+        coalesced = single_flight.coalesced(call)
+        leader, outcomes = _call_concurrently(coalesced, [1])
+        call.started.wait()
+        followers, follower_outcomes = _call_concurrently(coalesced, [1] * 3)
+        _wait_for_followers(3)
+        call.release()
+        for thread in leader + followers:
+            thread.join()
+        self.assertEqual(call.calls, 1)
+        self.assertEqual(outcomes + follower_outcomes, [('error', error)] * 4)
+
+    def test_distinct_requests_are_not_coalesced(self):
+        call = _BlockingCall()
+        call.release()
+        coalesced = single_flight.coalesced(call)
+        self.assertEqual(coalesced(1), 1)
+        self.assertEqual(coalesced(2), 2)
+        self.assertEqual(coalesced(1), 1)
+        self.assertEqual(call.calls, 3)
+
+    def test_unkeyed_requests_are_not_coalesced(self):
+        func = mock.Mock(return_value=42)
+        coalesced = single_flight.coalesced(func)
+        self.assertEqual(coalesced([1]), 42)
+        func.assert_called_once_with([1])
+
+    def test_followers_receive_copies(self):
+        call = _BlockingCall(response=operations_pb2.Operation(name='op'))
+        coalesced = single_flight.coalesced(call)
+        request = operations_pb2.GetOperationRequest(name='op')
+        leader, outcomes = _call_concurrently(coalesced, [request])
+        call.started.wait()
+        followers, follower_outcomes = _call_concurrently(
+            coalesced, [request])
+        _wait_for_followers(1)
+        call.release()
+        for thread in leader + followers:
+            thread.join()
+        self.assertEqual(call.calls, 1)
+        self.assertEqual(outcomes[0][1], follower_outcomes[0][1])
+        self.assertIsNot(outcomes[0][1], follower_outcomes[0][1])
+
+
+@mock.patch('google.gax.single_flight._Flight', _CountingFlight)
+class TestSingleFlightApiCall(unittest2.TestCase):
+
+    def test_api_call(self):
+        call = _BlockingCall()
+        my_callable = api_callable.create_api_call(
+            call, _CallSettings(single_flight=True))
+        leader, outcomes = _call_concurrently(my_callable, [1])
+        call.started.wait()
+        followers, follower_outcomes = _call_concurrently(
+            my_callable, [1] * 3)
+        _wait_for_followers(3)
+        call.release()
+        for thread in leader + followers:
+            thread.join()
+        self.assertEqual(call.calls, 1)
+        self.assertEqual(outcomes + follower_outcomes, [('response', 1)] * 4)
+
+    def test_different_options_are_not_coalesced(self):
+        call = _BlockingCall()
+        my_callable = api_callable.create_api_call(
+            call, _CallSettings(single_flight=True))
+        leader, _ = _call_concurrently(my_callable, [1])
+        call.started.wait()
+        other = threading.Thread(
+            target=my_callable, args=(1, CallOptions(timeout=5)))
+        other.start()
+        call.wait_for_calls(2)
+        call.release()
+        for thread in leader + [other]:
+            thread.join()
+        self.assertEqual(call.calls, 2)
+
+    def test_construct_settings(self):
+        config = {'interfaces': {'service': {
+            'retry_codes': {},
+            'retry_params': {},
+            'methods': {
+                'GetFoo': {'timeout_millis': 1000, 'single_flight': True},
+                'GetBar': {'timeout_millis': 1000}}}}}
+        defaults = api_callable.construct_settings('service', config, {}, {})
+        self.assertTrue(defaults['get_foo'].single_flight)
+        self.assertFalse(defaults['get_bar'].single_flight)
@@ -0,0 +1,249 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name,protected-access
+"""Unit tests for streaming"""
+
+from __future__ import absolute_import
+
+import mock
+import unittest2
+
+from google.gax import (
+    _CallSettings, BackoffSettings, circuit_breaker, errors, RetryOptions,
+    StreamDescriptor, streaming)
+
+_TRANSIENT = object()
+_PERMANENT = object()
+
+_DESCRIPTOR = StreamDescriptor('resume_token', 'resume_token')
+
+_RETRY = RetryOptions(
+    [_TRANSIENT], BackoffSettings(10, 2, 100, 1000, 1, 1000, 5000))
+
+
+class CustomException(Exception):
+    def __init__(self, code):
+        super(CustomException, self).__init__(code)
+        self.code = code
+
+
+class _Request(object):
+    def __init__(self, resume_token=None):
+        self.resume_token = resume_token
+
+
+class _Response(object):
+    def __init__(self, value, resume_token=''):
+        self.value = value
+        self.resume_token = resume_token
+
+
+class _FakeStream(object):
+    def __init__(self, script):
+        self._script = iter(script)
+        self.cancelled = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self._script)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    next = __next__
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _FakeStreamMethod(object):
+    """Returns a stream following the next of ``scripts`` on each call."""
+
+    def __init__(self, *scripts):
+        self._scripts = iter(scripts)
+        self.calls = []
+        self.streams = []
+
+    def __call__(self, request, timeout, **kwargs):
+        self.calls.append((request.resume_token, timeout, kwargs))
+        stream = _FakeStream(next(self._scripts))
+        self.streams.append(stream)
+        return stream
+
+
+def _values(stream):
+    return [response.value for response in stream]
+
+
+@mock.patch('google.gax.config.API_ERRORS', (CustomException,))
+@mock.patch('google.gax.config.exc_to_code', side_effect=lambda e: e.code)
+@mock.patch('time.sleep')
+class TestResumableStream(unittest2.TestCase):
+
+    def test_yields_responses(self, *_):
+        func = _FakeStreamMethod([
+            _Response(1), _Response(2, 'a'), _Response(3)])
+        settings = _CallSettings(
+            timeout=7, stream_descriptor=_DESCRIPTOR)
+        stream = streaming.ResumableStream(
+            func, settings, _Request(), key='value')
+        self.assertEqual(_values(stream), [1, 2, 3])
+        self.assertEqual(stream.resume_token, 'a')
+        self.assertEqual(func.calls, [(None, 7, {'key': 'value'})])
+
+    def test_resumes_after_token(self, mock_sleep, *_):
+        func = _FakeStreamMethod(
+            [_Response(1, 'a'), _Response(2), CustomException(_TRANSIENT)],
+            [_Response(2), _Response(3, 'b')])
+        settings = _CallSettings(retry=_RETRY, stream_descriptor=_DESCRIPTOR)
+        request = _Request()
+        stream = streaming.ResumableStream(func, settings, request)
+        self.assertEqual(_values(stream), [1, 2, 3])
+        self.assertEqual([call[0] for call in func.calls], [None, 'a'])
+        self.assertIsNone(request.resume_token)
+        mock_sleep.assert_called_once_with(mock.ANY)
+
+    def test_progress_restarts_retries(self, mock_sleep, *_):
+        func = _FakeStreamMethod(
+            [CustomException(_TRANSIENT)],
+            [_Response(1, 'a'), CustomException(_TRANSIENT)],
+            [_Response(2, 'b')])
+        settings = _CallSettings(retry=_RETRY, stream_descriptor=_DESCRIPTOR)
+        with mock.patch('random.uniform', side_effect=lambda _, high: high):
+            stream = streaming.ResumableStream(func, settings, _Request())
+            self.assertEqual(_values(stream), [1, 2])
+        self.assertEqual(
+            mock_sleep.call_args_list, [mock.call(0.02), mock.call(0.02)])
+
+    def test_restarts_without_descriptor_before_response(self, *_):
+        func = _FakeStreamMethod(
+            [CustomException(_TRANSIENT)],
+            [_Response(1), CustomException(_TRANSIENT)])
+        stream = streaming.ResumableStream(
+            func, _CallSettings(retry=_RETRY), _Request())
+        self.assertEqual(next(stream).value, 1)
+        with self.assertRaises(errors.GaxError) as context:
+            next(stream)
+        self.assertIsInstance(context.exception.cause, CustomException)
+        self.assertEqual(len(func.calls), 2)
+
+    def test_unresumable_beyond_buffer(self, *_):
+        func = _FakeStreamMethod(
+            [_Response(1), _Response(2), _Response(3),
+             CustomException(_TRANSIENT)])
+        settings = _CallSettings(retry=_RETRY, stream_descriptor=_DESCRIPTOR)
+        with mock.patch('google.gax.streaming.MAX_BUFFERED_RESPONSES', 1):
+            stream = streaming.ResumableStream(func, settings, _Request())
+            self.assertEqual(next(stream).value, 1)
+            self.assertEqual(next(stream).value, 2)
+            self.assertRaises(errors.GaxError, next, stream)
+        self.assertEqual(len(func.calls), 1)
+
+    def test_not_retrying(self, *_):
+        func = _FakeStreamMethod([CustomException(_TRANSIENT)])
+        stream = streaming.ResumableStream(
+            func, _CallSettings(stream_descriptor=_DESCRIPTOR), _Request())
+        with self.assertRaises(errors.GaxError) as context:
+            next(stream)
+        self.assertIsInstance(context.exception.cause, CustomException)
+        self.assertNotIsInstance(context.exception, errors.RetryError)
+
+    def test_permanent_error(self, *_):
+        func = _FakeStreamMethod([CustomException(_PERMANENT)])
+        settings = _CallSettings(retry=_RETRY, stream_descriptor=_DESCRIPTOR)
+        stream = streaming.ResumableStream(func, settings, _Request())
+        self.assertRaises(errors.RetryError, next, stream)
+        self.assertEqual(len(func.calls), 1)
+
+    def test_cancel(self, *_):
+        func = _FakeStreamMethod([_Response(1), _Response(2)])
+        stream = streaming.ResumableStream(func, _CallSettings(), _Request())
+        self.assertEqual(next(stream).value, 1)
+        stream.cancel()
+        self.assertTrue(func.streams[0].cancelled)
+        self.assertRaises(StopIteration, next, stream)
+
+    def test_cancel_releases_breaker(self, *_):
+        breaker = mock.Mock(spec=circuit_breaker.CircuitBreaker)
+        func = _FakeStreamMethod([_Response(1), _Response(2)])
+        stream = streaming.ResumableStream(
+            func, _CallSettings(circuit_breaker=breaker), _Request())
+        self.assertEqual(next(stream).value, 1)
+        stream.cancel()
+        breaker.allow.assert_called_once_with()
+        breaker.release.assert_called_once_with(breaker.allow.return_value)
+        self.assertFalse(breaker.record.called)
+        stream.cancel()
+        self.assertEqual(breaker.release.call_count, 1)
+
+
+@mock.patch('google.gax.config.API_ERRORS', (CustomException,))
+@mock.patch('google.gax.config.exc_to_code', side_effect=lambda e: e.code)
+class TestBidiStream(unittest2.TestCase):
+
+    def test_yields_responses(self, _):
+        func = mock.Mock(return_value=_FakeStream([1, 2]))
+        requests = iter(['a', 'b'])
+        self.assertEqual(list(streaming.bidi_stream(
+            func, _CallSettings(timeout=7), requests, key='value')), [1, 2])
+        func.assert_called_once_with(requests, 7, key='value')
+
+    def test_timeout_from_retry(self, _):
+        func = mock.Mock(return_value=_FakeStream([]))
+        list(streaming.bidi_stream(func, _CallSettings(retry=_RETRY), []))
+        func.assert_called_once_with([], 5)
+
+    def test_wraps_errors(self, _):
+        func = mock.Mock(return_value=_FakeStream(
+            [1, CustomException(_TRANSIENT)]))
+        responses = streaming.bidi_stream(func, _CallSettings(), [])
+        self.assertEqual(next(responses), 1)
+        self.assertRaises(errors.GaxError, next, responses)
+        self.assertEqual(func.call_count, 1)
+
+    def test_cancels_on_close(self, _):
+        stream = _FakeStream([1, 2])
+        responses = streaming.bidi_stream(
+            mock.Mock(return_value=stream), _CallSettings(), [])
+        self.assertEqual(next(responses), 1)
+        responses.close()
+        self.assertTrue(stream.cancelled)
+
+    def test_close_releases_breaker(self, _):
+        breaker = mock.Mock(spec=circuit_breaker.CircuitBreaker)
+        responses = streaming.bidi_stream(
+            mock.Mock(return_value=_FakeStream([1, 2])),
+            _CallSettings(circuit_breaker=breaker), [])
+        self.assertEqual(next(responses), 1)
+        responses.close()
+        breaker.release.assert_called_once_with(breaker.allow.return_value)
+        self.assertFalse(breaker.record.called)
@@ -0,0 +1,78 @@
+# Copyright 2017, Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+# copyright notice, this list of conditions and the following disclaimer
+# in the documentation and/or other materials provided with the
+# distribution.
+#     * Neither the name of Google Inc. nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# pylint: disable=missing-docstring,invalid-name,protected-access
+"""Unit tests for the latency utilities."""
+
+from __future__ import absolute_import
+
+import unittest
+
+from google.gax.utils import latency
+
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def test_too_few_samples(self):
+        tracker = latency.LatencyTracker(min_samples=5)
+        for _ in range(4):
+            tracker.record(0.1)
+        self.assertIsNone(tracker.percentile(50))
+        tracker.record(0.1)
+        self.assertIsNotNone(tracker.percentile(50))
+
+    def test_percentile(self):
+        tracker = latency.LatencyTracker()
+        for millis in range(1, 101):
+            tracker.record(millis / 1000.0)
+        self.assertAlmostEqual(tracker.percentile(50), 0.050, delta=0.005)
+        self.assertAlmostEqual(tracker.percentile(95), 0.095, delta=0.010)
+        self.assertGreaterEqual(tracker.percentile(95), 0.095)
+
+    def test_out_of_range(self):
+        tracker = latency.LatencyTracker(min_samples=1)
+        tracker.record(0)
+        self.assertEqual(tracker.percentile(100), latency._MIN_LATENCY_SECS)
+        tracker = latency.LatencyTracker(min_samples=1)
+        tracker.record(10 ** 6)
+        self.assertGreaterEqual(
+            tracker.percentile(100), latency._MAX_LATENCY_SECS)
+
+    def test_decay(self):
+        tracker = latency.LatencyTracker(decay_interval=100)
+        for _ in range(99):
+            tracker.record(1.0)
+        self.assertEqual(tracker.count, 99)
+        tracker.record(1.0)
+        self.assertEqual(tracker.count, 50)
+
+        # Recent samples outweigh the decayed ones.
+        for _ in range(60):
+            tracker.record(0.01)
+        self.assertLess(tracker.percentile(50), 0.02)
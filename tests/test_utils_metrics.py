@@ -33,6 +33,7 @@ import collections
 import platform
 import unittest
 
+import mock
 import pkg_resources
 
 from google import gax
@@ -113,3 +114,23 @@ class TestStringify(unittest.TestCase):
             grpc=GRPC_VERSION,
             python=platform.python_version(),
         ))
+
+
+class TestHeaderValue(unittest.TestCase):
+    def test_header_value(self):
+        headers = collections.OrderedDict((('gapic', '1.0.0'),))
+        self.assertEqual(metrics.header_value(headers),
+                         metrics.stringify(metrics.fill(headers)))
+
+    def test_computed_once(self):
+        headers = (('gapic', '2.0.0'),)
+        first = metrics.header_value(headers)
+        with mock.patch.object(metrics, 'fill') as fill:
+            self.assertEqual(metrics.header_value(headers), first)
+            self.assertFalse(fill.called)
+
+    def test_grpc_version_looked_up_once(self):
+        metrics.fill()
+        with mock.patch('pkg_resources.get_distribution') as get:
+            self.assertEqual(metrics.fill()['grpc'], GRPC_VERSION)
+            self.assertFalse(get.called)